@@ -0,0 +1,263 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+
+from src.dedupe import fingerprint
+from src.matcher import DEFAULT_TOPIC
+from src.store import Store
+from src.utils import now_jst, sha256_text
+from src.writer import write_three_posts
+
+ROOT = Path(__file__).resolve().parent.parent
+# Fingerprinting a whole body costs 15-20 ms; title plus lead keeps 100k rows in minutes and still spreads LSH buckets.
+LEAD_CHARS = 200
+BATCH_ROWS = 5000
+# Near-duplicates in the queue are rewrites of the newest posts, the ones inside a dedupe window.
+RECENT_POSTS = 50
+
+INDUSTRIES = {
+    "医療AI": (["hospital", "clinic network", "medical group"], ["病院", "医療法人", "クリニック"]),
+    "教育AI": (["school district", "university", "education startup"], ["大学", "教育委員会", "学習塾チェーン"]),
+    "金融AI": (["bank", "insurer", "finance team"], ["銀行", "保険会社", "証券会社"]),
+    DEFAULT_TOPIC: (["retailer", "manufacturer", "logistics firm"], ["小売大手", "製造業", "物流会社"]),
+}
+ORGS_EN = ["Northwind", "Contoso", "Fabrikam", "Tailspin", "Litware", "Adatum", "Proseware", "Woodgrove", "Relecloud"]
+ORGS_JA = ["東和", "みなと", "さくら", "北斗", "あおば", "ひかり", "大和", "瀬戸内", "東邦"]
+TASKS_EN = ["triage", "customer support", "document review", "demand forecasting", "code review", "onboarding"]
+TASKS_JA = ["問い合わせ対応", "書類審査", "需要予測", "議事録作成", "品質検査", "採用面接の準備"]
+
+TITLES_EN = [
+    "{org} {kind} cuts {task} time {pct}% with an AI assistant",
+    "How a {kind} used generative AI for {task} and kept humans in the loop",
+    "{org}'s AI rollout: {pct}% faster {task} after {months} months",
+]
+TITLES_JA = [
+    "{org}{kind}、生成AIで{task}の時間を{pct}%短縮",
+    "{org}{kind}が{task}にAIを導入、{months}か月で成果",
+    "{task}を生成AIで効率化した{org}{kind}の取り組み",
+]
+SENTENCES_EN = [
+    "The {kind} says its AI tool cut the time spent on {task} by {pct}% over {months} months.",
+    "Staff review every suggestion before it reaches a customer, and overrides are logged for audit.",
+    "The rollout started with a shadow period in which the model's output was recorded but never shown.",
+    "Productivity gains were largest where the workflow was already standardised.",
+    "Costs stayed modest because the {kind} reused its existing enterprise systems.",
+    "Not everything worked: free-text inputs produced more errors and more manual corrections.",
+    "Executives say the revenue impact is still hard to measure, but throughput is clearly up.",
+    "Next year the programme expands to {n} more sites, with the same review steps in place.",
+    "{person} said in a keynote that tools like this only pay off when they live inside the workflow.",
+]
+SENTENCES_JA = [
+    "同{kind}によると、{task}にかかる時間は{months}か月で約{pct}%短縮した。",
+    "AIの提案は必ず担当者が確認してから使い、修正した内容はすべて記録している。",
+    "導入の前には、AIの出力を記録するだけで現場には見せない試験期間を設けた。",
+    "業務の手順がもともと標準化されていた部署ほど効果が大きかった。",
+    "既存のシステムと認証基盤をそのまま使ったため、追加の費用はほとんどかからなかった。",
+    "一方で、自由記述の入力が多い業務では誤りや手戻りが目立った。",
+    "経営陣は、売上への効果はまだ測りにくいものの、処理件数は明らかに増えたと話す。",
+    "来年度は{n}拠点に運用を広げ、同じ確認手順を維持する予定だ。",
+    "{person}氏は講演で、こうしたツールは業務の流れに組み込んで初めて効果が出ると述べた。",
+]
+
+
+def _rules() -> dict:
+    with open(ROOT / "config" / "rules.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _people() -> list[str]:
+    with open(ROOT / "config" / "people.json", "r", encoding="utf-8") as f:
+        return [p["name"] for p in json.load(f)]
+
+
+def make_article(rng: random.Random, i: int, people: list[str], topics: list[str]) -> dict:
+    # Two in five articles are English, the rest Japanese, roughly the mix the configured feeds produce.
+    topic = rng.choice(topics)
+    english = rng.random() < 0.4
+    kinds = INDUSTRIES.get(topic, INDUSTRIES[DEFAULT_TOPIC])[0 if english else 1]
+    person = rng.choice(people) if people and rng.random() < 0.3 else None
+    fields = {
+        "org": rng.choice(ORGS_EN if english else ORGS_JA),
+        "kind": rng.choice(kinds),
+        "task": rng.choice(TASKS_EN if english else TASKS_JA),
+        "pct": rng.randint(8, 45),
+        "months": rng.randint(2, 18),
+        "n": rng.randint(2, 40),
+        "person": person or "",
+    }
+    bank = SENTENCES_EN if english else SENTENCES_JA
+    bank = [s for s in bank if person or "{person}" not in s]
+    body = (" " if english else "").join(s.format(**fields) for s in rng.choices(bank, k=rng.randint(6, 16)))
+    domain = "news.example.com" if english else "news.example.jp"
+    url = f"https://{domain}/{2020 + i % 7}/{rng.randint(1, 12):02d}/story-{i}-{rng.getrandbits(32):08x}"
+    return {
+        "url": url,
+        "title": rng.choice(TITLES_EN if english else TITLES_JA).format(**fields),
+        "body": body,
+        "topic": topic,
+        "person": person,
+    }
+
+
+def rewrite(rng: random.Random, article: dict, i: int) -> dict:
+    # A near-duplicate: same story syndicated elsewhere with a tweaked headline and a trimmed ending.
+    cut = max(LEAD_CHARS, int(len(article["body"]) * rng.uniform(0.8, 0.95)))
+    return {
+        **article,
+        "url": article["url"].replace("news.example", "mirror.example") + f"-copy{i}",
+        "title": article["title"] + (" (update)" if article["title"].isascii() else "（続報）"),
+        "body": article["body"][:cut],
+    }
+
+
+def lead_fingerprint(article: dict) -> tuple[bytes, str]:
+    return fingerprint(article["title"], article["body"][:LEAD_CHARS])
+
+
+def fingerprints(articles: list[dict], jobs: int) -> list[tuple[bytes, str]]:
+    if jobs <= 1:
+        return [lead_fingerprint(a) for a in articles]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(lead_fingerprint, articles, chunksize=256))
+
+
+def _progress(label: str, done: int, total: int, started: float) -> None:
+    print(f"\r{label}: {done}/{total} ({time.perf_counter() - started:.0f}s)", end="", file=sys.stderr, flush=True)
+
+
+def generate_posts(store: Store, n: int, days: int, seed: int = 1, jobs: int = 1) -> list[dict]:
+    # Posts spread evenly over the last `days` days; the newest ones are returned for near-duplicate probes.
+    rng = random.Random(seed)
+    rules, people = _rules(), _people()
+    topics = list(rules.get("topics", {})) + [DEFAULT_TOPIC]
+    now = now_jst()
+    seen_since = (now - timedelta(days=30)).isoformat()
+    started = time.perf_counter()
+    recent: list[dict] = []
+    for offset in range(0, n, BATCH_ROWS):
+        articles = [make_article(rng, i, people, topics) for i in range(offset, min(n, offset + BATCH_ROWS))]
+        rows = []
+        for i, (art, (minhash, simhash)) in enumerate(zip(articles, fingerprints(articles, jobs)), start=offset):
+            slot = i % 3 + 1
+            posted_at = now - timedelta(days=days) * (1 - i / max(1, n)) + timedelta(minutes=rng.randint(0, 59))
+            url_hash = sha256_text(art["url"])
+            text = write_three_posts(art, rules)[slot]
+            rows.append(
+                (
+                    art["url"],
+                    url_hash,
+                    art["topic"],
+                    art["person"],
+                    slot,
+                    text,
+                    str(rng.getrandbits(62)),
+                    "no-face-card",
+                    posted_at.isoformat(),
+                    minhash,
+                    simhash,
+                )
+            )
+        with store.conn:
+            store.conn.executemany(
+                """
+                INSERT INTO posts(article_url, article_hash, topic, person, slot, text, tweet_id, image_source,
+                                  posted_at, minhash, simhash)
+                VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                rows,
+            )
+            # seen_urls only ever holds the last 30 days (evict_seen), so older history is not recorded there.
+            store.conn.executemany(
+                "INSERT OR REPLACE INTO seen_urls(url_hash, url, fetched_at, content_hash, status) "
+                "VALUES(?, ?, ?, ?, 'queued')",
+                [(r[1], r[0], r[8], sha256_text(a["body"])) for r, a in zip(rows, articles) if r[8] >= seen_since],
+            )
+        recent = (recent + articles)[-RECENT_POSTS:]
+        _progress("posts", min(n, offset + BATCH_ROWS), n, started)
+    print(file=sys.stderr)
+    return recent
+
+
+def generate_queue(
+    store: Store,
+    m: int,
+    seed: int = 1,
+    jobs: int = 1,
+    dup_rate: float = 0.05,
+    recent: list[dict] | None = None,
+) -> None:
+    # Queued articles selected over the last six days, so the default 7-day age eviction keeps them.
+    rng = random.Random(seed + 1_000_003)
+    rules, people = _rules(), _people()
+    topics = list(rules.get("topics", {})) + [DEFAULT_TOPIC]
+    now = now_jst()
+    started = time.perf_counter()
+    for offset in range(0, m, BATCH_ROWS):
+        articles = []
+        for i in range(offset, min(m, offset + BATCH_ROWS)):
+            if recent and rng.random() < dup_rate:
+                articles.append(rewrite(rng, rng.choice(recent), i))
+            else:
+                articles.append(make_article(rng, 10_000_000 + i, people, topics))
+        items = []
+        for art, (minhash, simhash) in zip(articles, fingerprints(articles, jobs)):
+            items.append(
+                {
+                    "article_hash": sha256_text(art["url"]),
+                    "article_url": art["url"],
+                    "title": art["title"],
+                    "body": art["body"],
+                    "topic": art["topic"],
+                    "person": art["person"],
+                    "image_url": None,
+                    "image_source": None,
+                    "score": round(rng.uniform(0, 10), 3),
+                    "selected_at": (now - timedelta(hours=rng.uniform(0, 144))).isoformat(),
+                    "canonical_url": art["url"],
+                    "minhash": minhash,
+                    "simhash": simhash,
+                }
+            )
+        store.upsert_many(items)
+        _progress("queue", min(m, offset + BATCH_ROWS), m, started)
+    print(file=sys.stderr)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="fill a SQLite DB with synthetic posts and queued articles")
+    parser.add_argument("--db", default="data/load.sqlite3")
+    parser.add_argument("--posts", type=int, default=10_000, help="N rows of post history")
+    parser.add_argument("--queued", type=int, default=1_000, help="M queued articles")
+    parser.add_argument("--days", type=int, default=730, help="history span the posts are spread over")
+    parser.add_argument("--dup-rate", type=float, default=0.05, help="share of queued articles rewritten from posts")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="processes for fingerprinting")
+    parser.add_argument("--force", action="store_true", help="replace an existing database")
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        if not args.force:
+            parser.error(f"{args.db} exists; pass --force to replace it")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+
+    started = time.perf_counter()
+    store = Store(args.db)
+    try:
+        recent = generate_posts(store, args.posts, args.days, args.seed, args.jobs)
+        generate_queue(store, args.queued, args.seed, args.jobs, args.dup_rate, recent)
+    finally:
+        store.close()
+    size_mb = os.path.getsize(args.db) / 1024 / 1024
+    print(f"{args.db}: {args.posts} posts, {args.queued} queued, {size_mb:.1f} MB in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+
+from src.matcher import AhoCorasick, get_matcher
+from src.text import normalize_text
+
+ROOT = Path(__file__).resolve().parent.parent
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+
+def legacy_keyword_scan(text: str, people: list[dict], themes: list[str], practical: list[str], topics: dict):
+    # The keyword checks of rank_article before src/matcher.py: one `in` scan per keyword, no counts.
+    theme_hits = sum(1 for th in themes if any(t in text for t in normalize_text(th).split() if t))
+    practical_hits = sum(1 for kw in practical if kw in text)
+    person = None
+    for p in people:
+        tokens = [normalize_text(p["name"])] + [normalize_text(k) for k in p.get("keywords", [])]
+        if any(tok and tok in text for tok in tokens):
+            person = p.get("name")
+            break
+    topic = next((label for label, kws in topics.items() if any(normalize_text(kw) in text for kw in kws)), None)
+    return theme_hits, practical_hits, person, topic
+
+
+def naive_counts(text: str, terms: list[str]) -> dict[str, int]:
+    return {t: n for t in terms if (n := text.count(t))}
+
+
+def _timeit(fn, number: int) -> float:
+    started = time.perf_counter()
+    for _ in range(number):
+        fn()
+    return (time.perf_counter() - started) / number * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="keyword matcher micro-benchmark")
+    parser.add_argument("--number", type=int, default=500)
+    args = parser.parse_args()
+
+    rules = json.loads((ROOT / "config" / "rules.json").read_text(encoding="utf-8"))
+    people = json.loads((ROOT / "config" / "people.json").read_text(encoding="utf-8"))
+    themes, practical, topics = rules["themes"], rules["practical_keywords"], rules["topics"]
+    matcher = get_matcher(themes, people, topics, practical)
+    automaton = AhoCorasick(matcher.terms)
+
+    print(f"config: {len(matcher.terms)} terms")
+    print(f"{'sample':<18}{'chars':>7}{'legacy us':>11}{'automaton us':>14}{'match us':>10}{'vs automaton':>14}")
+    for path in sorted(FIXTURES.glob("*_article.txt")):
+        text = normalize_text(path.read_text(encoding="utf-8"))
+        hits = matcher.match(text)
+        assert hits.counts == naive_counts(text, matcher.terms), path.name
+        assert {matcher.terms[i]: n for i, n in automaton.counts(text).items()} == hits.counts, path.name
+        old = _timeit(lambda: legacy_keyword_scan(text, people, themes, practical, topics), args.number)
+        auto = _timeit(lambda: automaton.counts(text), args.number)
+        new = _timeit(lambda: matcher.match(text), args.number)
+        print(f"{path.stem:<18}{len(text):>7}{old:>11.1f}{auto:>14.1f}{new:>10.1f}{auto / new:>13.1f}x")
+
+    # Where one automaton pass starts to beat a str.count per term (src.matcher.AUTOMATON_MIN_TERMS).
+    text = normalize_text((FIXTURES / "en_article.txt").read_text(encoding="utf-8"))
+    words = sorted(set(text.split()))
+    rng = random.Random(7)
+    print(f"\n{'terms':>7}{'str.count us':>14}{'automaton us':>14}")
+    for n in (25, 100, 200, 400, 800, 1600):
+        terms = [rng.choice(words) + rng.choice(["", " ai", "s", "ing"]) for _ in range(n)]
+        terms = list(dict.fromkeys(terms))
+        automaton = AhoCorasick(terms)
+        assert {terms[i]: c for i, c in automaton.counts(text).items()} == naive_counts(text, terms), n
+        count = _timeit(lambda: naive_counts(text, terms), max(10, args.number // 10))
+        auto = _timeit(lambda: automaton.counts(text), max(10, args.number // 10))
+        print(f"{len(terms):>7}{count:>14.1f}{auto:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import argparse
+import re
+import time
+from pathlib import Path
+
+from src.text import jaccard_similarity, normalize_text, token_set
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+
+def legacy_normalize_text(text: str) -> str:
+    text = text.lower().strip()
+    text = re.sub(r"https?://\S+", "", text)
+    text = re.sub(r"[^\w\sぁ-んァ-ン一-龥]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def legacy_jaccard_similarity(a: str, b: str) -> float:
+    sa, sb = set(legacy_normalize_text(a).split()), set(legacy_normalize_text(b).split())
+    if not sa or not sb:
+        return 0.0
+    return len(sa & sb) / len(sa | sb)
+
+
+def _timeit(fn, arg, number: int) -> float:
+    started = time.perf_counter()
+    for _ in range(number):
+        fn(arg)
+    return (time.perf_counter() - started) / number * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="normalize_text micro-benchmark")
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    samples = {p.stem: p.read_text(encoding="utf-8") for p in sorted(FIXTURES.glob("*_article.txt"))}
+    for name, body in list(samples.items()):
+        title = body.splitlines()[0][:60]
+        samples[f"{name}:title"] = title
+    samples["topic"] = "医療AI"
+
+    print(f"{'sample':<22}{'chars':>7}{'legacy us':>12}{'new us':>10}{'speedup':>9}")
+    for name, text in samples.items():
+        assert normalize_text(text) == legacy_normalize_text(text), name
+        assert token_set(text) == set(legacy_normalize_text(text).split()), name
+        old = _timeit(legacy_normalize_text, text, args.number)
+        new = _timeit(normalize_text, text, args.number)
+        print(f"{name:<22}{len(text):>7}{old:>12.2f}{new:>10.2f}{old / new:>8.1f}x")
+
+    pairs = [("医療AI", "AI活用事例"), ("教育AI", "教育AI"), ("金融AI", "医療AI")]
+    old = _timeit(lambda ps: [legacy_jaccard_similarity(a, b) for a, b in ps], pairs, args.number)
+    new = _timeit(lambda ps: [jaccard_similarity(a, b) for a, b in ps], pairs, args.number)
+    print(f"{'jaccard x3 (topics)':<22}{'':>7}{old:>12.2f}{new:>10.2f}{old / new:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
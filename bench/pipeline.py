@@ -0,0 +1,221 @@
+import argparse
+import itertools
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+from bench.replay import FIXTURES, Replay, replay
+from src import async_engine
+from src import main as bot
+from src.collector import collect_candidates
+from src.dedupe import DedupeIndex, fingerprint
+from src.extractor import extract_article, parse_article, shutdown_parse_pool
+from src.matcher import get_matcher
+from src.ranker import rank_articles
+from src.thumbnail import generate_thumbnail
+from src.utils import sha256_text
+
+BASELINE = Path(__file__).resolve().parent / "baseline.json"
+ARTICLES = ["hospital-triage", "insurer-callcenter", "school-writing-tutor", "university-feedback", "bank-credit-memo"]
+
+Target = Callable[[], object]
+CASES: dict[str, Callable[[Replay], Target | tuple[Callable[[], None], Target]]] = {}
+
+
+def case(name: str):
+    # A case gets the replay context and returns the call to time, optionally with an untimed per-round setup.
+    def register(fn):
+        CASES[name] = fn
+        return fn
+
+    return register
+
+
+def _article(rp: Replay, slug: str) -> dict:
+    html = (FIXTURES / "articles" / f"{slug}.html").read_text(encoding="utf-8")
+    return parse_article(rp.server.url(f"/articles/{slug}"), html.replace("{base}", rp.server.base))
+
+
+def _rules() -> dict:
+    with open("config/rules.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@case("collect_candidates")
+def _collect(rp: Replay) -> Target:
+    return lambda: collect_candidates(rp.server.sources)
+
+
+if async_engine.available():
+
+    @case("collect_candidates[async]")
+    def _collect_async(rp: Replay) -> Target:
+        return lambda: async_engine.collect_candidates(rp.server.sources)
+
+
+@case("extract_article")
+def _extract(rp: Replay) -> Target:
+    url = rp.server.url("/articles/hospital-triage")
+    return lambda: extract_article(url)
+
+
+@case("rank_articles")
+def _rank(rp: Replay) -> Target:
+    # One batch, the way build_queue ranks what extraction streams in.
+    rules = _rules()
+    with open("config/people.json", "r", encoding="utf-8") as f:
+        people = json.load(f)
+    matcher = get_matcher(rules["themes"], people, rules.get("topics"), rules.get("practical_keywords"))
+    articles = [_article(rp, slug) for slug in ARTICLES]
+    weight = float(rules.get("ranker", {}).get("relevance_weight", 2.0))
+    return lambda: rank_articles(articles, people, rules["themes"], matcher, relevance_weight=weight)
+
+
+@case("_is_near_duplicate")
+def _dedupe(rp: Replay) -> Target:
+    # 14 days of history at three posts a day, each a reworded fixture so the LSH buckets are not trivially empty.
+    articles = [_article(rp, slug) for slug in ARTICLES]
+    index = DedupeIndex()
+    for i in range(42):
+        art = articles[i % len(articles)]
+        body = " ".join(reversed(art["body"].split(" ")))[: 600 + i * 17]
+        minhash, simhash = fingerprint(f"{art['title']} #{i}", body)
+        url = f"{art['url']}?v={i}"
+        index.add({"article_url": url, "article_hash": sha256_text(url), "minhash": minhash, "simhash": simhash})
+    candidates = [
+        {
+            "article_url": art["url"],
+            "article_hash": sha256_text(art["url"]),
+            "topic": "新トピック",
+            "minhash": art["minhash"],
+            "simhash": art["simhash"],
+        }
+        for art in articles
+    ]
+    return lambda: [bot._is_near_duplicate(index, c) for c in candidates]  # pylint: disable=protected-access
+
+
+@case("generate_thumbnail")
+def _thumbnail(rp: Replay) -> Target:
+    # A new title every call, so each round measures a render rather than a cache hit.
+    article = _article(rp, "hospital-triage")
+    counter = itertools.count()
+    out = str(rp.workdir / "thumb.jpg")
+
+    def render() -> str:
+        return generate_thumbnail({**article, "title": f"{article['title']} {next(counter)}"}, False, out)
+
+    return render
+
+
+@case("run")
+def _run(rp: Replay) -> tuple[Callable[[], None], Target]:
+    def target() -> None:
+        posts = len(rp.x.posts)
+        if rp.run(1) != 0 or len(rp.x.posts) != posts + 1:
+            raise RuntimeError("run() did not post to the fake X API")
+
+    def setup() -> None:
+        # Each cron run is a new process, so every round also starts the parse workers from scratch.
+        rp.fresh_state()
+        shutdown_parse_pool()
+
+    return setup, target
+
+
+def measure(setup: Callable[[], None] | None, target: Target, rounds: int, warmup: int) -> dict:
+    timings = []
+    for i in range(warmup + rounds):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        target()
+        elapsed = (time.perf_counter() - started) * 1000
+        if i >= warmup:
+            timings.append(elapsed)
+    return {
+        "rounds": rounds,
+        "min_ms": round(min(timings), 3),
+        "median_ms": round(statistics.median(timings), 3),
+        "mean_ms": round(statistics.fmean(timings), 3),
+        "stdev_ms": round(statistics.stdev(timings), 3) if len(timings) > 1 else 0.0,
+    }
+
+
+def compare(results: dict, baseline: dict, stat: str = "min_ms") -> dict[str, float]:
+    # Ratio to the baseline; the minimum is the least noisy estimate of what the code itself costs.
+    ratios = {}
+    for name, res in results.items():
+        base = baseline.get("cases", {}).get(name)
+        if base and base.get(stat):
+            ratios[name] = res[stat] / base[stat]
+    return ratios
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="pipeline benchmark suite on the offline replay harness")
+    parser.add_argument("-k", dest="only", action="append", default=[], help="run cases whose name contains this")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="added to every stub response")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--stat", choices=["min", "median", "mean"], default="min", help="statistic to compare")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown (0.25 = 25%%)")
+    parser.add_argument("--save", action="store_true", help="store these results as the new baseline")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    names = [n for n in CASES if not args.only or any(k in n for k in args.only)]
+    results = {}
+    with replay(args.latency_ms) as rp:
+        for name in names:
+            prepared = CASES[name](rp)
+            setup, target = prepared if isinstance(prepared, tuple) else (None, prepared)
+            # run() rebuilds everything each round, so it gets fewer of them.
+            rounds = max(3, args.rounds // 4) if name == "run" else args.rounds
+            results[name] = measure(setup, target, rounds, args.warmup)
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8")) if args.baseline.exists() else {}
+    stat = f"{args.stat}_ms"
+    ratios = compare(results, baseline, stat)
+    regressions = [n for n, r in ratios.items() if r > 1 + args.threshold]
+
+    print(
+        f"{'case':<28}{'min ms':>10}{'median ms':>11}{'mean ms':>10}{'stdev':>9}"
+        f"{'base ' + args.stat:>14}{'change':>9}"
+    )
+    for name, res in results.items():
+        base = baseline.get("cases", {}).get(name, {}).get(stat)
+        change = f"{(ratios[name] - 1) * 100:+.0f}%" if name in ratios else "-"
+        flag = "  REGRESSION" if name in regressions else ""
+        print(
+            f"{name:<28}{res['min_ms']:>10.2f}{res['median_ms']:>11.2f}{res['mean_ms']:>10.2f}"
+            f"{res['stdev_ms']:>9.2f}{base if base is not None else '-':>14}{change:>9}{flag}"
+        )
+
+    if args.save:
+        saved = {
+            "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+            "latency_ms": args.latency_ms,
+            "cases": {**baseline.get("cases", {}), **results},
+        }
+        args.baseline.write_text(json.dumps(saved, indent=2) + "\n", encoding="utf-8")
+        print(f"Saved baseline to {args.baseline}")
+        return
+    if baseline and baseline.get("machine", {}).get("platform") != platform.platform():
+        print("Note: baseline was recorded on a different machine; compare with care.")
+    if baseline and baseline.get("latency_ms", 0.0) != args.latency_ms:
+        print(f"Note: baseline was recorded with --latency-ms {baseline.get('latency_ms', 0.0)}.")
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from email import policy
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Iterator
+from urllib.parse import parse_qs, urlparse
+
+from src import http_cache
+from src import main as bot
+from src.x_client import XClient
+
+ROOT = Path(__file__).resolve().parent.parent
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "replay"
+TEXT_TYPES = ("text/", "application/rss+xml", "application/atom+xml", "application/xml")
+
+
+class FakeX:
+    # Just enough of media/upload (simple and INIT/APPEND/FINALIZE) and /2/tweets to exercise XClient.
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1_700_000_000_000_000_000)
+        self._pending: dict[str, dict] = {}
+        self.media: dict[str, int] = {}
+        self.uploads: list[dict] = []
+        self.posts: list[dict] = []
+
+    def upload(self, fields: dict[str, str], media: bytes | None) -> tuple[int, dict | None]:
+        command = fields.get("command")
+        with self._lock:
+            if command is None:
+                if not media:
+                    return 400, {"errors": [{"message": "media is required"}]}
+                media_id = str(next(self._ids))
+                self.media[media_id] = len(media)
+                self.uploads.append({"media_id": media_id, "bytes": len(media), "mode": "simple"})
+                return 200, {"media_id": int(media_id), "media_id_string": media_id, "size": len(media)}
+            if command == "INIT":
+                media_id = str(next(self._ids))
+                self._pending[media_id] = {"total": int(fields.get("total_bytes", 0)), "segments": {}}
+                return 202, {"media_id": int(media_id), "media_id_string": media_id, "expires_after_secs": 86400}
+            pending = self._pending.get(fields.get("media_id", ""))
+            if pending is None:
+                return 400, {"errors": [{"message": "unknown media_id"}]}
+            if command == "APPEND":
+                pending["segments"][int(fields.get("segment_index", 0))] = len(media or b"")
+                return 204, None
+            if command == "FINALIZE":
+                media_id = fields["media_id"]
+                size = sum(pending["segments"].values())
+                if size != pending["total"]:
+                    return 400, {"errors": [{"message": f"got {size} of {pending['total']} bytes"}]}
+                del self._pending[media_id]
+                self.media[media_id] = size
+                self.uploads.append({"media_id": media_id, "bytes": size, "mode": "chunked"})
+                return 201, {"media_id": int(media_id), "media_id_string": media_id, "size": size}
+        return 400, {"errors": [{"message": f"unknown command {command}"}]}
+
+    def tweet(self, payload: dict) -> tuple[int, dict]:
+        text = payload.get("text") or ""
+        media_ids = payload.get("media", {}).get("media_ids", [])
+        with self._lock:
+            if not text:
+                return 400, {"errors": [{"message": "text is required"}]}
+            missing = [m for m in media_ids if m not in self.media]
+            if missing:
+                return 400, {"errors": [{"message": f"unknown media_ids {missing}"}]}
+            tweet_id = str(next(self._ids))
+            self.posts.append({"id": tweet_id, "text": text, "media_ids": media_ids})
+        return 201, {"data": {"id": tweet_id, "text": text}}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keep-alive like a real server; without TCP_NODELAY every response would wait out a delayed ACK.
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: "ReplayServer"
+
+    def log_message(self, format, *args) -> None:  # pylint: disable=redefined-builtin
+        pass
+
+    def _send(self, status: int, body: bytes = b"", content_type: str | None = None, headers: dict | None = None):
+        self.send_response(status)
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def _send_json(self, status: int, payload: dict | None) -> None:
+        body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        self._send(status, body, "application/json" if payload is not None else None)
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        self.server.hit(self.path)
+        entry = self.server.resources.get(urlparse(self.path).path)
+        if entry is None:
+            self._send(404, b"not found", "text/plain")
+            return
+        body, content_type, etag = entry
+        if self.headers.get("If-None-Match") == etag:
+            self._send(304, headers={"ETag": etag})
+            return
+        self._send(200, body, content_type, {"ETag": etag})
+
+    def _form(self) -> tuple[dict[str, str], bytes | None]:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        content_type = self.headers.get("Content-Type", "")
+        if not content_type.startswith("multipart/form-data"):
+            return {k: v[0] for k, v in parse_qs(body.decode("utf-8")).items()}, None
+        message = BytesParser(policy=policy.HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode("utf-8") + body
+        )
+        fields, media = {}, None
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            payload = part.get_payload(decode=True) or b""
+            if name == "media":
+                media = payload
+            else:
+                fields[name] = payload.decode("utf-8")
+        return fields, media
+
+    def do_POST(self) -> None:  # pylint: disable=invalid-name
+        self.server.hit(self.path)
+        if not self.headers.get("Authorization", "").startswith("OAuth "):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            self._send_json(401, {"errors": [{"message": "OAuth 1.0a signature required"}]})
+            return
+        path = urlparse(self.path).path
+        if path == "/1.1/media/upload.json":
+            self._send_json(*self.server.x.upload(*self._form()))
+        elif path == "/2/tweets":
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            self._send_json(*self.server.x.tweet(payload))
+        else:
+            self._send_json(404, {"errors": [{"message": "not found"}]})
+
+
+class ReplayServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, fixtures: Path = FIXTURES, latency_ms: float = 0.0) -> None:
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.base = f"http://127.0.0.1:{self.server_address[1]}"
+        self.latency = latency_ms / 1000
+        self.x = FakeX()
+        self.requests: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.resources = self._load(fixtures)
+        self._thread = threading.Thread(target=self.serve_forever, name="replay-server", daemon=True)
+
+    def _load(self, fixtures: Path) -> dict[str, tuple[bytes, str, str]]:
+        # Fixtures refer to the server as {base}, filled in once the port is known.
+        manifest = json.loads((fixtures / "manifest.json").read_text(encoding="utf-8"))
+        resources = {}
+        for path, entry in manifest.items():
+            if entry.get("file"):
+                body = (fixtures / entry["file"]).read_bytes()
+            else:
+                body = entry.get("body", "").encode("utf-8")
+            if entry["type"].startswith(TEXT_TYPES):
+                body = body.replace(b"{base}", self.base.encode("utf-8"))
+            resources[path] = (body, entry["type"], f'"{hashlib.sha1(body).hexdigest()}"')
+        return resources
+
+    def handle_error(self, request, client_address) -> None:
+        # Clients dropping idle keep-alive connections is normal here.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def hit(self, path: str) -> None:
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def start(self) -> "ReplayServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def url(self, path: str) -> str:
+        return f"{self.base}{path}"
+
+    @property
+    def sources(self) -> dict:
+        return {"rss": [self.url("/feeds/tech.xml"), self.url("/feeds/biz.xml")], "list_pages": [self.url("/news/")]}
+
+
+class Replay:
+    def __init__(self, server: ReplayServer, workdir: Path) -> None:
+        self.server = server
+        self.workdir = workdir
+        self._fresh = itertools.count()
+
+    @property
+    def x(self) -> FakeX:
+        return self.server.x
+
+    def fresh_state(self) -> None:
+        # New database and caches, so the next run() starts from nothing like a first deployment.
+        n = next(self._fresh)
+        os.environ["DB_PATH"] = str(self.workdir / f"data/bot-{n}.sqlite3")
+        os.environ["HTTP_CACHE_DIR"] = str(self.workdir / f"data/http_cache-{n}")
+        os.environ["THUMB_CACHE_DIR"] = str(self.workdir / f"data/thumbs-{n}")
+        http_cache._cache = None  # pylint: disable=protected-access
+
+    def run(self, slot: int = 1) -> int:
+        return bot.run(slot_override=slot)
+
+
+def _write_configs(workdir: Path, server: ReplayServer) -> None:
+    config = workdir / "config"
+    config.mkdir(parents=True, exist_ok=True)
+    shutil.copy(ROOT / "config" / "rules.json", config / "rules.json")
+    people = json.loads((ROOT / "config" / "people.json").read_text(encoding="utf-8"))
+    for person in people:
+        person["image_url"] = server.url("/img/cover.jpg")
+    (config / "people.json").write_text(json.dumps(people, ensure_ascii=False), encoding="utf-8")
+    (config / "sources.json").write_text(json.dumps(server.sources), encoding="utf-8")
+
+
+@contextmanager
+def replay(latency_ms: float = 0.0, allow_image: bool = False) -> Iterator[Replay]:
+    # Stub server + fake X API + a scratch working directory with configs pointing at them.
+    server = ReplayServer(latency_ms=latency_ms).start()
+    workdir = Path(tempfile.mkdtemp(prefix="replay-"))
+    saved_env = dict(os.environ)
+    saved_urls = XClient.UPLOAD_URL, XClient.POST_URL
+    saved_cwd = os.getcwd()
+    try:
+        _write_configs(workdir, server)
+        os.environ.update(
+            {
+                "DRY_RUN": "false",
+                "ALLOW_IMAGE": str(allow_image).lower(),
+                "COOLDOWN_SECONDS": "0",
+                "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING"),
+                "X_API_KEY": "replay",
+                "X_API_SECRET": "replay",
+                "X_ACCESS_TOKEN": "replay",
+                "X_ACCESS_TOKEN_SECRET": "replay",
+            }
+        )
+        XClient.UPLOAD_URL = server.url("/1.1/media/upload.json")
+        XClient.POST_URL = server.url("/2/tweets")
+        bot._json_cache.clear()  # pylint: disable=protected-access
+        os.chdir(workdir)
+        rp = Replay(server, workdir)
+        rp.fresh_state()
+        yield rp
+    finally:
+        os.chdir(saved_cwd)
+        XClient.UPLOAD_URL, XClient.POST_URL = saved_urls
+        os.environ.clear()
+        os.environ.update(saved_env)
+        http_cache._cache = None  # pylint: disable=protected-access
+        bot._json_cache.clear()  # pylint: disable=protected-access
+        server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="run() end to end against recorded fixtures and a fake X API")
+    parser.add_argument("--slot", type=int, default=1, choices=[1, 2, 3])
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="added to every stub response")
+    parser.add_argument("--allow-image", action="store_true")
+    args = parser.parse_args()
+
+    with replay(args.latency_ms, args.allow_image) as rp:
+        code = rp.run(args.slot)
+        conn = sqlite3.connect(os.environ["DB_PATH"])
+        conn.row_factory = sqlite3.Row
+        run = conn.execute("SELECT * FROM runs ORDER BY id DESC LIMIT 1").fetchone()
+        queued = conn.execute("SELECT title, topic, score FROM article_queue ORDER BY score DESC").fetchall()
+        conn.close()
+
+        print(f"exit={code} status={run['status']} duration={run['duration_ms']:.0f}ms")
+        for name, stage in json.loads(run["summary"])["stages"].items():
+            print(f"  {name:<28}{stage['calls']:>5} calls{stage['wall_ms']:>10.1f} ms")
+        print(f"queue ({len(queued)}):")
+        for row in queued:
+            print(f"  {row['score']:>6.2f}  {row['topic']:<10}{row['title'][:60]}")
+        print(f"stub requests: {sum(rp.server.requests.values())}  uploads: {rp.x.uploads}")
+        for post in rp.x.posts:
+            print(f"tweet {post['id']} media={post['media_ids']}\n{post['text']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import shutil
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+
+from bench.loadgen import ROOT, generate_posts, generate_queue, lead_fingerprint, make_article, rewrite
+from bench.pipeline import measure
+from bench.replay import Replay, replay
+from src import main as bot
+from src.dedupe import DedupeIndex
+from src.matcher import DEFAULT_TOPIC
+from src.store import Store
+from src.utils import sha256_text
+
+PROBES = 100
+
+
+def _sizes(value: str) -> list[int]:
+    return sorted({int(v) for v in value.split(",") if v.strip()})
+
+
+def _drop(path: Path) -> None:
+    for suffix in ("", "-wal", "-shm"):
+        Path(f"{path}{suffix}").unlink(missing_ok=True)
+
+
+def prepare_db(cache_dir: Path, n: int, m: int, days: int, seed: int, jobs: int) -> tuple[Path, list[dict]]:
+    # Post history is generated once per N and shared by every M; both are kept for later runs.
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    base = cache_dir / f"posts-{n}-d{days}-s{seed}.sqlite3"
+    recent_path = base.with_suffix(".recent.json")
+    if not base.exists() or not recent_path.exists():
+        _drop(base)
+        store = Store(str(base))
+        try:
+            recent = generate_posts(store, n, days, seed, jobs)
+        finally:
+            store.close()
+        recent_path.write_text(json.dumps(recent, ensure_ascii=False), encoding="utf-8")
+    recent = json.loads(recent_path.read_text(encoding="utf-8"))
+
+    db = cache_dir / f"load-{n}-{m}-d{days}-s{seed}.sqlite3"
+    if not db.exists():
+        tmp = db.with_suffix(".tmp")
+        _drop(tmp)
+        shutil.copy(base, tmp)
+        store = Store(str(tmp))
+        try:
+            generate_queue(store, m, seed, jobs, recent=recent)
+        finally:
+            store.close()
+        os.replace(tmp, db)
+    return db, recent
+
+
+def make_probes(recent: list[dict], seed: int) -> list[dict]:
+    # Half new stories, half rewrites of recent posts. No topic or person, so every check reaches the
+    # MinHash LSH and SimHash lookups, the part whose cost depends on the history size.
+    rng = random.Random(seed + 7)
+    articles = [make_article(rng, 20_000_000 + i, [], [DEFAULT_TOPIC]) for i in range(PROBES // 2)]
+    articles += [rewrite(rng, rng.choice(recent), i) for i in range(PROBES - len(articles))]
+    probes = []
+    for art in articles:
+        minhash, simhash = lead_fingerprint(art)
+        probes.append(
+            {
+                "article_url": art["url"],
+                "article_hash": sha256_text(art["url"]),
+                "minhash": minhash,
+                "simhash": simhash,
+            }
+        )
+    return probes
+
+
+def peak_kib(setup: Callable[[], None] | None, target: Callable[[], object]) -> float:
+    # Python heap only: SQLite's own page cache is allocated outside tracemalloc's view.
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        target()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+class QueueBuild:
+    # build_queue mutates the database, so every round starts from a fresh copy with empty HTTP caches.
+    def __init__(self, rp: Replay, db: Path, rules: dict, people: list[dict], dedupe_days: int) -> None:
+        self.rp, self.db, self.rules, self.people, self.dedupe_days = rp, db, rules, people, dedupe_days
+        self.work = rp.workdir / "scaling.sqlite3"
+        self.store: Store | None = None
+
+    def setup(self) -> None:
+        self.close()
+        _drop(self.work)
+        shutil.copy(self.db, self.work)
+        self.rp.fresh_state()
+
+    def target(self) -> None:
+        self.store = Store(str(self.work))
+        bot.build_queue(self.store, self.rp.server.sources, self.people, self.rules, self.dedupe_days)
+
+    def close(self) -> None:
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+
+def bench_size(rp: Replay, db: Path, probes: list[dict], m: int, args: argparse.Namespace) -> dict:
+    with open(ROOT / "config" / "rules.json", "r", encoding="utf-8") as f:
+        rules = json.load(f)
+    with open(ROOT / "config" / "people.json", "r", encoding="utf-8") as f:
+        people = json.load(f)
+    # Let the generated queue survive eviction; otherwise every M collapses to the configured max_rows.
+    rules["queue"] = {**rules.get("queue", {}), "max_rows": max(500, 2 * m)}
+
+    store = Store(str(db))
+    index = DedupeIndex.from_rows(store.dedupe_rows(args.dedupe_days))
+    window = len(store.dedupe_rows(args.dedupe_days))
+    is_duplicate = bot._is_near_duplicate  # pylint: disable=protected-access
+    hits = sum(is_duplicate(index, p) for p in probes)
+
+    def select() -> None:
+        best = store.best_queue_candidate()
+        store.load_body(best["article_hash"])
+        store.top_queue_candidates(3)
+
+    cases = {
+        "dedupe.load": (None, lambda: DedupeIndex.from_rows(store.dedupe_rows(args.dedupe_days))),
+        "dedupe.check": (None, lambda: [is_duplicate(index, p) for p in probes]),
+        "select": (None, select),
+    }
+    results = {}
+    try:
+        for name, (setup, target) in cases.items():
+            results[name] = {**measure(setup, target, args.rounds, 2), "peak_kib": round(peak_kib(setup, target), 1)}
+    finally:
+        store.close()
+
+    build = QueueBuild(rp, db, rules, people, args.dedupe_days)
+    try:
+        results["queue_build"] = {
+            **measure(build.setup, build.target, max(3, args.rounds // 4), 1),
+            "peak_kib": round(peak_kib(build.setup, build.target), 1),
+        }
+    finally:
+        build.close()
+    return {"window_posts": window, "probe_hits": hits, "db_mb": round(db.stat().st_size / 1024 / 1024, 1), **results}
+
+
+def slope(points: list[tuple[int, float]]) -> float | None:
+    # Least-squares exponent k in time ~ size^k: about 0 is flat, 1 linear.
+    points = [(x, y) for x, y in points if x > 0 and y > 0]
+    if len(points) < 2:
+        return None
+    xs, ys = [math.log(x) for x, _ in points], [math.log(y) for _, y in points]
+    mx, my = sum(xs) / len(xs), sum(ys) / len(ys)
+    var = sum((x - mx) ** 2 for x in xs)
+    return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / var if var else None
+
+
+def _exponent(k: float | None) -> str:
+    return "-" if k is None else f"{k:+.2f}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="time and memory of queue building, dedupe and selection vs. DB size")
+    parser.add_argument("--posts", type=_sizes, default=[1000, 4000, 16000], help="comma-separated N values")
+    parser.add_argument("--queued", type=_sizes, default=[100, 400, 1600], help="comma-separated M values")
+    parser.add_argument("--days", type=int, default=730, help="history span the posts are spread over")
+    parser.add_argument("--dedupe-days", type=int, default=int(os.getenv("DEDUPE_DAYS", "14")))
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="processes for fingerprinting")
+    parser.add_argument("--cache-dir", type=Path, default=Path("data/loadgen"), help="generated databases")
+    parser.add_argument("--json", type=Path, help="also write the results here")
+    args = parser.parse_args()
+    cache_dir = args.cache_dir.resolve()
+    out = args.json.resolve() if args.json else None
+
+    grid = {}
+    for n in args.posts:
+        for m in args.queued:
+            grid[(n, m)] = prepare_db(cache_dir, n, m, args.days, args.seed, args.jobs)
+
+    logging.disable(logging.WARNING)
+    results = {}
+    with replay() as rp:
+        for (n, m), (db, recent) in grid.items():
+            results[(n, m)] = bench_size(rp, db, make_probes(recent, args.seed), m, args)
+
+    ops = ["queue_build", "dedupe.load", "dedupe.check", "select"]
+    print(f"{'N posts':>8}{'M queued':>9}{'DB MB':>7}{'window':>8}{'hits':>6}  " + "".join(f"{op:>22}" for op in ops))
+    print(f"{'':>40}" + "".join(f"{'median ms / peak KiB':>22}" for _ in ops))
+    for (n, m), res in results.items():
+        cells = "".join(f"{res[op]['median_ms']:>12.2f} /{res[op]['peak_kib']:>8.0f}" for op in ops)
+        print(f"{n:>8}{m:>9}{res['db_mb']:>7}{res['window_posts']:>8}{res['probe_hits']:>6}  {cells}")
+
+    # Growth along each axis with the other held at its largest value.
+    n_max, m_max = max(args.posts), max(args.queued)
+    print("\ngrowth exponent k (time ~ size^k; 0 = flat, 1 = linear)")
+    for op in ops:
+        kn = slope([(n, results[(n, m_max)][op]["median_ms"]) for n in args.posts])
+        km = slope([(m, results[(n_max, m)][op]["median_ms"]) for m in args.queued])
+        print(f"  {op:<14} N: {_exponent(kn):>6}   M: {_exponent(km):>6}")
+
+    if out:
+        rows = [{"posts": n, "queued": m, **res} for (n, m), res in results.items()]
+        out.write_text(json.dumps({"dedupe_days": args.dedupe_days, "results": rows}, indent=2) + "\n", "utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import argparse
+import time
+from io import BytesIO
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from src.thumbnail import HEIGHT, WIDTH, encode_image, load_cover
+
+SIZES = [(4032, 3024), (6000, 4000), (3024, 4032), (2400, 1350), (1600, 1200)]
+
+
+def synthetic_photo(size: tuple[int, int], seed: int) -> bytes:
+    # Noise plus shapes, blurred: compresses like a photo rather than a flat test card.
+    small = Image.effect_noise((size[0] // 8, size[1] // 8), 60 + seed * 10).convert("RGB")
+    img = small.resize(size, Image.BICUBIC)
+    draw = ImageDraw.Draw(img)
+    for i in range(12):
+        x, y = (i * 997 + seed * 131) % size[0], (i * 571 + seed * 53) % size[1]
+        draw.ellipse([x, y, x + size[0] // 5, y + size[1] // 5], fill=((i * 40) % 255, (seed * 70) % 255, 120))
+    img = img.filter(ImageFilter.GaussianBlur(2))
+    buf = BytesIO()
+    img.save(buf, format="JPEG", quality=92)
+    return buf.getvalue()
+
+
+def legacy(data: bytes) -> bytes:
+    img = Image.open(BytesIO(data)).convert("RGB").resize((WIDTH, HEIGHT))
+    buf = BytesIO()
+    img.save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def current(data: bytes, fmt: str, max_bytes: int) -> bytes:
+    return encode_image(load_cover(data), fmt, max_bytes)
+
+
+def _timeit(fn, number: int) -> tuple[float, bytes]:
+    out = fn()
+    started = time.perf_counter()
+    for _ in range(number):
+        out = fn()
+    return (time.perf_counter() - started) / number * 1000, out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="thumbnail image pipeline benchmark")
+    parser.add_argument("--number", type=int, default=5)
+    parser.add_argument("--max-kb", type=int, default=350)
+    parser.add_argument("--format", choices=["JPEG", "WEBP"], default="JPEG")
+    args = parser.parse_args()
+
+    print(f"{'source':<12}{'src KB':>8}{'legacy ms':>11}{'legacy KB':>11}{'new ms':>9}{'new KB':>8}{'speedup':>9}")
+    for seed, size in enumerate(SIZES):
+        data = synthetic_photo(size, seed)
+        old_ms, old_out = _timeit(lambda: legacy(data), args.number)
+        new_ms, new_out = _timeit(lambda: current(data, args.format, args.max_kb * 1024), args.number)
+        assert Image.open(BytesIO(new_out)).size == (WIDTH, HEIGHT)
+        print(
+            f"{size[0]}x{size[1]:<7}{len(data) / 1024:>8.0f}{old_ms:>11.1f}{len(old_out) / 1024:>11.0f}"
+            f"{new_ms:>9.1f}{len(new_out) / 1024:>8.0f}{old_ms / new_ms:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
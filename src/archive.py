@@ -0,0 +1,46 @@
+import json
+import os
+import struct
+import zlib
+from typing import Iterator
+
+CODEC = "zlib"
+_LEN = struct.Struct(">I")
+
+
+def compress_body(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"), 6)
+
+
+def decompress_body(blob: bytes | None, codec: str = CODEC) -> str:
+    if not blob:
+        return ""
+    if codec != CODEC:
+        raise ValueError(f"Unknown body codec: {codec}")
+    return zlib.decompress(blob).decode("utf-8")
+
+
+def segment_path(archive_dir: str, month: str) -> str:
+    return os.path.join(archive_dir, f"bodies-{month}.seg")
+
+
+def append_segment(path: str, records: list[tuple[dict, bytes]]) -> None:
+    # Record layout: u32 header length, JSON header, u32 blob length, compressed body.
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "ab") as f:
+        for header, blob in records:
+            raw = json.dumps(header, ensure_ascii=False).encode("utf-8")
+            f.write(_LEN.pack(len(raw)) + raw + _LEN.pack(len(blob)) + blob)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def iter_segment(path: str) -> Iterator[tuple[dict, str]]:
+    with open(path, "rb") as f:
+        while True:
+            size = f.read(_LEN.size)
+            if len(size) < _LEN.size:
+                return
+            header = json.loads(f.read(_LEN.unpack(size)[0]).decode("utf-8"))
+            blob = f.read(_LEN.unpack(f.read(_LEN.size))[0])
+            yield header, decompress_body(blob, header.get("codec", CODEC))
@@ -0,0 +1,281 @@
+import asyncio
+import logging
+import queue
+import random
+import threading
+import time
+from typing import Iterable, Iterator
+from urllib.parse import urlparse
+
+from charset_normalizer import from_bytes
+
+from . import http_client, tracing
+from .collector import PARSERS, SOURCE_RETRIES, SOURCE_RETRY_SLEEP, check_status, dedupe_candidates, source_jobs
+from .extractor import HTML_TYPES, MAX_FETCH_SECONDS, MAX_PAGE_BYTES, _parse_pool, _timed_parse
+from .health import SourceHealth
+from .http_cache import CachedResponse, get_cache
+from .http_client import ResponseRejected
+
+try:
+    import httpx
+except ImportError:  # optional: pip install "httpx[http2]"
+    httpx = None
+
+try:
+    import h2  # noqa: F401  # pylint: disable=unused-import
+
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+logger = logging.getLogger(__name__)
+
+# Same limits as the thread engine's retry(): three tries for pages, SOURCE_RETRIES for feeds.
+PAGE_RETRIES = 3
+PAGE_RETRY_SLEEP = 1.0
+
+
+def available() -> bool:
+    return httpx is not None
+
+
+def _client(concurrency: int) -> "httpx.AsyncClient":
+    connect, read = http_client.default_timeout()
+    return httpx.AsyncClient(
+        http2=HTTP2,
+        follow_redirects=True,
+        timeout=httpx.Timeout(read, connect=connect),
+        limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        headers={"User-Agent": http_client.USER_AGENT},
+    )
+
+
+async def _retry(operation, stage: str, retries: int, base_sleep: float, giveup: tuple[type[Exception], ...] = ()):
+    # Like utils.retry, but sleeps without blocking the loop; jitter keeps a burst of failures from retrying in step.
+    last_exc = None
+    for i in range(retries):
+        try:
+            return await operation()
+        except giveup:
+            raise
+        except Exception as exc:  # pylint: disable=broad-except
+            last_exc = exc
+            if i + 1 < retries:
+                tracing.record(stage, retries=1)
+                await asyncio.sleep(base_sleep * (2**i) * random.uniform(0.5, 1.5))
+    raise last_exc
+
+
+def _encoding(res: "httpx.Response", body: bytes) -> str | None:
+    if res.charset_encoding:
+        return res.charset_encoding
+    best = from_bytes(body[:64 * 1024]).best()
+    return best.encoding if best else None
+
+
+async def _get(
+    client: "httpx.AsyncClient",
+    url: str,
+    stage: str,
+    max_bytes: int | None = None,
+    content_types: tuple[str, ...] = (),
+    max_seconds: float | None = None,
+) -> CachedResponse:
+    # Async counterpart of HttpCache.get + http_client.get_limited, sharing the same cache entries.
+    cache = get_cache()
+    headers, cached = cache.prepare(url)
+    started = time.perf_counter()
+
+    async def download() -> tuple["httpx.Response", bytes]:
+        async with client.stream("GET", url, headers=headers) as res:
+            if res.status_code == 200:
+                ctype = res.headers.get("Content-Type", "").split(";", 1)[0].strip().lower()
+                if content_types and ctype and not ctype.startswith(content_types):
+                    raise ResponseRejected(f"content-type {ctype}")
+                length = res.headers.get("Content-Length", "")
+                if max_bytes is not None and length.isdigit() and int(length) > max_bytes:
+                    raise ResponseRejected(f"content-length {length} > {max_bytes}")
+            body = bytearray()
+            async for chunk in res.aiter_bytes(64 * 1024):
+                body += chunk
+                if max_bytes is not None and len(body) > max_bytes:
+                    raise ResponseRejected(f"body exceeds {max_bytes} bytes")
+            return res, bytes(body)
+
+    try:
+        res, body = await asyncio.wait_for(download(), max_seconds)
+    except asyncio.TimeoutError as exc:
+        raise ResponseRejected(f"download exceeds {max_seconds}s") from exc
+    finally:
+        http_client.record_request(urlparse(url).netloc, (time.perf_counter() - started) * 1000)
+    # The tracer's span stack is per thread, so async code always names its stage explicitly.
+    tracing.record(stage, bytes=len(body))
+    encoding = _encoding(res, body) if res.status_code == 200 else None
+    return cache.complete(url, res.status_code, res.headers, body, encoding, cached)
+
+
+async def _collect(
+    jobs: list[tuple[str, str]],
+    concurrency: int,
+    per_host: int,
+    deadline_seconds: float,
+    health: SourceHealth | None,
+) -> list[list[dict]]:
+    results: list[list[dict]] = [[] for _ in jobs]
+    limit = asyncio.Semaphore(max(1, concurrency))
+    host_limits = {urlparse(url).netloc: asyncio.Semaphore(max(1, per_host)) for _, url in jobs}
+
+    async with _client(concurrency) as client:
+
+        async def run_job(i: int, kind: str, url: str) -> None:
+            host = urlparse(url).netloc
+            async with limit, host_limits[host]:
+                started = time.perf_counter()
+                try:
+                    res = await _retry(
+                        lambda: _fetch_source(client, url, host),
+                        f"source:{host}",
+                        SOURCE_RETRIES,
+                        SOURCE_RETRY_SLEEP,
+                        giveup=(ResponseRejected,),
+                    )
+                    items = PARSERS[kind](res, url)
+                except Exception as exc:  # pylint: disable=broad-except
+                    logger.warning("%s collection failed: %s (%s)", kind, url, exc)
+                    if health is not None:
+                        health.record_failure(url, (time.perf_counter() - started) * 1000, str(exc))
+                    return
+                finally:
+                    tracing.record(f"source:{host}", calls=1, wall_ms=(time.perf_counter() - started) * 1000)
+            if health is not None:
+                health.record_success(url, (time.perf_counter() - started) * 1000, items)
+            results[i] = items
+
+        tasks = {asyncio.create_task(run_job(i, kind, url)): i for i, (kind, url) in enumerate(jobs)}
+        _, pending = await asyncio.wait(tasks, timeout=deadline_seconds)
+        # Unlike the thread engine, stragglers are really cancelled and their connections released.
+        for task in pending:
+            task.cancel()
+            kind, url = jobs[tasks[task]]
+            logger.warning("%s collection dropped after %ss deadline: %s", kind, deadline_seconds, url)
+            if health is not None:
+                health.record_failure(url, deadline_seconds * 1000, "deadline exceeded")
+        if pending:
+            await asyncio.wait(pending)
+    return results
+
+
+async def _fetch_source(client: "httpx.AsyncClient", url: str, host: str) -> CachedResponse:
+    return check_status(await _get(client, url, f"source:{host}"))
+
+
+def collect_candidates(
+    sources: dict,
+    concurrency: int = 64,
+    per_host: int = 2,
+    deadline_seconds: float = 120.0,
+    health: SourceHealth | None = None,
+) -> list[dict]:
+    jobs = source_jobs(sources, health)
+    if not jobs:
+        return []
+    return dedupe_candidates(asyncio.run(_collect(jobs, concurrency, per_host, deadline_seconds, health)))
+
+
+async def _fetch_html(
+    client: "httpx.AsyncClient", url: str, max_bytes: int, max_seconds: float
+) -> str | None:
+    started = time.perf_counter()
+    try:
+        res = await _retry(
+            lambda: _get(client, url, "fetch", max_bytes, HTML_TYPES, max_seconds),
+            "fetch",
+            PAGE_RETRIES,
+            PAGE_RETRY_SLEEP,
+            giveup=(ResponseRejected,),
+        )
+        return res.text
+    except ResponseRejected as exc:
+        logger.info("Skipped non-article response: %s (%s)", url, exc)
+        return None
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.warning("Extraction failed: %s (%s)", url, exc)
+        return None
+    finally:
+        tracing.record("fetch", calls=1, wall_ms=(time.perf_counter() - started) * 1000)
+
+
+async def _extract(
+    urls: list[str],
+    out: queue.Queue,
+    concurrency: int,
+    parse_workers: int,
+    max_bytes: int,
+    max_seconds: float,
+    deadline_seconds: float,
+) -> None:
+    loop = asyncio.get_running_loop()
+    limit = asyncio.Semaphore(max(1, concurrency))
+
+    parse_pool = _parse_pool(parse_workers)
+    async with _client(concurrency) as client:
+
+        async def run(url: str) -> None:
+            async with limit:
+                html = await _fetch_html(client, url, max_bytes, max_seconds)
+            art = None
+            if html is not None:
+                try:
+                    art, parse_ms = await loop.run_in_executor(parse_pool, _timed_parse, url, html)
+                    tracing.record("parse", calls=1, wall_ms=parse_ms, items=1)
+                except Exception as exc:  # pylint: disable=broad-except
+                    logger.warning("Extraction failed: %s (%s)", url, exc)
+            out.put((url, art))
+
+        tasks = {asyncio.create_task(run(url)): url for url in urls}
+        if not tasks:
+            return
+        _, pending = await asyncio.wait(tasks, timeout=deadline_seconds)
+        # Same bound as collection: whatever is still fetching or parsing at the deadline is cancelled and
+        # reported as failed, so a slow tail cannot hold up the run.
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+        for task in pending:
+            logger.warning("Extraction dropped after %ss deadline: %s", deadline_seconds, tasks[task])
+            out.put((tasks[task], None))
+
+
+_DONE = object()
+
+
+def extract_articles(
+    urls: Iterable[str],
+    concurrency: int = 64,
+    parse_workers: int = 2,
+    max_bytes: int = MAX_PAGE_BYTES,
+    max_seconds: float = MAX_FETCH_SECONDS,
+    deadline_seconds: float = 300.0,
+) -> Iterator[tuple[str, dict | None]]:
+    # The event loop runs on its own thread and hands results over a queue, so callers keep a plain generator.
+    out: queue.Queue = queue.Queue()
+    errors: list[BaseException] = []
+
+    def run_loop() -> None:
+        try:
+            asyncio.run(
+                _extract(list(urls), out, concurrency, parse_workers, max_bytes, max_seconds, deadline_seconds)
+            )
+        except BaseException as exc:  # pylint: disable=broad-except
+            errors.append(exc)
+        finally:
+            out.put(_DONE)
+
+    thread = threading.Thread(target=run_loop, name="extract-loop", daemon=True)
+    thread.start()
+    while (item := out.get()) is not _DONE:
+        yield item
+    thread.join()
+    if errors:
+        raise errors[0]
@@ -1,59 +1,176 @@
 import logging
-from urllib.parse import urljoin
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urljoin, urlparse
 
 import feedparser
-import requests
 from bs4 import BeautifulSoup
 
-from .utils import retry
+from . import tracing
+from .health import SourceHealth
+from .http_cache import CachedResponse, get_cache
+from .http_client import ResponseRejected
+from .utils import canonicalize_url, retry
 
 logger = logging.getLogger(__name__)
 
+# Source health decides whether a source is worth another run, so a single quick retry is enough here.
+SOURCE_RETRIES = 2
+SOURCE_RETRY_SLEEP = 0.5
 
-def collect_candidates(sources: dict) -> list[dict]:
+
+def check_status(res: CachedResponse) -> CachedResponse:
+    if 400 <= res.status_code < 500:
+        raise ResponseRejected(f"HTTP {res.status_code}")
+    if res.status_code >= 500:
+        raise RuntimeError(f"HTTP {res.status_code}")
+    return res
+
+
+def _fetch(url: str, deadline: float) -> CachedResponse:
+    # Every attempt gets only the time left before the collection deadline (a time.monotonic() value).
+    def attempt() -> CachedResponse:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise ResponseRejected("deadline exceeded")
+        return check_status(get_cache().get(url, max_seconds=remaining))
+
+    return retry(
+        attempt,
+        retries=SOURCE_RETRIES,
+        base_sleep=SOURCE_RETRY_SLEEP,
+        giveup=(ResponseRejected,),
+    )
+
+
+def parse_rss(res: CachedResponse, rss_url: str) -> list[dict]:
+    feed = feedparser.parse(res.content, response_headers={"content-location": rss_url})
     items: list[dict] = []
+    for entry in feed.entries[:20]:
+        link = entry.get("link")
+        if not link:
+            continue
+        items.append(
+            {
+                "url": link,
+                "title": entry.get("title", ""),
+                "summary": entry.get("summary", ""),
+            }
+        )
+    return items
+
+
+def parse_list_page(res: CachedResponse, page_url: str) -> list[dict]:
+    soup = BeautifulSoup(res.text, "html.parser")
+    items: list[dict] = []
+    for a in soup.select("a[href]")[:80]:
+        href = a.get("href")
+        if not href:
+            continue
+        url = urljoin(page_url, href)
+        if not url.startswith("http"):
+            continue
+        text = a.get_text(" ", strip=True)
+        if len(text) < 8:
+            continue
+        items.append({"url": url, "title": text, "summary": ""})
+    return items
 
-    for rss_url in sources.get("rss", []):
-        try:
-            feed = retry(lambda: feedparser.parse(rss_url))
-            for entry in feed.entries[:20]:
-                link = entry.get("link")
-                if not link:
-                    continue
-                items.append(
-                    {
-                        "url": link,
-                        "title": entry.get("title", ""),
-                        "summary": entry.get("summary", ""),
-                    }
-                )
-        except Exception as exc:  # pylint: disable=broad-except
-            logger.warning("RSS collection failed: %s (%s)", rss_url, exc)
-
-    for page_url in sources.get("list_pages", []):
-        try:
-            html = retry(lambda: requests.get(page_url, timeout=20).text)
-            soup = BeautifulSoup(html, "html.parser")
-            for a in soup.select("a[href]")[:80]:
-                href = a.get("href")
-                if not href:
-                    continue
-                url = urljoin(page_url, href)
-                if not url.startswith("http"):
-                    continue
-                text = a.get_text(" ", strip=True)
-                if len(text) < 8:
-                    continue
-                items.append({"url": url, "title": text, "summary": ""})
-        except Exception as exc:  # pylint: disable=broad-except
-            logger.warning("List page collection failed: %s (%s)", page_url, exc)
-
-    # URL dedupe in-memory
+
+PARSERS = {"RSS": parse_rss, "List page": parse_list_page}
+
+
+def source_jobs(sources: dict, health: SourceHealth | None = None) -> list[tuple[str, str]]:
+    jobs = [("RSS", url) for url in sources.get("rss", [])]
+    jobs += [("List page", url) for url in sources.get("list_pages", [])]
+    if health is not None:
+        due = [job for job in jobs if health.due(job[1])]
+        if len(due) < len(jobs):
+            logger.info("Skipped %s sources (not due or circuit open)", len(jobs) - len(due))
+            tracing.count("sources.skipped", len(jobs) - len(due))
+        jobs = due
+    return jobs
+
+
+def dedupe_candidates(results: list[list[dict]]) -> list[dict]:
+    # URL dedupe in-memory, keeping source order. The canonical form is only the key: the URL the feed gave is
+    # the one fetched, and the one older posts/queue rows were hashed from.
     seen = set()
     unique = []
-    for it in items:
-        if it["url"] in seen:
+    for it in (it for batch in results for it in batch):
+        key = canonicalize_url(it["url"])
+        if key in seen:
             continue
-        seen.add(it["url"])
+        seen.add(key)
         unique.append(it)
     return unique
+
+
+def collect_candidates(
+    sources: dict,
+    workers: int = 8,
+    per_host: int = 2,
+    deadline_seconds: float = 120.0,
+    health: SourceHealth | None = None,
+) -> list[dict]:
+    jobs = source_jobs(sources, health)
+    if not jobs:
+        return []
+
+    host_limits = {urlparse(url).netloc: threading.Semaphore(max(1, per_host)) for _, url in jobs}
+    deadline = time.monotonic() + deadline_seconds
+    accounted: set[int] = set()
+    accounted_lock = threading.Lock()
+
+    def claim(i: int) -> bool:
+        # One health update per poll: the worker's, or the deadline's if the worker is still running by then.
+        with accounted_lock:
+            if i in accounted:
+                return False
+            accounted.add(i)
+            return True
+
+    def run_job(i: int, kind: str, url: str) -> list[dict]:
+        host = urlparse(url).netloc
+        with host_limits[host], tracing.span(f"source:{host}"):
+            started = time.perf_counter()
+            try:
+                items = PARSERS[kind](_fetch(url, deadline), url)
+            except Exception as exc:
+                if health is not None and claim(i):
+                    health.record_failure(url, (time.perf_counter() - started) * 1000, str(exc))
+                raise
+            if health is not None and claim(i):
+                health.record_success(url, (time.perf_counter() - started) * 1000, items)
+            return items
+
+    results: list[list[dict]] = [[] for _ in jobs]
+    pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="collect")
+    try:
+        pending = {pool.submit(run_job, i, kind, url): i for i, (kind, url) in enumerate(jobs)}
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for fut in done:
+                i = pending.pop(fut)
+                kind, url = jobs[i]
+                try:
+                    results[i] = fut.result()
+                except Exception as exc:  # pylint: disable=broad-except
+                    logger.warning("%s collection failed: %s (%s)", kind, url, exc)
+        for fut, i in pending.items():
+            kind, url = jobs[i]
+            logger.warning("%s collection dropped after %ss deadline: %s", kind, deadline_seconds, url)
+            if health is not None and claim(i):
+                health.record_failure(url, deadline_seconds * 1000, "deadline exceeded")
+    finally:
+        # Running requests cannot be interrupted, but their timeouts and download time are capped at the time left,
+        # so a straggler ends within about one read timeout of the deadline (SOURCE_RETRY_SLEEP more if it was
+        # retrying) and never starts a new attempt after it. Jobs not yet started are cancelled; late results are
+        # discarded.
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    return dedupe_candidates(results)
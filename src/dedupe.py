@@ -0,0 +1,263 @@
+import hashlib
+import random
+from array import array
+from datetime import timedelta
+from typing import Iterable
+
+import numpy as np
+
+from .text import normalize_text, token_set
+from .utils import now_jst
+
+NUM_PERM = 64
+BANDS = 16
+SHINGLE_SIZE = 5
+MAX_SHINGLE_CHARS = 4000
+
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_rng = random.Random(20240601)
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+# Columns for broadcasting against a row of shingle hashes; `a` is split so every product fits in uint64.
+_A_HI = np.array([a >> 32 for a, _ in _PERMS], dtype=np.uint64)[:, None]
+_A_LO = np.array([a & 0xFFFFFFFF for a, _ in _PERMS], dtype=np.uint64)[:, None]
+_B = np.array([b for _, b in _PERMS], dtype=np.uint64)[:, None]
+_P = np.uint64(_PRIME)
+_M29 = np.uint64((1 << 29) - 1)
+_S29, _S32, _S61 = np.uint64(29), np.uint64(32), np.uint64(61)
+
+
+def _hash32(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=4).digest(), "big")
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def shingles(text: str, k: int = SHINGLE_SIZE) -> set[str]:
+    text = normalize_text(text)[:MAX_SHINGLE_CHARS]
+    if len(text) <= k:
+        return {text} if text else set()
+    return {text[i : i + k] for i in range(len(text) - k + 1)}
+
+
+def _fold(x: np.ndarray, tmp: np.ndarray) -> None:
+    # x <- (x & P) + (x >> 61) in place: congruent mod P = 2**61 - 1 since 2**61 ≡ 1, and below 2**61 + 8.
+    np.right_shift(x, _S61, out=tmp)
+    x &= _P
+    x += tmp
+
+
+def minhash(features: Iterable[str]) -> tuple[int, ...]:
+    # Same values as min((a * h + b) % _PRIME for h in hashes) per permutation, for all permutations at once.
+    # a * h can reach 2**93, so it is built from a_hi * h (< 2**61) shifted by 32 bits and a_lo * h (< 2**64).
+    h = np.fromiter((_hash32(f) for f in features), dtype=np.uint64)
+    if not h.size:
+        return tuple([_MAX_HASH] * NUM_PERM)
+    x = _A_HI * h
+    tmp = np.empty_like(x)
+    # x * 2**32 = (x >> 29) * 2**61 + (x & (2**29 - 1)) * 2**32 ≡ (x >> 29) + (x & (2**29 - 1)) * 2**32
+    np.right_shift(x, _S29, out=tmp)
+    x &= _M29
+    x <<= _S32
+    x += tmp
+    lo = _A_LO * h
+    _fold(lo, tmp)
+    x += lo
+    x += _B
+    _fold(x, tmp)
+    np.subtract(x, _P, out=x, where=x >= _P)
+    return tuple(int(v) & _MAX_HASH for v in x.min(axis=1))
+
+
+def minhash_similarity(a: tuple[int, ...], b: tuple[int, ...]) -> float:
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+def pack_minhash(sig: tuple[int, ...]) -> bytes:
+    return array("I", sig).tobytes()
+
+
+def unpack_minhash(blob: bytes | None) -> tuple[int, ...] | None:
+    if not blob:
+        return None
+    arr = array("I")
+    arr.frombytes(blob)
+    return tuple(arr)
+
+
+def simhash(features: Iterable[str]) -> int:
+    h = np.fromiter((_hash64(f) for f in features), dtype="<u8")
+    if not h.size:
+        return 0
+    # Column i of the little-endian bit matrix is bit i of each hash; a bit is set where more than half have it.
+    ones = np.unpackbits(h.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little").sum(axis=0, dtype=np.int64)
+    return int(np.packbits(2 * ones > h.size, bitorder="little").view("<u8")[0])
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def fingerprint(title: str, body: str) -> tuple[bytes, str]:
+    feats = shingles(f"{title} {body}")
+    return pack_minhash(minhash(feats)), f"{simhash(feats):016x}"
+
+
+class MinHashLSH:
+    def __init__(self, bands: int = BANDS) -> None:
+        self.bands = bands
+        self.rows = NUM_PERM // bands
+        self._buckets: dict[tuple, list] = {}
+        self._sigs: dict[str, tuple[int, ...]] = {}
+
+    def _keys(self, sig: tuple[int, ...]):
+        for band in range(self.bands):
+            yield (band, sig[band * self.rows : (band + 1) * self.rows])
+
+    def add(self, key: str, sig: tuple[int, ...]) -> None:
+        if key in self._sigs:
+            return
+        self._sigs[key] = sig
+        for bucket in self._keys(sig):
+            self._buckets.setdefault(bucket, []).append(key)
+
+    def query(self, sig: tuple[int, ...], threshold: float) -> list[str]:
+        seen: set[str] = set()
+        out = []
+        for bucket in self._keys(sig):
+            for key in self._buckets.get(bucket, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                if minhash_similarity(sig, self._sigs[key]) >= threshold:
+                    out.append(key)
+        return out
+
+
+class SimHashIndex:
+    # Four 16-bit blocks: two hashes within 3 bits of each other must share at least one block exactly.
+    BLOCKS = 4
+
+    def __init__(self) -> None:
+        self._buckets: dict[tuple[int, int], list[tuple[str, int]]] = {}
+
+    def _keys(self, value: int):
+        for block in range(self.BLOCKS):
+            yield (block, (value >> (block * 16)) & 0xFFFF)
+
+    def add(self, key: str, value: int) -> None:
+        for bucket in self._keys(value):
+            self._buckets.setdefault(bucket, []).append((key, value))
+
+    def query(self, value: int, max_distance: int) -> list[str]:
+        out = []
+        for bucket in self._keys(value):
+            for key, other in self._buckets.get(bucket, ()):
+                if hamming(value, other) <= max_distance and key not in out:
+                    out.append(key)
+        return out
+
+
+class DedupeIndex:
+    def __init__(self, topic_threshold: float = 0.8, content_threshold: float = 0.8, max_hamming: int = 3) -> None:
+        self.topic_threshold = topic_threshold
+        self.content_threshold = content_threshold
+        self.max_hamming = max_hamming
+        self.urls: set[str] = set()
+        self.hashes: set[str] = set()
+        self.people: set[str] = set()
+        self.topics: set[frozenset[str]] = set()
+        self.lsh = MinHashLSH()
+        self.simhashes = SimHashIndex()
+
+    @classmethod
+    def from_rows(cls, rows: Iterable, **kwargs) -> "DedupeIndex":
+        index = cls(**kwargs)
+        for row in rows:
+            index.add(dict(row))
+        return index
+
+    def add(self, item: dict) -> None:
+        self.urls.add(item["article_url"])
+        self.hashes.add(item["article_hash"])
+        if item.get("person"):
+            self.people.add(item["person"])
+        topic = frozenset(token_set(item.get("topic") or ""))
+        if topic:
+            self.topics.add(topic)
+        sig = unpack_minhash(item.get("minhash"))
+        if sig:
+            self.lsh.add(item["article_hash"], sig)
+        if item.get("simhash"):
+            self.simhashes.add(item["article_hash"], int(item["simhash"], 16))
+
+    def _topic_matches(self, topic: str) -> bool:
+        tokens = token_set(topic)
+        if not tokens:
+            return False
+        # Topics come from a handful of fixed labels, so this set stays tiny.
+        return any(len(tokens & t) / len(tokens | t) >= self.topic_threshold for t in self.topics)
+
+    def is_duplicate(self, candidate: dict) -> bool:
+        if candidate["article_hash"] in self.hashes or candidate["article_url"] in self.urls:
+            return True
+        if candidate.get("person") and candidate["person"] in self.people:
+            return True
+        if self._topic_matches(candidate.get("topic") or ""):
+            return True
+        sig = unpack_minhash(candidate.get("minhash"))
+        if sig and self.lsh.query(sig, self.content_threshold):
+            return True
+        if candidate.get("simhash") and self.simhashes.query(int(candidate["simhash"], 16), self.max_hamming):
+            return True
+        return False
+
+
+class DedupeWindow:
+    # The daemon's DedupeIndex, kept across refills: posts newer than the last one seen are added on each
+    # refresh, and the index is rebuilt only once its oldest post has left the dedupe window.
+    def __init__(self, days: int, **kwargs) -> None:
+        self.days = days
+        self.kwargs = kwargs
+        self.index: DedupeIndex | None = None
+        self.last_id = 0
+        self.oldest: str | None = None
+        self.rebuilds = 0
+
+    def refresh(self, store) -> DedupeIndex:
+        cutoff = (now_jst() - timedelta(days=self.days)).isoformat()
+        if self.index is None or (self.oldest is not None and self.oldest < cutoff):
+            self.index, self.last_id, self.oldest = DedupeIndex(**self.kwargs), 0, None
+            self.rebuilds += 1
+        for row in store.dedupe_rows(self.days, after_id=self.last_id):
+            self.index.add(dict(row))
+            self.last_id = row["id"]
+            if self.oldest is None or row["posted_at"] < self.oldest:
+                self.oldest = row["posted_at"]
+        return self.index
+
+
+class SyndicationIndex:
+    def __init__(self, threshold: float = 0.8) -> None:
+        self.threshold = threshold
+        self.canonical: dict[str, str] = {}
+        self.lsh = MinHashLSH()
+
+    def add(self, key: str, canonical_url: str | None, sig_blob: bytes | None) -> None:
+        if canonical_url:
+            self.canonical.setdefault(canonical_url, key)
+        sig = unpack_minhash(sig_blob)
+        if sig:
+            self.lsh.add(key, sig)
+
+    def match(self, canonical_url: str | None, sig_blob: bytes | None) -> str | None:
+        if canonical_url and canonical_url in self.canonical:
+            return self.canonical[canonical_url]
+        sig = unpack_minhash(sig_blob)
+        if sig:
+            hits = self.lsh.query(sig, self.threshold)
+            if hits:
+                return hits[0]
+        return None
@@ -1,31 +1,201 @@
+import copy
 import logging
+import multiprocessing
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Iterable, Iterator
+from urllib.parse import urljoin, urlsplit
 
-import requests
-from bs4 import BeautifulSoup
+import lxml.html
 from readability import Document
+from readability.cleaners import html_cleaner
 
-from .utils import retry
+from . import tracing
+from .dedupe import fingerprint
+from .http_cache import get_cache
+from .http_client import ResponseRejected
+from .utils import canonicalize_url, retry
 
 logger = logging.getLogger(__name__)
 
+HTML_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+MAX_PAGE_BYTES = 2 * 1024 * 1024
+MAX_FETCH_SECONDS = 20.0
+
+
+@tracing.traced("fetch")
+def fetch_html(url: str, max_bytes: int = MAX_PAGE_BYTES, max_seconds: float = MAX_FETCH_SECONDS) -> str | None:
+    try:
+        return retry(
+            lambda: get_cache().get(url, max_bytes=max_bytes, content_types=HTML_TYPES, max_seconds=max_seconds).text,
+            giveup=(ResponseRejected,),
+        )
+    except ResponseRejected as exc:
+        logger.info("Skipped non-article response: %s (%s)", url, exc)
+        return None
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.warning("Extraction failed: %s (%s)", url, exc)
+        return None
+
+
+_UTF8_PARSER = lxml.html.HTMLParser(encoding="utf-8")
+
+
+class _TreeDocument(Document):
+    # readability re-parses its input string for every call; hand it copies of one cleaned tree instead.
+    def __init__(self, tree: lxml.html.HtmlElement) -> None:
+        super().__init__("")
+        self._tree = tree
+
+    def _parse(self, input):  # pylint: disable=redefined-builtin
+        return copy.deepcopy(self._tree)
+
+
+def _text(el: lxml.html.HtmlElement) -> str:
+    return "\n".join(t for t in (s.strip() for s in el.xpath(".//text()[not(ancestor::script or ancestor::style)]")) if t)
+
+
+def _canonical_url(url: str, tree: lxml.html.HtmlElement | None) -> str:
+    head = tree.find("head") if tree is not None else None
+    if head is not None:
+        host = urlsplit(url).hostname
+        for href in head.xpath('link[@rel="canonical"]/@href') + head.xpath('meta[@property="og:url"]/@content'):
+            try:
+                target = urlsplit(urljoin(url, href.strip()))
+            except ValueError:
+                continue
+            # Many sites point every page at their home page or another domain; trusting that merges unrelated articles.
+            if href.strip() and target.path.strip("/") and target.hostname == host:
+                return canonicalize_url(target.geturl())
+    return canonicalize_url(url)
+
+
+def parse_article(url: str, html: str) -> dict:
+    # One lxml parse serves the canonical link, readability and the full-page fallback.
+    tree = lxml.html.document_fromstring(html.encode("utf-8", "replace"), parser=_UTF8_PARSER)
+    canonical_url = _canonical_url(url, tree)
+    cleaned = html_cleaner.clean_html(tree)
+    cleaned.resolve_base_href(handle_failures="discard")
+    doc = _TreeDocument(cleaned)
+    title = doc.short_title() or ""
+    summary = lxml.html.fragment_fromstring(doc.summary(html_partial=True), create_parent="div")
+    text = _text(summary)
+    if len(text) < 300:
+        # fallback to full page extraction
+        text = _text(tree)[:10000]
+    image_url = None
+    img = next(summary.iter("img"), None)
+    if img is not None and img.get("src", "").startswith("http"):
+        image_url = img.get("src")
+    title, text = title.strip(), text.strip()
+    minhash, simhash = fingerprint(title, text)
+    return {
+        "url": url,
+        "canonical_url": canonical_url,
+        "title": title,
+        "body": text,
+        "image_url": image_url,
+        "minhash": minhash,
+        "simhash": simhash,
+    }
+
+
+def _timed_parse(url: str, html: str) -> tuple[dict, float]:
+    # Runs in the parse worker process, so the timing travels back with the result.
+    started = time.perf_counter()
+    art = parse_article(url, html)
+    return art, (time.perf_counter() - started) * 1000
+
 
 def extract_article(url: str) -> dict | None:
+    html = fetch_html(url)
+    if html is None:
+        return None
     try:
-        html = retry(lambda: requests.get(url, timeout=25, headers={"User-Agent": "Mozilla/5.0"}).text)
-        doc = Document(html)
-        title = doc.short_title() or ""
-        content_html = doc.summary(html_partial=True)
-        soup = BeautifulSoup(content_html, "html.parser")
-        text = soup.get_text("\n", strip=True)
-        if len(text) < 300:
-            # fallback to full page extraction
-            full = BeautifulSoup(html, "html.parser").get_text("\n", strip=True)
-            text = full[:10000]
-        image_url = None
-        img = soup.find("img")
-        if img and img.get("src", "").startswith("http"):
-            image_url = img["src"]
-        return {"url": url, "title": title.strip(), "body": text.strip(), "image_url": image_url}
+        with tracing.span("parse"):
+            return parse_article(url, html)
     except Exception as exc:  # pylint: disable=broad-except
         logger.warning("Extraction failed: %s (%s)", url, exc)
         return None
+
+
+_pool_lock = threading.Lock()
+_pool: tuple[int, Executor] | None = None
+
+
+def _new_parse_pool(parse_workers: int) -> Executor:
+    if parse_workers <= 0:
+        return ThreadPoolExecutor(max_workers=1, thread_name_prefix="parse")
+    # With fork every worker starts on the first submit; warm_parse_pool does that before any fetch thread exists.
+    # Elsewhere (macOS, where fork is unsafe with the system frameworks, and Windows) the platform default is used.
+    ctx = multiprocessing.get_context("fork") if sys.platform == "linux" else multiprocessing.get_context()
+    return ProcessPoolExecutor(max_workers=parse_workers, mp_context=ctx)
+
+
+def _parse_pool(parse_workers: int) -> Executor:
+    # One pool per process, shared by every build_queue (cron run, refill, daemon slot) until shutdown_parse_pool.
+    global _pool  # pylint: disable=global-statement
+    with _pool_lock:
+        if _pool is not None and (_pool[0] != parse_workers or _pool[1]._broken):  # pylint: disable=protected-access
+            _pool[1].shutdown(wait=False, cancel_futures=True)
+            _pool = None
+        if _pool is None:
+            _pool = (parse_workers, _new_parse_pool(parse_workers))
+        return _pool[1]
+
+
+def warm_parse_pool(parse_workers: int) -> None:
+    # Call before collection starts threads: forking a threaded process can copy a held lock into the child.
+    _parse_pool(parse_workers).submit(int).result()
+
+
+def shutdown_parse_pool() -> None:
+    global _pool  # pylint: disable=global-statement
+    with _pool_lock:
+        if _pool is not None:
+            _pool[1].shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+
+def extract_articles(
+    urls: Iterable[str],
+    fetch_workers: int = 8,
+    parse_workers: int = 2,
+    max_bytes: int = MAX_PAGE_BYTES,
+    max_seconds: float = MAX_FETCH_SECONDS,
+) -> Iterator[tuple[str, dict | None]]:
+    # HTTP on a thread pool, readability/lxml on a process pool; results stream out as they finish.
+    parse_pool = _parse_pool(parse_workers)
+    with ThreadPoolExecutor(max_workers=max(1, fetch_workers), thread_name_prefix="fetch") as fetch_pool:
+        fetches = {fetch_pool.submit(fetch_html, url, max_bytes, max_seconds): url for url in urls}
+        parses: dict = {}
+        pending = set(fetches)
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    if fut in fetches:
+                        url = fetches.pop(fut)
+                        html = fut.result()
+                        if html is None:
+                            yield url, None
+                            continue
+                        parse_fut = parse_pool.submit(_timed_parse, url, html)
+                        parses[parse_fut] = url
+                        pending.add(parse_fut)
+                        continue
+
+                    url = parses.pop(fut)
+                    try:
+                        art, parse_ms = fut.result()
+                        tracing.record("parse", calls=1, wall_ms=parse_ms, items=1)
+                    except Exception as exc:  # pylint: disable=broad-except
+                        logger.warning("Extraction failed: %s (%s)", url, exc)
+                        art = None
+                    yield url, art
+        finally:
+            # The parse pool outlives this call; drop queued work nobody will read if the caller stops early.
+            for fut in pending:
+                fut.cancel()
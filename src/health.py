@@ -0,0 +1,101 @@
+import hashlib
+import threading
+from datetime import datetime, timedelta
+
+from .utils import now_jst
+
+EWMA_ALPHA = 0.3
+# A source is due this share of its interval early, so cron-start jitter does not push it to the next tick.
+POLL_SLACK = 0.1
+
+
+def _items_hash(items: list[dict]) -> str:
+    # Every link counts: list pages lead with fixed navigation, and a new post may appear anywhere below it.
+    # Sorted, so a page that only reorders its links is not taken for a change.
+    urls = "\n".join(sorted({it.get("url", "") for it in items}))
+    return hashlib.sha256(urls.encode("utf-8")).hexdigest()[:16]
+
+
+class SourceHealth:
+    def __init__(
+        self,
+        rows: list | None = None,
+        min_poll_minutes: float = 10,
+        max_poll_minutes: float = 360,
+        failure_threshold: int = 3,
+        max_backoff_hours: float = 24,
+    ) -> None:
+        self.min_interval = min_poll_minutes * 60
+        self.max_interval = max(self.min_interval, max_poll_minutes * 60)
+        self.failure_threshold = max(1, failure_threshold)
+        self.max_backoff = max_backoff_hours * 3600
+        # Next polls count from the start of this run, not from when a fetch finished, so they line up with the cadence.
+        self.started = now_jst()
+        self._lock = threading.Lock()
+        self._rows: dict[str, dict] = {row["source_url"]: dict(row) for row in rows or []}
+        self._dirty: set[str] = set()
+
+    def _row(self, url: str) -> dict:
+        return self._rows.setdefault(
+            url,
+            {
+                "source_url": url,
+                "latency_ewma_ms": None,
+                "error_streak": 0,
+                "last_success_at": None,
+                "last_error_at": None,
+                "last_error": None,
+                "poll_interval_s": self.min_interval,
+                "next_poll_at": None,
+                "head_hash": None,
+            },
+        )
+
+    def due(self, url: str, now: datetime | None = None) -> bool:
+        with self._lock:
+            row = self._rows.get(url)
+        if not row or not row.get("next_poll_at"):
+            return True
+        slack = timedelta(seconds=POLL_SLACK * float(row.get("poll_interval_s") or self.min_interval))
+        return (now or now_jst()) + slack >= datetime.fromisoformat(row["next_poll_at"])
+
+    def _observe_latency(self, row: dict, latency_ms: float) -> None:
+        prev = row.get("latency_ewma_ms")
+        row["latency_ewma_ms"] = latency_ms if prev is None else prev + EWMA_ALPHA * (latency_ms - prev)
+
+    def record_success(self, url: str, latency_ms: float, items: list[dict]) -> None:
+        now = now_jst()
+        head = _items_hash(items)
+        with self._lock:
+            row = self._row(url)
+            self._observe_latency(row, latency_ms)
+            # Multiplicative adapt: halve the interval when the source changed, stretch it when it did not.
+            interval = float(row.get("poll_interval_s") or self.min_interval)
+            interval = interval / 2 if head != row.get("head_hash") else interval * 1.5
+            row["poll_interval_s"] = min(self.max_interval, max(self.min_interval, interval))
+            row["head_hash"] = head
+            row["error_streak"] = 0
+            row["last_success_at"] = now.isoformat()
+            row["next_poll_at"] = (self.started + timedelta(seconds=row["poll_interval_s"])).isoformat()
+            self._dirty.add(url)
+
+    def record_failure(self, url: str, latency_ms: float, error: str) -> None:
+        now = now_jst()
+        with self._lock:
+            row = self._row(url)
+            self._observe_latency(row, latency_ms)
+            row["error_streak"] = int(row.get("error_streak") or 0) + 1
+            row["last_error_at"] = now.isoformat()
+            row["last_error"] = error[:300]
+            # Circuit breaker: past the threshold the source is left alone for an exponentially growing time.
+            over = row["error_streak"] - self.failure_threshold
+            if over >= 0:
+                backoff = min(self.max_backoff, self.min_interval * 2 ** (over + 1))
+                row["next_poll_at"] = (self.started + timedelta(seconds=backoff)).isoformat()
+            self._dirty.add(url)
+
+    def dirty_rows(self) -> list[dict]:
+        with self._lock:
+            rows = [dict(self._rows[url]) for url in self._dirty]
+            self._dirty.clear()
+        return rows
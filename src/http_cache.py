@@ -0,0 +1,197 @@
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Mapping
+
+from . import http_client
+from .utils import sha256_text
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedResponse:
+    url: str
+    status_code: int
+    content: bytes
+    encoding: str | None
+    from_cache: bool
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+
+class HttpCache:
+    def __init__(self, cache_dir: str, max_bytes: int = 200 * 1024 * 1024, max_age_seconds: int = 7 * 86400) -> None:
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _paths(self, url: str) -> tuple[str, str]:
+        key = sha256_text(url)
+        return os.path.join(self.cache_dir, f"{key}.json"), os.path.join(self.cache_dir, f"{key}.body")
+
+    def _load(self, url: str) -> tuple[dict, bytes] | None:
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        if meta.get("url") != url:
+            return None
+        return meta, body
+
+    def _save(self, url: str, headers: Mapping[str, str], content: bytes, encoding: str | None) -> None:
+        meta = {
+            "url": url,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "encoding": encoding,
+            "stored_at": time.time(),
+        }
+        meta_path, body_path = self._paths(url)
+        for path, data, mode in ((body_path, content, "wb"), (meta_path, json.dumps(meta), "w")):
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, mode) as f:
+                f.write(data)
+            os.replace(tmp, path)
+
+    @staticmethod
+    def _validators(meta: dict) -> dict[str, str]:
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def conditional_headers(self, url: str) -> dict[str, str]:
+        cached = self._load(url)
+        return self._validators(cached[0]) if cached else {}
+
+    def lookup(self, url: str) -> CachedResponse | None:
+        cached = self._load(url)
+        if not cached:
+            return None
+        meta, body = cached
+        return CachedResponse(url, 200, body, meta.get("encoding"), True)
+
+    def get(
+        self,
+        url: str,
+        headers: dict | None = None,
+        store_always: bool = False,
+        max_bytes: int | None = None,
+        content_types: tuple[str, ...] = (),
+        max_seconds: float | None = None,
+    ) -> CachedResponse:
+        req_headers, cached = self.prepare(url, headers)
+        if max_bytes is None and max_seconds is None:
+            res = http_client.get(url, headers=req_headers)
+        else:
+            kwargs = {"timeout": http_client.timeout_within(max_seconds)} if max_seconds is not None else {}
+            res = http_client.get_limited(url, max_bytes, content_types, max_seconds, headers=req_headers, **kwargs)
+        return self.complete(
+            url, res.status_code, res.headers, res.content, res.encoding or res.apparent_encoding, cached, store_always
+        )
+
+    def prepare(self, url: str, headers: dict | None = None) -> tuple[dict, tuple[dict, bytes] | None]:
+        # Split out of get() so other HTTP clients (the async engine) can share validators and bookkeeping.
+        cached = self._load(url)
+        req_headers = dict(headers or {})
+        if cached:
+            req_headers.update(self._validators(cached[0]))
+        return req_headers, cached
+
+    def complete(
+        self,
+        url: str,
+        status_code: int,
+        headers: Mapping[str, str],
+        content: bytes,
+        encoding: str | None,
+        cached: tuple[dict, bytes] | None,
+        store_always: bool = False,
+    ) -> CachedResponse:
+        if status_code == 304 and cached:
+            meta, body = cached
+            os.utime(self._paths(url)[0])
+            with self._lock:
+                self.hits += 1
+            return CachedResponse(url, 200, body, meta.get("encoding"), True)
+
+        with self._lock:
+            self.misses += 1
+        # Without validators an entry can never be revalidated, so it is only kept when the caller needs it offline.
+        if status_code == 200 and (store_always or headers.get("ETag") or headers.get("Last-Modified")):
+            try:
+                self._save(url, headers, content, encoding)
+            except OSError as exc:
+                logger.warning("HTTP cache write failed: %s (%s)", url, exc)
+        return CachedResponse(url, status_code, content, encoding, False)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def evict(self) -> int:
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            meta_path = os.path.join(self.cache_dir, name)
+            body_path = meta_path[: -len(".json")] + ".body"
+            try:
+                used_at = os.path.getmtime(meta_path)
+                size = os.path.getsize(body_path)
+            except OSError:
+                size, used_at = 0, 0.0
+            entries.append((used_at, size, meta_path, body_path))
+
+        entries.sort()
+        total = sum(e[1] for e in entries)
+        removed = 0
+        for used_at, size, meta_path, body_path in entries:
+            if now - used_at <= self.max_age_seconds and total <= self.max_bytes:
+                continue
+            for path in (meta_path, body_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+            removed += 1
+        return removed
+
+
+_cache: HttpCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> HttpCache:
+    global _cache  # pylint: disable=global-statement
+    with _cache_lock:
+        if _cache is None:
+            _cache = HttpCache(
+                os.getenv("HTTP_CACHE_DIR", "data/http_cache"),
+                max_bytes=int(os.getenv("HTTP_CACHE_MAX_MB", "200")) * 1024 * 1024,
+                max_age_seconds=int(os.getenv("HTTP_CACHE_MAX_AGE_DAYS", "7")) * 86400,
+            )
+        return _cache
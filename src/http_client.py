@@ -0,0 +1,164 @@
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import make_headers
+
+from . import tracing
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "Mozilla/5.0"
+
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_host_stats: dict[str, dict[str, float]] = {}
+_conn_baseline: dict[str, int] = {}
+
+
+class ResponseRejected(Exception):
+    pass
+
+
+def default_timeout() -> tuple[float, float]:
+    return (
+        float(os.getenv("HTTP_CONNECT_TIMEOUT", "5")),
+        float(os.getenv("HTTP_READ_TIMEOUT", "30")),
+    )
+
+
+def timeout_within(seconds: float) -> tuple[float, float]:
+    # requests applies these per connect and per read; callers with a deadline pass the time they have left.
+    connect, read = default_timeout()
+    return min(connect, seconds), min(read, seconds)
+
+
+def get_session() -> requests.Session:
+    global _session  # pylint: disable=global-statement
+    with _session_lock:
+        if _session is None:
+            per_host = int(os.getenv("HTTP_POOL_PER_HOST", "4"))
+            # pool_block caps open connections per host; extra requests wait for a free one.
+            adapter = HTTPAdapter(
+                pool_connections=int(os.getenv("HTTP_POOL_HOSTS", "32")),
+                pool_maxsize=per_host,
+                pool_block=True,
+            )
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update(make_headers(keep_alive=True, accept_encoding=True))
+            session.headers["User-Agent"] = USER_AGENT
+            _session = session
+        return _session
+
+
+def request(method: str, url: str, **kwargs) -> requests.Response:
+    kwargs.setdefault("timeout", default_timeout())
+    host = urlparse(url).netloc
+    started = time.perf_counter()
+    try:
+        res = get_session().request(method, url, **kwargs)
+        if not kwargs.get("stream"):
+            tracing.record(bytes=len(res.content))
+        return res
+    finally:
+        record_request(host, (time.perf_counter() - started) * 1000)
+
+
+def record_request(host: str, elapsed_ms: float) -> None:
+    with _stats_lock:
+        st = _host_stats.setdefault(host, {"requests": 0, "latency_ms": 0.0})
+        st["requests"] += 1
+        st["latency_ms"] += elapsed_ms
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def get_limited(
+    url: str,
+    max_bytes: int | None,
+    content_types: tuple[str, ...] = (),
+    max_seconds: float | None = None,
+    **kwargs,
+) -> requests.Response:
+    # Streams the body and gives up as soon as the type, declared length, size or total time is out of bounds.
+    started = time.monotonic()
+    res = request("GET", url, stream=True, **kwargs)
+    try:
+        if res.status_code == 200:
+            ctype = res.headers.get("Content-Type", "").split(";", 1)[0].strip().lower()
+            if content_types and ctype and not ctype.startswith(content_types):
+                raise ResponseRejected(f"content-type {ctype}")
+            length = res.headers.get("Content-Length", "")
+            if max_bytes is not None and length.isdigit() and int(length) > max_bytes:
+                raise ResponseRejected(f"content-length {length} > {max_bytes}")
+        body = bytearray()
+        for chunk in res.iter_content(64 * 1024):
+            body += chunk
+            if max_bytes is not None and len(body) > max_bytes:
+                raise ResponseRejected(f"body exceeds {max_bytes} bytes")
+            if max_seconds is not None and time.monotonic() - started > max_seconds:
+                raise ResponseRejected(f"download exceeds {max_seconds}s")
+        res._content = bytes(body)  # pylint: disable=protected-access
+        tracing.record(bytes=len(body))
+        return res
+    finally:
+        res.close()
+
+
+def _pool_connections() -> dict[str, int]:
+    connections: dict[str, int] = {}
+    session = get_session()
+    for adapter in {id(a): a for a in session.adapters.values()}.values():
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = key.key_host if key.key_port in (None, 80, 443) else f"{key.key_host}:{key.key_port}"
+            connections[host] = connections.get(host, 0) + pool.num_connections
+    return connections
+
+
+def host_stats() -> dict[str, dict[str, float]]:
+    connections = _pool_connections()
+    out = {}
+    with _stats_lock:
+        for host, st in _host_stats.items():
+            n = int(st["requests"])
+            opened = connections.get(host, 0) - _conn_baseline.get(host, 0)
+            out[host] = {
+                "requests": n,
+                "avg_latency_ms": round(st["latency_ms"] / n, 1) if n else 0.0,
+                "connections": opened,
+                "reused": max(0, n - opened),
+            }
+    return out
+
+
+def reset_stats() -> None:
+    connections = _pool_connections()
+    with _stats_lock:
+        _host_stats.clear()
+        _conn_baseline.clear()
+        _conn_baseline.update(connections)
+
+
+def log_stats() -> None:
+    for host, st in sorted(host_stats().items()):
+        logger.info(
+            "HTTP %s: requests=%s avg=%sms connections=%s reused=%s",
+            host,
+            st["requests"],
+            st["avg_latency_ms"],
+            st["connections"],
+            st["reused"],
+        )
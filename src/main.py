@@ -2,27 +2,54 @@ import argparse
 import json
 import logging
 import os
-from datetime import datetime
+import signal
+import sqlite3
+import threading
+from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
 from dotenv import load_dotenv
 
+from . import async_engine, http_client, tracing
 from .collector import collect_candidates
-from .extractor import extract_article
-from .ranker import rank_article
-from .scheduler import current_slot_jst
-from .store import Store
-from .thumbnail import generate_thumbnail
-from .utils import jaccard_similarity, now_jst, setup_logging, sha256_text
+from .dedupe import DedupeIndex, DedupeWindow, SyndicationIndex, fingerprint
+from .extractor import extract_articles, shutdown_parse_pool, warm_parse_pool
+from .health import SourceHealth
+from .http_cache import get_cache
+from .matcher import KeywordMatcher, get_matcher
+from .ranker import rank_articles
+from .scheduler import current_slot_jst, next_slot_jst
+from .store import Store, WriteBuffer
+from .thumbnail import evict_thumbnails, prerender_thumbnails, render_thumbnail
+from .utils import canonicalize_url, now_jst, setup_logging, sha256_text
 from .writer import write_three_posts
 from .x_client import XClient
 
 logger = logging.getLogger(__name__)
 
 
+_json_cache: dict[str, tuple[int, object]] = {}
+
+DAEMON_ERROR_WAIT_SECONDS = 30
+
+
 def _load_json(path: str):
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    # Parsed configs are reused until the file changes on disk, which also keeps the compiled matcher warm.
+    cached = _json_cache.get(path)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as exc:
+        if not cached:
+            raise
+        # Caught mid-edit (half-written or being replaced): the last version that parsed stays in effect.
+        logger.warning("Cannot reload %s (%s); keeping the last good version", path, exc)
+        return cached[1]
+    _json_cache[path] = (mtime, data)
+    return data
 
 
 def _cooldown_ok(store: Store, cooldown_seconds: int) -> bool:
@@ -33,35 +60,50 @@ def _cooldown_ok(store: Store, cooldown_seconds: int) -> bool:
     return (now_jst() - dt).total_seconds() >= cooldown_seconds
 
 
-def _is_near_duplicate(store: Store, candidate: dict, days: int) -> bool:
-    if store.recently_posted_hash(candidate["article_hash"], days):
-        return True
-    for old in store.recent_posts(days):
-        if old["article_url"] == candidate["article_url"]:
-            return True
-        if old["person"] and candidate.get("person") and old["person"] == candidate.get("person"):
-            return True
-        if jaccard_similarity(old["topic"] or "", candidate.get("topic") or "") >= 0.8:
-            return True
-    return False
+def _is_near_duplicate(index: DedupeIndex, candidate: dict) -> bool:
+    with tracing.span("dedupe", items=1):
+        return index.is_duplicate(candidate)
 
 
-def build_queue(store: Store, sources: dict, people: list[dict], rules: dict, dedupe_days: int) -> None:
-    candidates = collect_candidates(sources)
-    logger.info("Collected %s candidates", len(candidates))
+def _url_hashes(url: str) -> list[str]:
+    # New rows are keyed by the canonical URL; rows written before URLs were canonicalized carry the raw URL's hash.
+    return list(dict.fromkeys((sha256_text(canonicalize_url(url)), sha256_text(url))))
 
-    for c in candidates:
-        art = extract_article(c["url"])
-        if not art:
-            continue
-        art["title"] = art.get("title") or c.get("title")
-        if len(art.get("body", "")) < 400:
-            continue
 
-        score, topic, person, image_source = rank_article(art, people, rules.get("themes", []))
-        art_hash = sha256_text(art["url"])
+def _needs_extraction(store: Store, url: str, dedupe_days: int, recheck_hours: float) -> bool:
+    hashes = _url_hashes(url)
+    if any(store.is_queued(h) or store.recently_posted_hash(h, dedupe_days) for h in hashes):
+        return False
+    seen = next((row for row in map(store.seen_url, hashes) if row), None)
+    if not seen:
+        return True
+    # Evicted from the queue: not worth another fetch until evict_seen drops the record.
+    if seen["status"] == "evicted":
+        return False
+    age = now_jst() - datetime.fromisoformat(seen["fetched_at"])
+    return age.total_seconds() >= recheck_hours * 3600
+
+
+def _queue_batch(
+    writes: WriteBuffer,
+    batch: list[tuple[str, str, dict]],
+    people: list[dict],
+    rules: dict,
+    matcher: KeywordMatcher,
+    dedupe_index: DedupeIndex,
+) -> None:
+    with tracing.span("rank", items=len(batch)):
+        ranked = rank_articles(
+            [art for _, _, art in batch],
+            people,
+            rules.get("themes", []),
+            matcher=matcher,
+            relevance_weight=float(rules.get("ranker", {}).get("relevance_weight", 2.0)),
+        )
+    tracing.count("funnel.ranked", len(batch))
+    for (url_hash, content_hash, art), (score, topic, person, image_source) in zip(batch, ranked):
         row = {
-            "article_hash": art_hash,
+            "article_hash": url_hash,
             "article_url": art["url"],
             "title": art["title"],
             "body": art["body"],
@@ -71,15 +113,192 @@ def build_queue(store: Store, sources: dict, people: list[dict], rules: dict, de
             "image_source": image_source,
             "score": score,
             "selected_at": now_jst().isoformat(),
+            "canonical_url": art.get("canonical_url"),
+            "minhash": art.get("minhash"),
+            "simhash": art.get("simhash"),
         }
-        if _is_near_duplicate(store, row, dedupe_days):
+        if _is_near_duplicate(dedupe_index, row):
+            tracing.count("funnel.deduped")
+            writes.mark_seen(url_hash, art["url"], "duplicate", content_hash)
             continue
-        store.queue_upsert(row)
+        tracing.count("funnel.queued")
+        writes.queue_upsert(row)
+        writes.mark_seen(url_hash, art["url"], "queued", content_hash)
+
+
+def build_queue(
+    store: Store,
+    sources: dict,
+    people: list[dict],
+    rules: dict,
+    dedupe_days: int,
+    dedupe_window: DedupeWindow | None = None,
+) -> None:
+    get_cache().reset_stats()
+    http_client.reset_stats()
+    collector_cfg = rules.get("collector", {})
+    health = SourceHealth(
+        store.source_health(),
+        min_poll_minutes=float(collector_cfg.get("min_poll_minutes", 10)),
+        max_poll_minutes=float(collector_cfg.get("max_poll_minutes", 360)),
+        failure_threshold=int(collector_cfg.get("failure_threshold", 3)),
+        max_backoff_hours=float(collector_cfg.get("max_backoff_hours", 24)),
+    )
+    use_async = collector_cfg.get("engine", "threads") == "async"
+    if use_async and not async_engine.available():
+        logger.warning("collector.engine=async needs httpx; falling back to threads")
+        use_async = False
+    concurrency = int(collector_cfg.get("async_concurrency", 64))
+    extractor_cfg = rules.get("extractor", {})
+    parse_workers = int(extractor_cfg.get("parse_workers", 2))
+    # Parse workers start once per process, here, before collection starts any thread (fork must not copy its locks).
+    warm_parse_pool(parse_workers)
+    with tracing.span("collect"):
+        if use_async:
+            candidates = async_engine.collect_candidates(
+                sources,
+                concurrency=concurrency,
+                per_host=int(collector_cfg.get("per_host", 2)),
+                deadline_seconds=float(collector_cfg.get("deadline_seconds", 120)),
+                health=health,
+            )
+        else:
+            candidates = collect_candidates(
+                sources,
+                workers=int(collector_cfg.get("workers", 8)),
+                per_host=int(collector_cfg.get("per_host", 2)),
+                deadline_seconds=float(collector_cfg.get("deadline_seconds", 120)),
+                health=health,
+            )
+    store.save_source_health(health.dirty_rows())
+    tracing.count("funnel.collected", len(candidates))
+    logger.info("Collected %s candidates", len(candidates))
+
+    if dedupe_window is not None:
+        dedupe_index = dedupe_window.refresh(store)
+    else:
+        dedupe_index = DedupeIndex.from_rows(store.dedupe_rows(dedupe_days))
+    matcher = get_matcher(rules.get("themes", []), people, rules.get("topics"), rules.get("practical_keywords"))
+    syndication = SyndicationIndex()
+    for q in store.queue_fingerprints():
+        syndication.add(q["article_hash"], q["canonical_url"], q["minhash"])
+
+    recheck_hours = float(extractor_cfg.get("recheck_hours", 24))
+    titles = {
+        c["url"]: c.get("title")
+        for c in candidates
+        if _needs_extraction(store, c["url"], dedupe_days, recheck_hours)
+    }
+    logger.info("Skipped %s already known candidates", len(candidates) - len(titles))
+
+    batch_size = max(1, int(rules.get("ranker", {}).get("batch_size", 32)))
+    batch: list[tuple[str, str, dict]] = []
+    with store.write_buffer() as writes:
+        limits = {
+            "parse_workers": parse_workers,
+            "max_bytes": int(extractor_cfg.get("max_page_kb", 2048)) * 1024,
+            "max_seconds": float(extractor_cfg.get("max_fetch_seconds", 20)),
+        }
+        if use_async:
+            articles = async_engine.extract_articles(
+                titles,
+                concurrency=concurrency,
+                deadline_seconds=float(extractor_cfg.get("deadline_seconds", 300)),
+                **limits,
+            )
+        else:
+            articles = extract_articles(titles, fetch_workers=int(extractor_cfg.get("fetch_workers", 8)), **limits)
+        for url, art in articles:
+            url_hash = _url_hashes(url)[0]
+            if not art:
+                writes.mark_seen(url_hash, url, "failed")
+                continue
+            tracing.count("funnel.extracted")
+            art["title"] = art.get("title") or titles.get(url)
+            content_hash = sha256_text(art.get("body", ""))
+            if len(art.get("body", "")) < 400:
+                writes.mark_seen(url_hash, url, "short", content_hash)
+                continue
 
+            # Syndicated copies of an article already in the queue collapse into that row.
+            if syndication.match(art.get("canonical_url"), art.get("minhash")):
+                writes.mark_seen(url_hash, url, "syndicated", content_hash)
+                continue
+            syndication.add(url_hash, art.get("canonical_url"), art.get("minhash"))
 
-def run(slot_override: int | None = None) -> int:
+            batch.append((url_hash, content_hash, art))
+            if len(batch) >= batch_size:
+                _queue_batch(writes, batch, people, rules, matcher, dedupe_index)
+                batch = []
+        _queue_batch(writes, batch, people, rules, matcher, dedupe_index)
+
+    queue_cfg = rules.get("queue", {})
+    evicted = store.evict_queue(int(queue_cfg.get("max_age_days", 7)), int(queue_cfg.get("max_rows", 500)))
+    evicted_seen = store.evict_seen(max(dedupe_days, int(queue_cfg.get("seen_max_age_days", 30))))
+    logger.info("Queue eviction: queue=%s seen_urls=%s", evicted, evicted_seen)
+
+    cache = get_cache()
+    stats = cache.stats()
+    tracing.count("http_cache.hits", stats["hits"])
+    tracing.count("http_cache.misses", stats["misses"])
+    logger.info("HTTP cache: hits=%s misses=%s evicted=%s", stats["hits"], stats["misses"], cache.evict())
+    logger.info("Thumbnail cache: evicted=%s", evict_thumbnails())
+    http_client.log_stats()
+
+
+def _post_queued(store: Store, x: XClient, rules: dict, slot: int, outcome: dict, offline: bool = False) -> None:
+    best = store.best_queue_candidate()
+    if not best:
+        logger.warning("No queue candidate found.")
+        outcome["status"] = "no_candidate"
+        return
+
+    article = dict(best)
+    article["body"] = store.load_body(article["article_hash"])
+    posts = write_three_posts(article, rules)
+    text = posts[slot]
+
+    # Safety switch: face/person image usage only when ALLOW_IMAGE=true
+    allow_image = os.getenv("ALLOW_IMAGE", "false").lower() == "true"
+    thumb = render_thumbnail(article, allow_image=allow_image, offline=offline)
+
+    media_id = x.upload_media(thumb)
+    tweet_id = x.create_post(text, media_id=media_id)
+    minhash, simhash = article.get("minhash"), article.get("simhash")
+    if not minhash:
+        minhash, simhash = fingerprint(article.get("title") or "", article.get("body") or "")
+
+    store.save_post(
+        article_url=article["article_url"],
+        article_hash=article["article_hash"],
+        topic=article.get("topic"),
+        person=article.get("person"),
+        slot=slot,
+        text=text,
+        tweet_id=tweet_id,
+        image_source=article.get("image_source") if allow_image else "no-face-card",
+        minhash=minhash,
+        simhash=simhash,
+    )
+    logger.info("Slot%s posted. tweet_id=%s", slot, tweet_id)
+    outcome["status"] = "posted"
+
+
+def _finish_run(store: Store, tracer: tracing.Tracer, outcome: dict) -> None:
+    summary = tracer.summary(**outcome)
+    # One machine-readable line per run in logs/bot.log, alongside the row kept in SQLite.
+    logger.info("RUN_SUMMARY %s", json.dumps(summary, ensure_ascii=False))
+    try:
+        store.save_run(summary, int(os.getenv("RUNS_MAX_AGE_DAYS", "90")))
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.warning("Failed to save run metrics: %s", exc)
+
+
+def run(slot_override: int | None = None, refill: bool = True) -> int:
     load_dotenv()
     setup_logging(os.getenv("LOG_LEVEL", "INFO"))
+    tracer = tracing.start_run()
+    outcome: dict = {"status": "error", "slot": None}
 
     store = Store(os.getenv("DB_PATH", "data/bot.sqlite3"))
     x = XClient()
@@ -97,53 +316,209 @@ def run(slot_override: int | None = None) -> int:
         )
         if slot is None:
             logger.info("Outside slot window (JST). Skip.")
+            outcome["status"] = "skipped"
             return 0
+        outcome["slot"] = slot
 
         if not _cooldown_ok(store, int(os.getenv("COOLDOWN_SECONDS", "600"))):
             logger.info("Cooldown active. Skip posting.")
+            outcome["status"] = "skipped"
             return 0
 
-        build_queue(store, sources, people, rules, int(os.getenv("DEDUPE_DAYS", "14")))
-        best = store.best_queue_candidate()
-        if not best:
-            logger.warning("No queue candidate found.")
-            return 0
-
-        article = dict(best)
-        posts = write_three_posts(article, rules)
-        text = posts[slot]
-
-        # Safety switch: face/person image usage only when ALLOW_IMAGE=true
-        allow_image = os.getenv("ALLOW_IMAGE", "false").lower() == "true"
-        thumb = generate_thumbnail(article, allow_image=allow_image, out_path=f"data/thumb_slot{slot}.jpg")
-
-        media_id = x.upload_media_chunked(thumb)
-        tweet_id = x.create_post(text, media_id=media_id)
-
-        store.save_post(
-            article_url=article["article_url"],
-            article_hash=article["article_hash"],
-            topic=article.get("topic"),
-            person=article.get("person"),
-            slot=slot,
-            text=text,
-            tweet_id=tweet_id,
-            image_source=article.get("image_source") if allow_image else "no-face-card",
-        )
-        logger.info("Slot%s posted. tweet_id=%s", slot, tweet_id)
+        if refill:
+            build_queue(store, sources, people, rules, int(os.getenv("DEDUPE_DAYS", "14")))
+        # Without a refill this is the slot-time fast path: SQLite, render, X API, and no news-site requests.
+        _post_queued(store, x, rules, slot, outcome, offline=not refill)
         return 0
     except Exception as exc:  # pylint: disable=broad-except
         logger.exception("Fatal run error: %s", exc)
         return 1
     finally:
+        _finish_run(store, tracer, outcome)
         store.close()
 
 
+def _due_slot(store: Store, rules: dict, now: datetime, handled: set[datetime]) -> tuple[int, datetime]:
+    # The earliest slot whose posting window is still open and has not been handled yet, else the next one.
+    window = int(os.getenv("POST_WINDOW_MINUTES", str(rules.get("post_window_minutes", 59))))
+    last = store.last_post_time()
+    last_post = datetime.fromisoformat(last) if last else None
+    after = now - timedelta(minutes=window)
+    while True:
+        slot, start = next_slot_jst(after, slots=rules.get("slots", {}), enabled_slots=rules.get("enabled_slots", [1, 2, 3]))
+        if start > now or (start not in handled and (last_post is None or last_post < start)):
+            return slot, start
+        after = start
+
+
+def _prefetch_images(store: Store, limit: int) -> None:
+    # Warm the HTTP cache with the images the next posts will use, so posting can render offline.
+    cache = get_cache()
+    for row in store.top_queue_candidates(limit):
+        if not row["image_url"]:
+            continue
+        try:
+            cache.get(row["image_url"], store_always=True)
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.warning("Image prefetch failed: %s (%s)", row["image_url"], exc)
+
+
+def _refill(store: Store, dedupe_days: int, dedupe_window: DedupeWindow | None = None) -> bool:
+    tracer = tracing.start_run()
+    outcome: dict = {"status": "error", "slot": None}
+    try:
+        rules = _load_json("config/rules.json")
+        sources, people = _load_json("config/sources.json"), _load_json("config/people.json")
+        build_queue(store, sources, people, rules, dedupe_days, dedupe_window)
+        allow_image = os.getenv("ALLOW_IMAGE", "false").lower() == "true"
+        upcoming = int(rules.get("queue", {}).get("prefetch_images", 3))
+        if allow_image:
+            with tracing.span("prefetch_images"):
+                _prefetch_images(store, upcoming)
+        # Cards for the next posts are rendered now so the slot only copies a file.
+        with tracing.span("prerender", items=upcoming):
+            prerender_thumbnails([dict(r) for r in store.top_queue_candidates(upcoming)], allow_image)
+        outcome["status"] = "refilled"
+        return True
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.exception("Queue refill failed: %s", exc)
+        return False
+    finally:
+        _finish_run(store, tracer, outcome)
+
+
+def refill() -> int:
+    load_dotenv()
+    setup_logging(os.getenv("LOG_LEVEL", "INFO"))
+    store = Store(os.getenv("DB_PATH", "data/bot.sqlite3"))
+    try:
+        return 0 if _refill(store, int(os.getenv("DEDUPE_DAYS", "14"))) else 1
+    finally:
+        store.close()
+
+
+def _daemon_post(
+    store: Store, x: XClient, slot: int, dedupe_days: int, dedupe_window: DedupeWindow | None = None
+) -> bool:
+    # True once the slot is done with (posted, or skipped on purpose); False means it is worth another try.
+    tracer = tracing.start_run()
+    outcome: dict = {"status": "error", "slot": slot}
+    try:
+        rules = _load_json("config/rules.json")
+        if not _cooldown_ok(store, int(os.getenv("COOLDOWN_SECONDS", "600"))):
+            logger.info("Cooldown active. Skip posting.")
+            outcome["status"] = "skipped"
+            return True
+        cold = not store.best_queue_candidate()
+        if cold:
+            # Nothing was prefetched (first start, or every candidate was evicted); fall back to a cold build.
+            sources, people = _load_json("config/sources.json"), _load_json("config/people.json")
+            build_queue(store, sources, people, rules, dedupe_days, dedupe_window)
+        _post_queued(store, x, rules, slot, outcome, offline=not cold)
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.exception("Slot%s post failed: %s", slot, exc)
+    finally:
+        _finish_run(store, tracer, outcome)
+    return outcome["status"] == "posted"
+
+
+def run_daemon(stop: threading.Event | None = None) -> int:
+    load_dotenv()
+    setup_logging(os.getenv("LOG_LEVEL", "INFO"))
+
+    if stop is None:
+        stop = threading.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: stop.set())
+
+    # One process keeps the HTTP pool, compiled matcher, parsed configs and SQLite connection warm across slots.
+    store = Store(os.getenv("DB_PATH", "data/bot.sqlite3"))
+    x = XClient()
+    dedupe_days = int(os.getenv("DEDUPE_DAYS", "14"))
+    dedupe_window = DedupeWindow(dedupe_days)
+    handled: set[datetime] = set()
+    # (slot start, failed attempts, next attempt) for the slot being retried.
+    retry: tuple[datetime, int, datetime] | None = None
+    last_refill: datetime | None = None
+    announced: datetime | None = None
+    logger.info("Daemon started.")
+    try:
+        while not stop.is_set():
+            try:
+                rules = _load_json("config/rules.json")
+                daemon_cfg = rules.get("daemon", {})
+                refill_every = timedelta(minutes=float(daemon_cfg.get("refill_minutes", 30)))
+                prefetch_lead = timedelta(minutes=float(daemon_cfg.get("prefetch_minutes", 15)))
+                refill_budget = timedelta(seconds=float(daemon_cfg.get("refill_budget_seconds", 300)))
+                retry_base = float(daemon_cfg.get("retry_seconds", 60))
+                retry_max = float(daemon_cfg.get("retry_max_seconds", 600))
+
+                now = now_jst()
+                slot, start = _due_slot(store, rules, now, handled)
+            except (OSError, sqlite3.Error, TypeError, ValueError) as exc:
+                # No rules that ever parsed, a bad value in them, or "database is locked" from a concurrent writer:
+                # none of these should end the daemon, so wait and look again.
+                logger.exception("Daemon could not plan the next slot: %s", exc)
+                stop.wait(DAEMON_ERROR_WAIT_SECONDS)
+                continue
+            if start <= now:
+                if retry and retry[0] == start and now < retry[2]:
+                    stop.wait(min((retry[2] - now).total_seconds(), 600))
+                    continue
+                if _daemon_post(store, x, slot, dedupe_days, dedupe_window):
+                    handled.add(start)
+                    retry = None
+                    continue
+                # Like cron's next tick, a failed post is tried again while the window is open; _due_slot moves on
+                # to the next slot once it closes.
+                attempts = retry[1] + 1 if retry and retry[0] == start else 1
+                delay = min(retry_max, retry_base * 2 ** (attempts - 1))
+                retry = (start, attempts, now_jst() + timedelta(seconds=delay))
+                logger.warning("Slot%s not posted (attempt %s); retrying in %.0fs", slot, attempts, delay)
+                continue
+
+            # Refill periodically and once more shortly before each slot, but never so late that it delays the post.
+            refill_at = now if last_refill is None else last_refill + refill_every
+            if last_refill is None or last_refill < start - prefetch_lead:
+                refill_at = min(refill_at, start - prefetch_lead)
+            latest_refill = start - refill_budget
+            if refill_at <= now <= latest_refill:
+                _refill(store, dedupe_days, dedupe_window)
+                last_refill = now_jst()
+                continue
+
+            wake_at = refill_at if now < refill_at <= latest_refill else start
+            if wake_at != announced:
+                logger.info("Next: slot%s at %s (wake at %s)", slot, start.isoformat(), wake_at.isoformat())
+                announced = wake_at
+            # Sleep in bounded steps so wall-clock adjustments and config edits are picked up.
+            stop.wait(min((wake_at - now_jst()).total_seconds(), 600))
+    finally:
+        store.close()
+        logger.info("Daemon stopped.")
+    return 0
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="X AI case bot")
+    parser.add_argument(
+        "command",
+        nargs="?",
+        choices=["run", "refill", "post"],
+        default="run",
+        help="run: refill then post (default), refill: update the queue only, post: post from the queue only",
+    )
     parser.add_argument("--slot", type=int, choices=[1, 2, 3], default=None, help="force slot")
+    parser.add_argument("--daemon", action="store_true", help="stay resident and post at each slot")
     args = parser.parse_args()
-    raise SystemExit(run(slot_override=args.slot))
+    try:
+        if args.daemon:
+            raise SystemExit(run_daemon())
+        if args.command == "refill":
+            raise SystemExit(refill())
+        raise SystemExit(run(slot_override=args.slot, refill=args.command == "run"))
+    finally:
+        shutdown_parse_pool()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,155 @@
+import json
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Iterator
+
+from .text import normalize_text
+
+PRACTICAL_KEYWORDS = ["導入", "運用", "成果", "効率", "revenue", "productivity", "enterprise", "workflow"]
+TOPIC_KEYWORDS = {
+    "医療AI": ["medical", "医療"],
+    "教育AI": ["education", "教育"],
+    "金融AI": ["finance", "金融"],
+}
+DEFAULT_TOPIC = "AI活用事例"
+# Below this many distinct terms one str.count per term (a C scan each) beats walking the text in Python once.
+AUTOMATON_MIN_TERMS = 300
+
+
+class AhoCorasick:
+    def __init__(self, patterns: list[str]) -> None:
+        self.patterns = patterns
+        self._lengths = [len(p) for p in patterns]
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[list[int]] = [[]]
+        for idx, pat in enumerate(patterns):
+            if not pat:
+                continue
+            state = 0
+            for ch in pat:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                    self._goto[state][ch] = nxt
+                state = nxt
+            self._out[state].append(idx)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def counts(self, text: str) -> dict[int, int]:
+        # Non-overlapping occurrences per pattern, leftmost first: the same numbers str.count gives.
+        found: dict[int, int] = {}
+        free_from: dict[int, int] = {}
+        goto, fail, out, lengths = self._goto, self._fail, self._out, self._lengths
+        state = 0
+        for pos, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for idx in out[state]:
+                if pos - lengths[idx] + 1 >= free_from.get(idx, 0):
+                    found[idx] = found.get(idx, 0) + 1
+                    free_from[idx] = pos + 1
+        return found
+
+
+@dataclass
+class MatchResult:
+    themes: set[int]
+    practical: set[int]
+    topics: set[str]
+    people: set[int]
+    counts: dict[str, int]
+
+
+class KeywordMatcher:
+    def __init__(
+        self,
+        themes: list[str],
+        people: list[dict],
+        topics: dict[str, list[str]] | None = None,
+        practical_keywords: list[str] | None = None,
+    ) -> None:
+        topics = topics if topics is not None else TOPIC_KEYWORDS
+        self.people = people
+        self.topic_order = list(topics.keys())
+        self.theme_terms = [[t for t in normalize_text(th).split() if t] for th in themes]
+        self.topic_terms = {label: [t for t in (normalize_text(kw) for kw in kws) if t] for label, kws in topics.items()}
+        # (kind, key) per distinct normalized pattern; one pattern may serve several kinds.
+        self._labels: dict[str, list[tuple[str, object]]] = {}
+
+        for i, th in enumerate(themes):
+            for tok in normalize_text(th).split():
+                self._add(tok, "theme", i)
+        for i, kw in enumerate(practical_keywords if practical_keywords is not None else PRACTICAL_KEYWORDS):
+            self._add(normalize_text(kw), "practical", i)
+        for label, kws in topics.items():
+            for kw in kws:
+                self._add(normalize_text(kw), "topic", label)
+        for i, p in enumerate(people):
+            for tok in [p["name"]] + list(p.get("keywords", [])):
+                self._add(normalize_text(tok), "person", i)
+
+        self.terms = list(self._labels)
+        self._automaton = AhoCorasick(self.terms) if len(self.terms) >= AUTOMATON_MIN_TERMS else None
+
+    def _add(self, pattern: str, kind: str, key) -> None:
+        if pattern:
+            self._labels.setdefault(pattern, []).append((kind, key))
+
+    def match(self, normalized_text: str) -> MatchResult:
+        themes: set[int] = set()
+        practical: set[int] = set()
+        topics: set[str] = set()
+        people: set[int] = set()
+        counts: dict[str, int] = {}
+        buckets = {"theme": themes, "practical": practical, "topic": topics, "person": people}
+        for term, n in self._counts(normalized_text):
+            counts[term] = n
+            for kind, key in self._labels[term]:
+                buckets[kind].add(key)
+        return MatchResult(themes, practical, topics, people, counts)
+
+    def _counts(self, text: str) -> Iterator[tuple[str, int]]:
+        if self._automaton is not None:
+            for idx, n in self._automaton.counts(text).items():
+                yield self.terms[idx], n
+            return
+        for term in self.terms:
+            n = text.count(term)
+            if n:
+                yield term, n
+
+
+_cache: dict[str, KeywordMatcher] = {}
+_cache_lock = threading.Lock()
+
+
+def get_matcher(
+    themes: list[str],
+    people: list[dict],
+    topics: dict[str, list[str]] | None = None,
+    practical_keywords: list[str] | None = None,
+) -> KeywordMatcher:
+    key = json.dumps([themes, people, topics, practical_keywords], ensure_ascii=False, sort_keys=True)
+    with _cache_lock:
+        matcher = _cache.get(key)
+        if matcher is None:
+            # Config only changes when the JSON files are edited, so one live entry is enough.
+            _cache.clear()
+            matcher = _cache[key] = KeywordMatcher(themes, people, topics, practical_keywords)
+        return matcher
@@ -0,0 +1,207 @@
+import logging
+import sqlite3
+from typing import Callable
+
+from .archive import CODEC, compress_body
+
+logger = logging.getLogger(__name__)
+
+
+def _add_column(conn: sqlite3.Connection, table: str, column: str, decl: str) -> None:
+    # Databases created before versioning already carry some of these columns.
+    cols = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in cols:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+def _v1_base_tables(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS posts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            article_url TEXT NOT NULL,
+            article_hash TEXT NOT NULL,
+            topic TEXT,
+            person TEXT,
+            slot INTEGER NOT NULL,
+            text TEXT NOT NULL,
+            tweet_id TEXT,
+            image_source TEXT,
+            posted_at TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS article_queue (
+            article_hash TEXT PRIMARY KEY,
+            article_url TEXT NOT NULL,
+            title TEXT NOT NULL,
+            body TEXT NOT NULL,
+            topic TEXT,
+            person TEXT,
+            image_url TEXT,
+            image_source TEXT,
+            score REAL,
+            selected_at TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_posts_posted_at ON posts(posted_at)")
+
+
+def _v2_seen_urls(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS seen_urls (
+            url_hash TEXT PRIMARY KEY,
+            url TEXT NOT NULL,
+            fetched_at TEXT NOT NULL,
+            content_hash TEXT,
+            status TEXT NOT NULL
+        )
+        """
+    )
+
+
+def _v3_post_fingerprints(conn: sqlite3.Connection) -> None:
+    _add_column(conn, "posts", "minhash", "BLOB")
+    _add_column(conn, "posts", "simhash", "TEXT")
+
+
+def _v4_queue_fingerprints(conn: sqlite3.Connection) -> None:
+    _add_column(conn, "article_queue", "canonical_url", "TEXT")
+    _add_column(conn, "article_queue", "minhash", "BLOB")
+    _add_column(conn, "article_queue", "simhash", "TEXT")
+
+
+def _v5_indexes(conn: sqlite3.Connection) -> None:
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_queue_rank ON article_queue(score DESC, selected_at DESC)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_queue_selected_at ON article_queue(selected_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_posts_hash_posted ON posts(article_hash, posted_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_posts_person_posted ON posts(person, posted_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_seen_fetched_at ON seen_urls(fetched_at)")
+    conn.execute(
+        """
+        CREATE VIEW IF NOT EXISTS ranked_queue AS
+        SELECT * FROM article_queue ORDER BY score DESC, selected_at DESC
+        """
+    )
+
+
+def _v6_compressed_bodies(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS article_bodies (
+            article_hash TEXT PRIMARY KEY,
+            codec TEXT NOT NULL,
+            body BLOB NOT NULL
+        )
+        """
+    )
+    rows = conn.execute("SELECT article_hash, body FROM article_queue WHERE body != ''").fetchall()
+    conn.executemany(
+        "INSERT OR REPLACE INTO article_bodies(article_hash, codec, body) VALUES(?, ?, ?)",
+        [(row[0], CODEC, compress_body(row[1])) for row in rows],
+    )
+    conn.execute("UPDATE article_queue SET body = ''")
+
+
+def _v7_run_metrics(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            started_at TEXT NOT NULL,
+            finished_at TEXT NOT NULL,
+            duration_ms REAL NOT NULL,
+            status TEXT NOT NULL,
+            slot INTEGER,
+            summary TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS run_stages (
+            run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+            stage TEXT NOT NULL,
+            calls INTEGER NOT NULL,
+            wall_ms REAL NOT NULL,
+            items INTEGER NOT NULL,
+            bytes INTEGER NOT NULL,
+            retries INTEGER NOT NULL,
+            PRIMARY KEY (run_id, stage)
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS run_counters (
+            run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+            name TEXT NOT NULL,
+            value REAL NOT NULL,
+            PRIMARY KEY (run_id, name)
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_runs_started_at ON runs(started_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_run_stages_stage ON run_stages(stage, wall_ms)")
+
+
+def _v8_source_health(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS source_health (
+            source_url TEXT PRIMARY KEY,
+            latency_ewma_ms REAL,
+            error_streak INTEGER NOT NULL DEFAULT 0,
+            last_success_at TEXT,
+            last_error_at TEXT,
+            last_error TEXT,
+            poll_interval_s REAL,
+            next_poll_at TEXT,
+            head_hash TEXT
+        )
+        """
+    )
+
+
+def _v9_incremental_vacuum(conn: sqlite3.Connection) -> None:
+    # Only recorded here; the VACUUM that migrate() runs after this step rebuilds the file with it.
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+
+
+MIGRATIONS: list[tuple[int, Callable[[sqlite3.Connection], None]]] = [
+    (1, _v1_base_tables),
+    (2, _v2_seen_urls),
+    (3, _v3_post_fingerprints),
+    (4, _v4_queue_fingerprints),
+    (5, _v5_indexes),
+    (6, _v6_compressed_bodies),
+    (7, _v7_run_metrics),
+    (8, _v8_source_health),
+    (9, _v9_incremental_vacuum),
+]
+# Steps that only take effect after a VACUUM, which cannot run inside the migration's transaction.
+VACUUM_AFTER = {9}
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    version = schema_version(conn)
+    for target, step in MIGRATIONS:
+        if target <= version:
+            continue
+        with conn:
+            conn.execute("BEGIN")
+            step(conn)
+            conn.execute(f"PRAGMA user_version={target}")
+        if target in VACUUM_AFTER:
+            conn.execute("VACUUM")
+        logger.info("Migrated database schema to v%s (%s)", target, step.__name__.lstrip("_"))
+        version = target
+    return version
@@ -1,39 +1,98 @@
-from .utils import normalize_text
+import numpy as np
 
+from .matcher import DEFAULT_TOPIC, KeywordMatcher, MatchResult, get_matcher
+from .text import normalize_text
 
-def rank_article(article: dict, people: list[dict], themes: list[str]) -> tuple[float, str, str | None, str | None]:
-    text = normalize_text(f"{article.get('title', '')} {article.get('body', '')}")
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Fixed length normaliser (characters); a typical extracted article body.
+BM25_AVG_CHARS = 2000.0
+
+
+def _rule_score(matcher: KeywordMatcher, hits: MatchResult) -> tuple[float, str | None, str | None]:
     score = 0.0
 
     # Theme signals
-    theme_hits = 0
-    for th in themes:
-        tokens = normalize_text(th).split()
-        if any(t in text for t in tokens if t):
-            theme_hits += 1
-    score += theme_hits * 2.0
+    score += len(hits.themes) * 2.0
 
     # Practical signal
-    for kw in ["導入", "運用", "成果", "効率", "revenue", "productivity", "enterprise", "workflow"]:
-        if kw in text:
-            score += 0.5
+    score += len(hits.practical) * 0.5
 
     person = None
     image_source = None
-    for p in people:
-        p_tokens = [normalize_text(p["name"])] + [normalize_text(k) for k in p.get("keywords", [])]
-        if any(tok and tok in text for tok in p_tokens):
-            score += 3.0
-            person = p.get("name")
-            image_source = p.get("image_source")
-            break
-
-    topic = "AI活用事例"
-    if "medical" in text or "医療" in text:
-        topic = "医療AI"
-    elif "education" in text or "教育" in text:
-        topic = "教育AI"
-    elif "finance" in text or "金融" in text:
-        topic = "金融AI"
-
-    return score, topic, person, image_source
+    if hits.people:
+        p = matcher.people[min(hits.people)]
+        score += 3.0
+        person = p.get("name")
+        image_source = p.get("image_source")
+    return score, person, image_source
+
+
+def rank_article(
+    article: dict,
+    people: list[dict],
+    themes: list[str],
+    matcher: KeywordMatcher | None = None,
+    relevance_weight: float = 2.0,
+) -> tuple[float, str, str | None, str | None]:
+    # One scoring definition: a single article is a batch of one, and batches never change a score.
+    return rank_articles([article], people, themes, matcher, relevance_weight)[0]
+
+
+def _cosine(weights: np.ndarray, profiles: np.ndarray) -> np.ndarray:
+    out = np.zeros((weights.shape[0], profiles.shape[0]))
+    if not profiles.size:
+        return out
+    norms = np.linalg.norm(weights, axis=1)[:, None] * np.linalg.norm(profiles, axis=1)[None, :]
+    return np.divide(weights @ profiles.T, norms, out=out, where=norms > 0)
+
+
+def rank_articles(
+    articles: list[dict],
+    people: list[dict],
+    themes: list[str],
+    matcher: KeywordMatcher | None = None,
+    relevance_weight: float = 2.0,
+) -> list[tuple[float, str, str | None, str | None]]:
+    if not articles:
+        return []
+    matcher = matcher or get_matcher(themes, people)
+    texts = [normalize_text(f"{a.get('title', '')} {a.get('body', '')}") for a in articles]
+    hits = [matcher.match(t) for t in texts]
+
+    profile_terms = list(matcher.theme_terms) + list(matcher.topic_terms.values())
+    vocab = {term: j for j, term in enumerate(dict.fromkeys(t for terms in profile_terms for t in terms))}
+
+    profiles = np.zeros((len(profile_terms), len(vocab)))
+    for i, terms in enumerate(profile_terms):
+        for term in terms:
+            profiles[i, vocab[term]] = 1.0
+
+    tf = np.zeros((len(articles), len(vocab)))
+    for d, h in enumerate(hits):
+        for term, n in h.counts.items():
+            j = vocab.get(term)
+            if j is not None:
+                tf[d, j] = n
+
+    # BM25 term weights. IDF comes from the profiles (terms unique to one theme or topic weigh more) and the
+    # length normaliser is fixed, so a score never depends on which other articles share the batch.
+    # Lengths are in characters so Japanese text is measured fairly.
+    lengths = np.array([max(1, len(t)) for t in texts], dtype=float)
+    df = (profiles > 0).sum(axis=0)
+    idf = np.log1p((len(profile_terms) - df + 0.5) / (df + 0.5))
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / BM25_AVG_CHARS)
+    weights = idf * tf * (BM25_K1 + 1) / (tf + norm[:, None])
+
+    # Topic profiles only shape the IDF above; relevance comes from the themes.
+    n_themes = len(matcher.theme_terms)
+    relevance = _cosine(weights, profiles[:n_themes]).max(axis=1) if n_themes else np.zeros(len(articles))
+
+    out = []
+    for d, h in enumerate(hits):
+        score, person, image_source = _rule_score(matcher, h)
+        score += relevance_weight * float(relevance[d])
+        # Topic labels feed dedupe and the posts, so they keep the config-order rule: first matching topic wins.
+        topic = next((t for t in matcher.topic_order if t in h.topics), DEFAULT_TOPIC)
+        out.append((round(score, 4), topic, person, image_source))
+    return out
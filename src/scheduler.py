@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
 
@@ -10,6 +10,15 @@ def _parse_hm(value: str, default_h: int, default_m: int) -> tuple[int, int]:
         return default_h, default_m
 
 
+def _slot_times(slots: dict | None) -> dict[int, tuple[int, int]]:
+    slots = slots or {"slot1": "09:00", "slot2": "13:00", "slot3": "20:00"}
+    return {
+        1: _parse_hm(str(slots.get("slot1", "09:00")), 9, 0),
+        2: _parse_hm(str(slots.get("slot2", "13:00")), 13, 0),
+        3: _parse_hm(str(slots.get("slot3", "20:00")), 20, 0),
+    }
+
+
 def current_slot_jst(
     now: datetime | None = None,
     slots: dict | None = None,
@@ -17,18 +26,35 @@ def current_slot_jst(
     window_minutes: int = 59,
 ) -> int | None:
     now = now or datetime.now(ZoneInfo("Asia/Tokyo"))
-    slots = slots or {"slot1": "09:00", "slot2": "13:00", "slot3": "20:00"}
     enabled = set(enabled_slots or [1, 2, 3])
 
-    candidates = {
-        1: _parse_hm(str(slots.get("slot1", "09:00")), 9, 0),
-        2: _parse_hm(str(slots.get("slot2", "13:00")), 13, 0),
-        3: _parse_hm(str(slots.get("slot3", "20:00")), 20, 0),
-    }
-
-    for slot, (h, m) in candidates.items():
+    for slot, (h, m) in _slot_times(slots).items():
         if slot not in enabled:
             continue
         if now.hour == h and 0 <= (now.minute - m) <= max(0, window_minutes):
             return slot
     return None
+
+
+def next_slot_jst(
+    now: datetime | None = None,
+    slots: dict | None = None,
+    enabled_slots: list[int] | None = None,
+) -> tuple[int, datetime]:
+    now = now or datetime.now(ZoneInfo("Asia/Tokyo"))
+    enabled = set(enabled_slots or [1, 2, 3])
+    times = {slot: hm for slot, hm in _slot_times(slots).items() if slot in enabled}
+    if not times:
+        raise ValueError("No enabled slots")
+
+    for days in (0, 1):
+        day = now + timedelta(days=days)
+        upcoming = [
+            (day.replace(hour=h, minute=m, second=0, microsecond=0), slot)
+            for slot, (h, m) in times.items()
+        ]
+        upcoming = sorted(item for item in upcoming if item[0] > now)
+        if upcoming:
+            start, slot = upcoming[0]
+            return slot, start
+    raise ValueError("No upcoming slot")
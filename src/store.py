@@ -1,56 +1,97 @@
+import json
 import os
 import sqlite3
+import time
 from datetime import timedelta
 from typing import Any
 
+from .archive import CODEC, append_segment, compress_body, decompress_body, segment_path
+from .migrations import migrate
 from .utils import now_jst
 
+QUEUE_UPSERT_SQL = """
+INSERT INTO article_queue(article_hash, article_url, title, body, topic, person, image_url,
+                          image_source, score, selected_at, canonical_url, minhash, simhash)
+VALUES(:article_hash, :article_url, :title, :body, :topic, :person, :image_url,
+       :image_source, :score, :selected_at, :canonical_url, :minhash, :simhash)
+ON CONFLICT(article_hash) DO UPDATE SET
+  article_url=excluded.article_url,
+  title=excluded.title,
+  body=excluded.body,
+  topic=excluded.topic,
+  person=excluded.person,
+  image_url=excluded.image_url,
+  image_source=excluded.image_source,
+  score=excluded.score,
+  selected_at=excluded.selected_at,
+  canonical_url=excluded.canonical_url,
+  minhash=excluded.minhash,
+  simhash=excluded.simhash
+"""
+QUEUE_DEFAULTS = {"canonical_url": None, "minhash": None, "simhash": None}
+QUEUE_META_COLUMNS = (
+    "article_hash, article_url, title, topic, person, image_url, image_source, score, selected_at, "
+    "canonical_url, minhash, simhash"
+)
+
+BODY_UPSERT_SQL = "INSERT OR REPLACE INTO article_bodies(article_hash, codec, body) VALUES(?, ?, ?)"
+
+SOURCE_HEALTH_UPSERT_SQL = """
+INSERT INTO source_health(source_url, latency_ewma_ms, error_streak, last_success_at, last_error_at, last_error,
+                          poll_interval_s, next_poll_at, head_hash)
+VALUES(:source_url, :latency_ewma_ms, :error_streak, :last_success_at, :last_error_at, :last_error,
+       :poll_interval_s, :next_poll_at, :head_hash)
+ON CONFLICT(source_url) DO UPDATE SET
+    latency_ewma_ms = excluded.latency_ewma_ms,
+    error_streak = excluded.error_streak,
+    last_success_at = excluded.last_success_at,
+    last_error_at = excluded.last_error_at,
+    last_error = excluded.last_error,
+    poll_interval_s = excluded.poll_interval_s,
+    next_poll_at = excluded.next_poll_at,
+    head_hash = excluded.head_hash
+"""
+
+SEEN_UPSERT_SQL = """
+INSERT INTO seen_urls(url_hash, url, fetched_at, content_hash, status)
+VALUES(?, ?, ?, ?, ?)
+ON CONFLICT(url_hash) DO UPDATE SET
+  url=excluded.url,
+  fetched_at=excluded.fetched_at,
+  content_hash=excluded.content_hash,
+  status=excluded.status
+"""
+
+SEEN_EVICTED_SQL = """
+INSERT INTO seen_urls(url_hash, url, fetched_at, status)
+VALUES(?, ?, ?, 'evicted')
+ON CONFLICT(url_hash) DO UPDATE SET
+  fetched_at=excluded.fetched_at,
+  status=excluded.status
+"""
+
 
 class Store:
-    def __init__(self, db_path: str) -> None:
+    def __init__(self, db_path: str, journal_mode: str | None = None, archive_dir: str | None = None) -> None:
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
-        self.conn = sqlite3.connect(db_path)
+        self.archive_dir = archive_dir or os.path.join(os.path.dirname(db_path), "archive")
+        self.conn = sqlite3.connect(db_path, timeout=30)
         self.conn.row_factory = sqlite3.Row
-        self._init_tables()
+        self._configure(journal_mode or os.getenv("DB_JOURNAL_MODE", "wal"))
+        migrate(self.conn)
 
-    def _init_tables(self) -> None:
-        cur = self.conn.cursor()
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS posts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                article_url TEXT NOT NULL,
-                article_hash TEXT NOT NULL,
-                topic TEXT,
-                person TEXT,
-                slot INTEGER NOT NULL,
-                text TEXT NOT NULL,
-                tweet_id TEXT,
-                image_source TEXT,
-                posted_at TEXT NOT NULL
-            )
-            """
-        )
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS article_queue (
-                article_hash TEXT PRIMARY KEY,
-                article_url TEXT NOT NULL,
-                title TEXT NOT NULL,
-                body TEXT NOT NULL,
-                topic TEXT,
-                person TEXT,
-                image_url TEXT,
-                image_source TEXT,
-                score REAL,
-                selected_at TEXT NOT NULL
-            )
-            """
-        )
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_posts_posted_at ON posts(posted_at)")
-        self.conn.commit()
+    def _configure(self, journal_mode: str) -> None:
+        # WAL lets the webapp read while a run writes; with WAL, NORMAL sync stays consistent without an fsync per commit.
+        self.conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        if journal_mode.lower() == "wal":
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=30000")
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+        self.conn.execute("PRAGMA cache_size=-16000")
 
     def close(self) -> None:
+        # Fold the WAL back into the main file so copying/caching data/ only needs bot.sqlite3.
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
         self.conn.close()
 
     def recent_posts(self, days: int = 14) -> list[sqlite3.Row]:
@@ -59,6 +100,16 @@ class Store:
         cur.execute("SELECT * FROM posts WHERE posted_at >= ?", (since,))
         return cur.fetchall()
 
+    def dedupe_rows(self, days: int = 14, after_id: int = 0) -> list[sqlite3.Row]:
+        since = (now_jst() - timedelta(days=days)).isoformat()
+        cur = self.conn.cursor()
+        cur.execute(
+            "SELECT id, posted_at, article_url, article_hash, topic, person, minhash, simhash FROM posts "
+            "WHERE posted_at >= ? AND id > ? ORDER BY id",
+            (since, after_id),
+        )
+        return cur.fetchall()
+
     def recently_posted_hash(self, article_hash: str, days: int = 14) -> bool:
         since = (now_jst() - timedelta(days=days)).isoformat()
         cur = self.conn.cursor()
@@ -69,38 +120,125 @@ class Store:
         return cur.fetchone() is not None
 
     def queue_upsert(self, item: dict[str, Any]) -> None:
-        cur = self.conn.cursor()
-        cur.execute(
-            """
-            INSERT INTO article_queue(article_hash, article_url, title, body, topic, person, image_url,
-                                      image_source, score, selected_at)
-            VALUES(:article_hash, :article_url, :title, :body, :topic, :person, :image_url,
-                   :image_source, :score, :selected_at)
-            ON CONFLICT(article_hash) DO UPDATE SET
-              article_url=excluded.article_url,
-              title=excluded.title,
-              body=excluded.body,
-              topic=excluded.topic,
-              person=excluded.person,
-              image_url=excluded.image_url,
-              image_source=excluded.image_source,
-              score=excluded.score,
-              selected_at=excluded.selected_at
-            """,
-            item,
-        )
-        self.conn.commit()
+        self.upsert_many([item])
+
+    def upsert_many(self, items: list[dict[str, Any]]) -> None:
+        with self.conn:
+            self._write_queue(items)
+
+    def _write_queue(self, items: list[dict[str, Any]]) -> None:
+        # Bodies go compressed into article_bodies; article_queue keeps only the small columns.
+        rows = [{**QUEUE_DEFAULTS, **item, "body": ""} for item in items]
+        bodies = [(item["article_hash"], CODEC, compress_body(item.get("body") or "")) for item in items]
+        self.conn.executemany(QUEUE_UPSERT_SQL, rows)
+        self.conn.executemany(BODY_UPSERT_SQL, bodies)
 
     def get_queued_article(self, article_hash: str) -> sqlite3.Row | None:
         cur = self.conn.cursor()
-        cur.execute("SELECT * FROM article_queue WHERE article_hash = ?", (article_hash,))
+        cur.execute(f"SELECT {QUEUE_META_COLUMNS} FROM article_queue WHERE article_hash = ?", (article_hash,))
         return cur.fetchone()
 
+    def is_queued(self, article_hash: str) -> bool:
+        cur = self.conn.cursor()
+        cur.execute("SELECT 1 FROM article_queue WHERE article_hash = ?", (article_hash,))
+        return cur.fetchone() is not None
+
+    def load_body(self, article_hash: str) -> str:
+        cur = self.conn.cursor()
+        cur.execute("SELECT codec, body FROM article_bodies WHERE article_hash = ?", (article_hash,))
+        row = cur.fetchone()
+        return decompress_body(row["body"], row["codec"]) if row else ""
+
+    def seen_url(self, url_hash: str) -> sqlite3.Row | None:
+        cur = self.conn.cursor()
+        cur.execute("SELECT * FROM seen_urls WHERE url_hash = ?", (url_hash,))
+        return cur.fetchone()
+
+    def mark_seen(self, url_hash: str, url: str, status: str, content_hash: str | None = None) -> None:
+        with self.conn:
+            self.conn.execute(SEEN_UPSERT_SQL, (url_hash, url, now_jst().isoformat(), content_hash, status))
+
+    def write_buffer(self, max_rows: int = 200, max_seconds: float = 5.0) -> "WriteBuffer":
+        return WriteBuffer(self, max_rows=max_rows, max_seconds=max_seconds)
+
+    def queue_fingerprints(self) -> list[sqlite3.Row]:
+        cur = self.conn.cursor()
+        cur.execute("SELECT article_hash, canonical_url, minhash FROM article_queue")
+        return cur.fetchall()
+
     def best_queue_candidate(self) -> sqlite3.Row | None:
         cur = self.conn.cursor()
-        cur.execute("SELECT * FROM article_queue ORDER BY score DESC, selected_at DESC LIMIT 1")
+        cur.execute(f"SELECT {QUEUE_META_COLUMNS} FROM ranked_queue LIMIT 1")
         return cur.fetchone()
 
+    def top_queue_candidates(self, limit: int = 3) -> list[sqlite3.Row]:
+        cur = self.conn.cursor()
+        cur.execute(f"SELECT {QUEUE_META_COLUMNS} FROM ranked_queue LIMIT ?", (limit,))
+        return cur.fetchall()
+
+    def evict_queue(self, max_age_days: int = 7, max_rows: int = 500) -> int:
+        cutoff = (now_jst() - timedelta(days=max_age_days)).isoformat()
+        rows = self.conn.execute(
+            """
+            SELECT article_hash, article_url FROM article_queue WHERE selected_at < ?
+            UNION
+            SELECT article_hash, article_url FROM article_queue WHERE article_hash NOT IN (
+                SELECT article_hash FROM ranked_queue LIMIT ?
+            )
+            """,
+            (cutoff, max_rows),
+        ).fetchall()
+        if not rows:
+            return 0
+        doomed = [row["article_hash"] for row in rows]
+        self._archive_posted_bodies(doomed)
+        evicted_at = now_jst().isoformat()
+        with self.conn:
+            self.conn.executemany("DELETE FROM article_queue WHERE article_hash = ?", [(h,) for h in doomed])
+            self.conn.executemany("DELETE FROM article_bodies WHERE article_hash = ?", [(h,) for h in doomed])
+            # Left as 'queued' these would be fetched again after recheck_hours; 'evicted' holds until evict_seen.
+            self.conn.executemany(
+                SEEN_EVICTED_SQL, [(row["article_hash"], row["article_url"], evicted_at) for row in rows]
+            )
+        self.reclaim_space()
+        return len(doomed)
+
+    def _archive_posted_bodies(self, hashes: list[str]) -> None:
+        records = []
+        for h in hashes:
+            row = self.conn.execute(
+                """
+                SELECT q.article_hash, q.article_url, q.title, b.codec, b.body
+                FROM article_queue q JOIN article_bodies b ON b.article_hash = q.article_hash
+                WHERE q.article_hash = ? AND EXISTS (SELECT 1 FROM posts p WHERE p.article_hash = q.article_hash)
+                """,
+                (h,),
+            ).fetchone()
+            if row:
+                header = {
+                    "article_hash": row["article_hash"],
+                    "article_url": row["article_url"],
+                    "title": row["title"],
+                    "codec": row["codec"],
+                    "archived_at": now_jst().isoformat(),
+                }
+                records.append((header, row["body"]))
+        if records:
+            append_segment(segment_path(self.archive_dir, now_jst().strftime("%Y%m")), records)
+
+    def evict_seen(self, max_age_days: int = 30) -> int:
+        cutoff = (now_jst() - timedelta(days=max_age_days)).isoformat()
+        with self.conn:
+            evicted = self.conn.execute("DELETE FROM seen_urls WHERE fetched_at < ?", (cutoff,)).rowcount
+        if evicted:
+            self.reclaim_space()
+        return evicted
+
+    def reclaim_space(self) -> None:
+        # Freed pages go back to the filesystem (auto_vacuum=INCREMENTAL since schema v9); under WAL the file shrinks
+        # at the next checkpoint, at the latest in close(). execute() would step the pragma once and free one page.
+        self.conn.executescript("PRAGMA incremental_vacuum;")
+
     def save_post(
         self,
         article_url: str,
@@ -111,12 +249,15 @@ class Store:
         text: str,
         tweet_id: str | None,
         image_source: str | None,
+        minhash: bytes | None = None,
+        simhash: str | None = None,
     ) -> None:
         cur = self.conn.cursor()
         cur.execute(
             """
-            INSERT INTO posts(article_url, article_hash, topic, person, slot, text, tweet_id, image_source, posted_at)
-            VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?)
+            INSERT INTO posts(article_url, article_hash, topic, person, slot, text, tweet_id, image_source, posted_at,
+                              minhash, simhash)
+            VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
             (
                 article_url,
@@ -128,12 +269,100 @@ class Store:
                 tweet_id,
                 image_source,
                 now_jst().isoformat(),
+                minhash,
+                simhash,
             ),
         )
         self.conn.commit()
 
+    def source_health(self) -> list[sqlite3.Row]:
+        return self.conn.execute("SELECT * FROM source_health").fetchall()
+
+    def save_source_health(self, rows: list[dict[str, Any]]) -> None:
+        if not rows:
+            return
+        with self.conn:
+            self.conn.executemany(SOURCE_HEALTH_UPSERT_SQL, rows)
+
+    def save_run(self, summary: dict[str, Any], max_age_days: int = 90) -> int:
+        cutoff = (now_jst() - timedelta(days=max_age_days)).isoformat()
+        with self.conn:
+            # Cron adds a run every few minutes; older metrics are dropped here so /perf queries stay bounded.
+            # foreign_keys is off, so the ON DELETE CASCADE in the schema does not fire; children go first.
+            for table in ("run_stages", "run_counters"):
+                self.conn.execute(
+                    f"DELETE FROM {table} WHERE run_id IN (SELECT id FROM runs WHERE started_at < ?)", (cutoff,)
+                )
+            self.conn.execute("DELETE FROM runs WHERE started_at < ?", (cutoff,))
+            cur = self.conn.execute(
+                """
+                INSERT INTO runs(started_at, finished_at, duration_ms, status, slot, summary)
+                VALUES(?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    summary["started_at"],
+                    summary["finished_at"],
+                    summary["duration_ms"],
+                    summary.get("status", "unknown"),
+                    summary.get("slot"),
+                    json.dumps(summary, ensure_ascii=False),
+                ),
+            )
+            run_id = cur.lastrowid
+            self.conn.executemany(
+                """
+                INSERT INTO run_stages(run_id, stage, calls, wall_ms, items, bytes, retries)
+                VALUES(:run_id, :stage, :calls, :wall_ms, :items, :bytes, :retries)
+                """,
+                [{"run_id": run_id, "stage": name, **st} for name, st in summary.get("stages", {}).items()],
+            )
+            self.conn.executemany(
+                "INSERT INTO run_counters(run_id, name, value) VALUES(?, ?, ?)",
+                [(run_id, name, value) for name, value in summary.get("counters", {}).items()],
+            )
+        return run_id
+
     def last_post_time(self) -> str | None:
         cur = self.conn.cursor()
         cur.execute("SELECT posted_at FROM posts ORDER BY id DESC LIMIT 1")
         row = cur.fetchone()
         return row["posted_at"] if row else None
+
+
+class WriteBuffer:
+    def __init__(self, store: Store, max_rows: int = 200, max_seconds: float = 5.0) -> None:
+        self.store = store
+        self.max_rows = max_rows
+        self.max_seconds = max_seconds
+        self._queue: list[dict[str, Any]] = []
+        self._seen: list[tuple] = []
+        self._last_flush = time.monotonic()
+
+    def __enter__(self) -> "WriteBuffer":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.flush()
+
+    def queue_upsert(self, item: dict[str, Any]) -> None:
+        self._queue.append(item)
+        self._maybe_flush()
+
+    def mark_seen(self, url_hash: str, url: str, status: str, content_hash: str | None = None) -> None:
+        self._seen.append((url_hash, url, now_jst().isoformat(), content_hash, status))
+        self._maybe_flush()
+
+    def _maybe_flush(self) -> None:
+        pending = len(self._queue) + len(self._seen)
+        if pending >= self.max_rows or time.monotonic() - self._last_flush >= self.max_seconds:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._queue or self._seen:
+            with self.store.conn:
+                if self._queue:
+                    self.store._write_queue(self._queue)  # pylint: disable=protected-access
+                if self._seen:
+                    self.store.conn.executemany(SEEN_UPSERT_SQL, self._seen)
+            self._queue, self._seen = [], []
+        self._last_flush = time.monotonic()
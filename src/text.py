@@ -0,0 +1,48 @@
+import re
+from functools import lru_cache
+
+SHORT_TEXT_CHARS = 256
+
+_URL_RE = re.compile(r"https?://\S+")
+# ぁ-ん, ァ-ン and 一-龥 are all \w already, so the original class reduces to [^\w\s].
+_SYMBOL_RE = re.compile(r"[^\w\s]")
+_ASCII_SYMBOLS = str.maketrans({chr(c): " " for c in range(128) if _SYMBOL_RE.match(chr(c))})
+
+
+def _normalize(text: str) -> str:
+    text = text.lower().strip()
+    if "http" in text:
+        text = _URL_RE.sub("", text)
+    # str.translate has a C fast path for ASCII-only input; everything else goes through the regex.
+    text = text.translate(_ASCII_SYMBOLS) if text.isascii() else _SYMBOL_RE.sub(" ", text)
+    return " ".join(text.split())
+
+
+@lru_cache(maxsize=8192)
+def _normalize_short(text: str) -> str:
+    return _normalize(text)
+
+
+@lru_cache(maxsize=8192)
+def _token_set_short(text: str) -> frozenset[str]:
+    return frozenset(_normalize_short(text).split())
+
+
+def normalize_text(text: str) -> str:
+    # Titles, topics and keywords repeat across calls; long bodies rarely do and would bloat the cache.
+    if len(text) <= SHORT_TEXT_CHARS:
+        return _normalize_short(text)
+    return _normalize(text)
+
+
+def token_set(text: str) -> frozenset[str]:
+    if len(text) <= SHORT_TEXT_CHARS:
+        return _token_set_short(text)
+    return frozenset(_normalize(text).split())
+
+
+def jaccard_similarity(a: str, b: str) -> float:
+    sa, sb = token_set(a), token_set(b)
+    if not sa or not sb:
+        return 0.0
+    return len(sa & sb) / len(sa | sb)
@@ -1,9 +1,81 @@
+import functools
+import hashlib
+import logging
+import os
 from io import BytesIO
 
-import requests
 from PIL import Image, ImageDraw, ImageFont
 
+from . import tracing
+from .http_cache import get_cache
 
+logger = logging.getLogger(__name__)
+
+# Bump whenever the card layout changes so stale renders are never reused.
+TEMPLATE_VERSION = 2
+WIDTH, HEIGHT = 1200, 675
+FORMATS = {"jpeg": ("JPEG", ".jpg"), "webp": ("WEBP", ".webp")}
+MIN_QUALITY, MAX_QUALITY = 40, 90
+
+
+def _cache_dir() -> str:
+    return os.getenv("THUMB_CACHE_DIR", "data/thumbs")
+
+
+def _output_format() -> tuple[str, str]:
+    return FORMATS.get(os.getenv("THUMB_FORMAT", "jpeg").lower(), FORMATS["jpeg"])
+
+
+def _max_bytes() -> int:
+    return int(os.getenv("THUMB_MAX_KB", "350")) * 1024
+
+
+def load_cover(data: bytes, size: tuple[int, int] = (WIDTH, HEIGHT)) -> Image.Image:
+    width, height = size
+    img = Image.open(BytesIO(data))
+    # JPEG can decode at 1/2, 1/4 or 1/8 scale directly; never below what the cover crop needs.
+    scale = max(width / img.width, height / img.height)
+    img.draft("RGB", (max(width, round(img.width * scale)), max(height, round(img.height * scale))))
+    img = img.convert("RGB")
+
+    # Centre crop to the target aspect ratio, then shrink: cheap integer reduce() first, LANCZOS for the rest.
+    crop_w = min(img.width, round(img.height * width / height))
+    crop_h = min(img.height, round(img.width * height / width))
+    left, top = (img.width - crop_w) // 2, (img.height - crop_h) // 2
+    box = (left, top, left + crop_w, top + crop_h)
+    factor = min(crop_w // width, crop_h // height)
+    if factor >= 2:
+        img = img.reduce(factor, box=box)
+        box = None
+    return img.resize(size, Image.LANCZOS, box=box)
+
+
+def encode_image(img: Image.Image, fmt: str = "JPEG", max_bytes: int | None = None) -> bytes:
+    # Highest quality that fits the byte budget (binary search); the floor is returned if nothing fits.
+    max_bytes = max_bytes or _max_bytes()
+    options = {"optimize": True, "progressive": True} if fmt == "JPEG" else {"method": 4}
+
+    def encode(quality: int) -> bytes:
+        buf = BytesIO()
+        img.save(buf, format=fmt, quality=quality, **options)
+        return buf.getvalue()
+
+    best = encode(MAX_QUALITY)
+    if len(best) <= max_bytes:
+        return best
+    lo, hi = MIN_QUALITY, MAX_QUALITY - 1
+    best = encode(MIN_QUALITY)
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        data = encode(mid)
+        if len(data) <= max_bytes:
+            best, lo = data, mid + 1
+        else:
+            hi = mid - 1
+    return best
+
+
+@functools.lru_cache(maxsize=8)
 def _safe_font(size: int):
     try:
         return ImageFont.truetype("/System/Library/Fonts/ヒラギノ角ゴシック W3.ttc", size)
@@ -11,20 +83,61 @@ def _safe_font(size: int):
         return ImageFont.load_default()
 
 
-def generate_thumbnail(article: dict, allow_image: bool, out_path: str = "data/thumb.jpg") -> str:
-    width, height = 1200, 675
-    canvas = Image.new("RGB", (width, height), (20, 24, 33))
+def _card_key(article: dict, allow_image: bool) -> str:
+    # The card does not vary by slot, so all three slots of an article share one render.
+    article_hash = article.get("article_hash") or article.get("article_url") or ""
+    content = "\x1f".join(
+        str(v or "")
+        for v in (
+            article_hash,
+            article.get("title"),
+            article.get("topic"),
+            article.get("image_url") if allow_image else "",
+            int(allow_image),
+            TEMPLATE_VERSION,
+            _output_format()[0],
+            _max_bytes(),
+        )
+    )
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _source_image(url: str, offline: bool) -> Image.Image | None:
+    # Sources are downloaded once and kept at card size; the original bytes are never needed again.
+    path = os.path.join(_cache_dir(), f"src-{hashlib.sha256(url.encode('utf-8')).hexdigest()}.jpg")
+    if os.path.exists(path):
+        os.utime(path)
+        return Image.open(path).convert("RGB")
+
+    # Offline rendering only uses images prefetched into the HTTP cache by the refill job.
+    cache = get_cache()
+    cached = cache.lookup(url) if offline else cache.get(url)
+    if cached is None:
+        return None
+    src = load_cover(cached.content)
+    os.makedirs(_cache_dir(), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    src.save(tmp, format="JPEG", quality=90)
+    os.replace(tmp, path)
+    return src
+
+
+def _render(article: dict, allow_image: bool, offline: bool) -> tuple[bytes, bool]:
+    fmt = _output_format()[0]
+    complete = True
+    canvas = Image.new("RGB", (WIDTH, HEIGHT), (20, 24, 33))
     draw = ImageDraw.Draw(canvas)
 
     # only allow person/face image if allow_image=true
     if allow_image and article.get("image_url"):
         try:
-            img_bin = requests.get(article["image_url"], timeout=20).content
-            src = Image.open(BytesIO(img_bin)).convert("RGB").resize((width, height))
+            src = _source_image(article["image_url"], offline)
+            if src is None:
+                raise LookupError("image not prefetched")
             canvas.paste(src, (0, 0))
-            draw.rectangle([(0, 0), (width, height)], fill=(0, 0, 0, 110))
+            draw.rectangle([(0, 0), (WIDTH, HEIGHT)], fill=(0, 0, 0, 110))
         except Exception:
-            pass
+            complete = False
 
     # fallback card (no-face safe card)
     draw.rectangle([(40, 40), (1160, 635)], outline=(90, 130, 220), width=4)
@@ -35,5 +148,80 @@ def generate_thumbnail(article: dict, allow_image: bool, out_path: str = "data/t
     draw.text((80, 250), title, fill=(240, 245, 255), font=_safe_font(52))
     draw.text((80, 350), f"テーマ: {topic}", fill=(180, 220, 255), font=_safe_font(36))
 
-    canvas.save(out_path, format="JPEG", quality=90)
+    return encode_image(canvas, fmt), complete
+
+
+@tracing.traced("thumbnail")
+def render_thumbnail(article: dict, allow_image: bool, offline: bool = False) -> bytes:
+    path = os.path.join(_cache_dir(), f"card-{_card_key(article, allow_image)}{_output_format()[1]}")
+    if os.path.exists(path):
+        os.utime(path)
+        tracing.count("thumbnail.cache_hits")
+        with open(path, "rb") as f:
+            return f.read()
+    data, complete = _render(article, allow_image, offline)
+    tracing.count("thumbnail.renders")
+    # A card missing its source image (not prefetched yet) is not cached, so a later render can add it.
+    if complete:
+        os.makedirs(_cache_dir(), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    return data
+
+
+def generate_thumbnail(
+    article: dict,
+    allow_image: bool,
+    out_path: str = "data/thumb.jpg",
+    offline: bool = False,
+) -> str:
+    # The extension follows THUMB_FORMAT so the uploader can send the right media type.
+    out_path = os.path.splitext(out_path)[0] + _output_format()[1]
+    with open(out_path, "wb") as f:
+        f.write(render_thumbnail(article, allow_image, offline))
     return out_path
+
+
+def prerender_thumbnails(articles: list[dict], allow_image: bool, offline: bool = True) -> int:
+    rendered = 0
+    for article in articles:
+        try:
+            render_thumbnail(article, allow_image, offline)
+            rendered += 1
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.warning("Thumbnail pre-render failed: %s (%s)", article.get("article_url"), exc)
+    return rendered
+
+
+def evict_thumbnails(max_bytes: int | None = None) -> int:
+    # LRU over the thumbnail directory; hits refresh mtime, so the oldest files are the least recently used.
+    if max_bytes is None:
+        max_bytes = int(os.getenv("THUMB_CACHE_MAX_MB", "64")) * 1024 * 1024
+    cache_dir = _cache_dir()
+    if not os.path.isdir(cache_dir):
+        return 0
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith((".jpg", ".webp")):
+            continue
+        path = os.path.join(cache_dir, name)
+        try:
+            entries.append((os.path.getmtime(path), os.path.getsize(path), path))
+        except OSError:
+            continue
+
+    entries.sort()
+    total = sum(e[1] for e in entries)
+    removed = 0
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
@@ -0,0 +1,106 @@
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator
+from zoneinfo import ZoneInfo
+
+STAGE_FIELDS = ("calls", "wall_ms", "items", "bytes", "retries")
+
+
+def _now() -> datetime:
+    # Same clock as utils.now_jst; utils imports this module, so it cannot be imported back.
+    return datetime.now(ZoneInfo("Asia/Tokyo"))
+
+
+class Tracer:
+    def __init__(self) -> None:
+        self.started_at = _now()
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stages: dict[str, dict[str, float]] = {}
+        self.counters: dict[str, float] = {}
+
+    def _stage(self, name: str) -> dict[str, float]:
+        return self.stages.setdefault(name, dict.fromkeys(STAGE_FIELDS, 0))
+
+    def current_stage(self) -> str | None:
+        stack = getattr(self._local, "stack", None)
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def span(self, name: str, items: int = 0) -> Iterator[None]:
+        stack = self._local.__dict__.setdefault("stack", [])
+        stack.append(name)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            stack.pop()
+            self.add(name, calls=1, wall_ms=(time.perf_counter() - started) * 1000, items=items)
+
+    def add(self, name: str | None = None, **fields: float) -> None:
+        name = name or self.current_stage() or "other"
+        with self._lock:
+            stage = self._stage(name)
+            for key, value in fields.items():
+                stage[key] += value
+
+    def count(self, name: str, n: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def summary(self, **extra) -> dict:
+        with self._lock:
+            stages = {
+                name: {k: round(v, 1) if k == "wall_ms" else int(v) for k, v in st.items()}
+                for name, st in self.stages.items()
+            }
+            counters = dict(self.counters)
+        return {
+            "started_at": self.started_at.isoformat(),
+            "finished_at": _now().isoformat(),
+            "duration_ms": round((time.perf_counter() - self._t0) * 1000, 1),
+            **extra,
+            "stages": stages,
+            "counters": counters,
+        }
+
+
+_tracer = Tracer()
+
+
+def start_run() -> Tracer:
+    global _tracer  # pylint: disable=global-statement
+    _tracer = Tracer()
+    return _tracer
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+def span(name: str, items: int = 0):
+    return _tracer.span(name, items=items)
+
+
+def traced(name: str):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _tracer.span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def record(stage: str | None = None, **fields: float) -> None:
+    _tracer.add(stage, **fields)
+
+
+def count(name: str, n: float = 1) -> None:
+    _tracer.count(name, n)
@@ -1,11 +1,16 @@
 import hashlib
 import logging
 import os
-import re
 import time
 from datetime import datetime
+from urllib.parse import unquote_plus, urlsplit, urlunsplit
 from zoneinfo import ZoneInfo
 
+from . import tracing
+from .text import jaccard_similarity, normalize_text, token_set  # noqa: F401  (re-exported)
+
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "ocid", "cmpid", "ref", "ref_src", "igshid"}
+
 
 def setup_logging(level: str = "INFO") -> None:
     os.makedirs("logs", exist_ok=True)
@@ -27,30 +32,39 @@ def sha256_text(text: str) -> str:
     return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
 
-def normalize_text(text: str) -> str:
-    text = text.lower().strip()
-    text = re.sub(r"https?://\S+", "", text)
-    text = re.sub(r"[^\w\sぁ-んァ-ン一-龥]", " ", text)
-    return re.sub(r"\s+", " ", text).strip()
-
-
-def token_set(text: str) -> set[str]:
-    return set(normalize_text(text).split())
-
-
-def jaccard_similarity(a: str, b: str) -> float:
-    sa, sb = token_set(a), token_set(b)
-    if not sa or not sb:
-        return 0.0
-    return len(sa & sb) / len(sa | sb)
+def canonicalize_url(url: str) -> str:
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        # A malformed port or IPv6 literal in one href must not fail the whole batch; keep it as given.
+        return url
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if ":" in host:
+        host = f"[{host}]"
+    if port and not (scheme == "http" and port == 80) and not (scheme == "https" and port == 443):
+        host = f"{host}:{port}"
+    # Pairs are kept exactly as written (no decode/re-encode round trip), only filtered and sorted by key.
+    pairs = []
+    for pair in parts.query.split("&"):
+        key = unquote_plus(pair.split("=", 1)[0]).lower()
+        if pair and not key.startswith("utm_") and key not in TRACKING_PARAMS:
+            pairs.append((key, pair))
+    query = "&".join(pair for _, pair in sorted(pairs, key=lambda p: p[0]))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
 
 
-def retry(operation, retries: int = 3, base_sleep: float = 1.0):
+def retry(operation, retries: int = 3, base_sleep: float = 1.0, giveup: tuple[type[Exception], ...] = ()):
     last_exc = None
     for i in range(retries):
         try:
             return operation()
+        except giveup:
+            raise
         except Exception as exc:  # pylint: disable=broad-except
             last_exc = exc
-            time.sleep(base_sleep * (2**i))
+            if i + 1 < retries:
+                tracing.record(retries=1)
+                time.sleep(base_sleep * (2**i))
     raise last_exc
@@ -1,14 +1,52 @@
 import logging
 import os
+import time
+from typing import BinaryIO
 
-import requests
 from requests_oauthlib import OAuth1
 
+from . import http_client, tracing
 from .utils import retry
 
 logger = logging.getLogger(__name__)
 
 
+SIMPLE_UPLOAD_MAX_BYTES = 5 * 1024 * 1024
+CHUNK_BYTES = 4 * 1024 * 1024
+# Still images the one-request endpoint accepts; GIFs and video are processed by X and need the chunked flow.
+SIMPLE_UPLOAD_TYPES = {"image/jpeg", "image/png", "image/webp"}
+MEDIA_CATEGORIES = {"image/gif": "tweet_gif", "video/mp4": "tweet_video"}
+STATUS_TIMEOUT_SECONDS = 120
+
+Media = str | bytes | bytearray | memoryview | BinaryIO
+
+
+def _media_view(media: Media) -> memoryview:
+    if isinstance(media, str):
+        with open(media, "rb") as fh:
+            return memoryview(fh.read())
+    if isinstance(media, (bytes, bytearray, memoryview)):
+        return memoryview(media).cast("B")
+    if hasattr(media, "getbuffer"):
+        return media.getbuffer()[media.tell() :]
+    return memoryview(media.read())
+
+
+def media_type(media: Media, data: memoryview | None = None) -> str:
+    if isinstance(media, str) and media.lower().endswith(".webp"):
+        return "image/webp"
+    head = bytes(data[:12]) if data is not None else b""
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if head[4:8] == b"ftyp":
+        return "video/mp4"
+    return "image/jpeg"
+
+
 class XClient:
     UPLOAD_URL = "https://upload.twitter.com/1.1/media/upload.json"
     POST_URL = "https://api.twitter.com/2/tweets"
@@ -25,43 +63,72 @@ class XClient:
 
     def _request(self, method: str, url: str, **kwargs):
         def op():
-            r = requests.request(method, url, auth=self.auth, timeout=30, **kwargs)
+            r = http_client.request(method, url, auth=self.auth, **kwargs)
             if r.status_code >= 400:
                 raise RuntimeError(f"X API error {r.status_code}: {r.text[:300]}")
             return r
 
         return retry(op, retries=3)
 
-    def upload_media_chunked(self, image_path: str) -> str | None:
-        if self.dry_run:
-            logger.info("[DRY_RUN] skip media upload: %s", image_path)
-            return None
+    def _upload_simple(self, data: memoryview) -> str:
+        res = self._request("POST", self.UPLOAD_URL, files={"media": data}).json()
+        return res["media_id_string"]
 
-        total_bytes = os.path.getsize(image_path)
-        init = self._request(
-            "POST",
-            self.UPLOAD_URL,
-            data={"command": "INIT", "media_type": "image/jpeg", "total_bytes": total_bytes},
-        ).json()
+    def _upload_chunked(self, data: memoryview, content_type: str) -> str:
+        fields = {"command": "INIT", "media_type": content_type, "total_bytes": len(data)}
+        if content_type in MEDIA_CATEGORIES:
+            fields["media_category"] = MEDIA_CATEGORIES[content_type]
+        init = self._request("POST", self.UPLOAD_URL, data=fields).json()
         media_id = init["media_id_string"]
 
-        with open(image_path, "rb") as fh:
-            segment = 0
-            while True:
-                chunk = fh.read(4 * 1024 * 1024)
-                if not chunk:
-                    break
-                self._request(
-                    "POST",
-                    self.UPLOAD_URL,
-                    data={"command": "APPEND", "media_id": media_id, "segment_index": segment},
-                    files={"media": chunk},
-                )
-                segment += 1
-
-        self._request("POST", self.UPLOAD_URL, data={"command": "FINALIZE", "media_id": media_id})
+        # Slices of a memoryview share the underlying buffer, so no chunk is copied before encoding.
+        for segment, offset in enumerate(range(0, len(data), CHUNK_BYTES)):
+            self._request(
+                "POST",
+                self.UPLOAD_URL,
+                data={"command": "APPEND", "media_id": media_id, "segment_index": segment},
+                files={"media": data[offset : offset + CHUNK_BYTES]},
+            )
+
+        res = self._request("POST", self.UPLOAD_URL, data={"command": "FINALIZE", "media_id": media_id})
+        self._wait_for_processing(media_id, (res.json() or {}).get("processing_info"))
         return media_id
 
+    def _wait_for_processing(self, media_id: str, info: dict | None) -> None:
+        # Processed media (GIF, video) can only be attached once STATUS reports success.
+        deadline = time.monotonic() + STATUS_TIMEOUT_SECONDS
+        while info and info.get("state") in ("pending", "in_progress"):
+            if time.monotonic() >= deadline:
+                raise RuntimeError(f"X media {media_id} still processing after {STATUS_TIMEOUT_SECONDS}s")
+            time.sleep(float(info.get("check_after_secs", 1)))
+            res = self._request("GET", self.UPLOAD_URL, params={"command": "STATUS", "media_id": media_id})
+            info = res.json().get("processing_info")
+        if info and info.get("state") == "failed":
+            raise RuntimeError(f"X media processing failed: {info.get('error', {}).get('message', '')}")
+
+    @tracing.traced("x.upload")
+    def upload_media(self, media: Media) -> str | None:
+        # Small still images go up in one request; INIT/APPEND/FINALIZE is for large or processed media.
+        if self.dry_run:
+            logger.info("[DRY_RUN] skip media upload: %s", media if isinstance(media, str) else type(media).__name__)
+            return None
+        data = _media_view(media)
+        tracing.record(bytes=len(data))
+        content_type = media_type(media, data)
+        if len(data) <= SIMPLE_UPLOAD_MAX_BYTES and content_type in SIMPLE_UPLOAD_TYPES:
+            return self._upload_simple(data)
+        return self._upload_chunked(data, content_type)
+
+    @tracing.traced("x.upload")
+    def upload_media_chunked(self, media: Media) -> str | None:
+        if self.dry_run:
+            logger.info("[DRY_RUN] skip media upload: %s", media if isinstance(media, str) else type(media).__name__)
+            return None
+        data = _media_view(media)
+        tracing.record(bytes=len(data))
+        return self._upload_chunked(data, media_type(media, data))
+
+    @tracing.traced("x.post")
     def create_post(self, text: str, media_id: str | None = None) -> str | None:
         payload = {"text": text}
         if media_id:
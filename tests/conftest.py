@@ -0,0 +1,44 @@
+import logging
+
+import pytest
+
+from src.extractor import shutdown_parse_pool
+from src.store import Store
+from src.utils import now_jst, sha256_text
+
+
+@pytest.fixture(autouse=True, scope="session")
+def _parse_pool():
+    logging.disable(logging.WARNING)
+    yield
+    shutdown_parse_pool()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = Store(str(tmp_path / "bot.sqlite3"))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def queue_row():
+    def make(url: str, **fields) -> dict:
+        return {
+            "article_hash": sha256_text(url),
+            "article_url": url,
+            "title": url,
+            "body": "body",
+            "topic": "AI活用事例",
+            "person": None,
+            "image_url": None,
+            "image_source": None,
+            "score": 1.0,
+            "selected_at": now_jst().isoformat(),
+            "canonical_url": url,
+            "minhash": None,
+            "simhash": None,
+            **fields,
+        }
+
+    return make
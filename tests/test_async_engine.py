@@ -0,0 +1,34 @@
+import time
+from pathlib import Path
+
+import pytest
+
+from bench.replay import replay
+from src import async_engine
+from src.health import SourceHealth
+
+ARTICLES = Path(__file__).resolve().parent.parent / "bench" / "fixtures" / "replay" / "articles"
+
+pytestmark = pytest.mark.skipif(not async_engine.available(), reason="httpx is not installed")
+
+
+def test_extract_deadline():
+    # Pages slower than the deadline come back as failures instead of holding up the run.
+    with replay(latency_ms=2000) as rp:
+        urls = [rp.server.url(f"/articles/{path.stem}") for path in sorted(ARTICLES.glob("*.html"))]
+        started = time.perf_counter()
+        results = dict(async_engine.extract_articles(urls, parse_workers=0, deadline_seconds=0.5))
+        elapsed = time.perf_counter() - started
+    assert sorted(results) == sorted(urls)
+    assert all(art is None for art in results.values())
+    assert elapsed < 1.5, f"took {elapsed:.2f}s"
+
+
+def test_collect_deadline_counted_once():
+    # Stragglers are cancelled at the deadline, so only the deadline's failure reaches source health.
+    with replay(latency_ms=1000) as rp:
+        health = SourceHealth()
+        assert async_engine.collect_candidates(rp.server.sources, deadline_seconds=0.3, health=health) == []
+        rows = health.dirty_rows()
+    assert len(rows) == len(rp.server.sources["rss"] + rp.server.sources["list_pages"])
+    assert all(row["error_streak"] == 1 and row["last_error"] == "deadline exceeded" for row in rows), rows
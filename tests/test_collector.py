@@ -0,0 +1,46 @@
+import threading
+import time
+
+from bench.replay import replay
+from src.collector import collect_candidates, dedupe_candidates
+from src.health import SourceHealth
+
+
+def _wait_for_workers(limit: float = 5.0) -> None:
+    started = time.perf_counter()
+    while any(t.name.startswith("collect") for t in threading.enumerate()) and time.perf_counter() - started < limit:
+        time.sleep(0.05)
+
+
+def test_stragglers_bounded():
+    # Requests still running at the deadline give up within their capped timeout instead of the server's pace.
+    with replay(latency_ms=3000) as rp:
+        started = time.perf_counter()
+        assert collect_candidates(rp.server.sources, deadline_seconds=0.5) == []
+        returned = time.perf_counter() - started
+        _wait_for_workers()
+        finished = time.perf_counter() - started
+    assert returned < 1.0, f"returned after {returned:.2f}s"
+    assert finished < 2.0, f"workers ran for {finished:.2f}s"
+
+
+
+def test_straggler_not_counted_twice():
+    # The deadline records the dropped poll; the worker finishing afterwards must not record it again.
+    with replay(latency_ms=1000) as rp:
+        health = SourceHealth()
+        collect_candidates(rp.server.sources, deadline_seconds=0.3, health=health)
+        _wait_for_workers()
+        rows = {row["source_url"]: row for row in health.dirty_rows()}
+    assert sorted(rows) == sorted(rp.server.sources["rss"] + rp.server.sources["list_pages"])
+    for url, row in rows.items():
+        assert row["error_streak"] == 1, url
+        assert row["last_error"] == "deadline exceeded", url
+
+
+def test_dedupe_candidates_keeps_feed_url():
+    # Tracking variants collapse into the first one, which is still fetched (and hashed) as the feed gave it.
+    raw = "https://news.example.com/a?utm_source=rss"
+    batches = [[{"url": raw}], [{"url": "https://NEWS.example.com/a"}, {"url": "https://news.example.com/b"}]]
+    items = dedupe_candidates(batches)
+    assert [it["url"] for it in items] == [raw, "https://news.example.com/b"]
@@ -0,0 +1,68 @@
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+
+from src import dedupe
+from src import store as store_module
+from src.dedupe import shingles
+from src.utils import now_jst
+
+FIXTURES = Path(__file__).resolve().parent.parent / "bench" / "fixtures"
+
+
+# pylint: disable=protected-access
+
+
+def _minhash_reference(features) -> tuple[int, ...]:
+    hashes = [dedupe._hash32(f) for f in features]
+    return tuple(min((a * h + b) % dedupe._PRIME for h in hashes) & 0xFFFFFFFF for a, b in dedupe._PERMS)
+
+
+def _simhash_reference(features) -> int:
+    weights = [0] * 64
+    for f in features:
+        h = dedupe._hash64(f)
+        for bit in range(64):
+            weights[bit] += 1 if (h >> bit) & 1 else -1
+    return sum(1 << bit for bit, w in enumerate(weights) if w > 0)
+
+
+@pytest.mark.parametrize("name", ["en_article.txt", "ja_article.txt"])
+def test_fingerprints_match_scalar_definition(name):
+    # Signatures stored in posts and article_queue must keep matching the ones computed from now on.
+    feats = shingles((FIXTURES / name).read_text(encoding="utf-8"))
+    assert dedupe.minhash(feats) == _minhash_reference(feats)
+    assert dedupe.simhash(feats) == _simhash_reference(feats)
+
+
+def test_minhash_extreme_hashes(monkeypatch):
+    monkeypatch.setattr(dedupe, "_hash32", int)
+    for value in ("0", "1", str(2**31), str(2**32 - 1)):
+        assert dedupe.minhash([value]) == _minhash_reference([value]), value
+
+
+def test_empty_features():
+    assert dedupe.minhash([]) == (0xFFFFFFFF,) * dedupe.NUM_PERM
+    assert dedupe.simhash([]) == 0
+
+
+def test_window_adds_new_posts_and_rebuilds_on_expiry(store, monkeypatch):
+    window = dedupe.DedupeWindow(14)
+    store.save_post("https://a.example/1", "a1", "AI活用事例", None, 1, "text", "1", None)
+    with store.conn:
+        store.conn.execute("UPDATE posts SET posted_at = ?", ((now_jst() - timedelta(days=13)).isoformat(),))
+    index = window.refresh(store)
+    assert "a1" in index.hashes
+
+    store.save_post("https://a.example/2", "a2", "AI活用事例", None, 2, "text", "2", None)
+    assert window.refresh(store) is index
+    assert {"a1", "a2"} <= index.hashes and window.rebuilds == 1
+
+    # Two days on, the oldest post has left the window and the index is rebuilt without it.
+    later = now_jst() + timedelta(days=2)
+    monkeypatch.setattr(dedupe, "now_jst", lambda: later)
+    monkeypatch.setattr(store_module, "now_jst", lambda: later)
+    index = window.refresh(store)
+    assert window.rebuilds == 2
+    assert index.hashes == {"a2"}
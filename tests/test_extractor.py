@@ -0,0 +1,37 @@
+import multiprocessing
+import sys
+
+import lxml.html
+import pytest
+
+from src.extractor import _canonical_url, _new_parse_pool  # pylint: disable=protected-access
+from src.utils import canonicalize_url
+
+URL = "https://news.example.com/2024/05/story?id=7"
+
+
+def _canonical(href: str) -> str:
+    html = f'<html><head><link rel="canonical" href="{href}"></head><body><p>x</p></body></html>'
+    return _canonical_url(URL, lxml.html.document_fromstring(html))
+
+
+@pytest.mark.parametrize(
+    "href", ["https://news.example.com/", "/", "https://other.example.net/2024/05/story", "http://[::1/a"]
+)
+def test_untrustworthy_canonical_ignored(href):
+    assert _canonical(href) == canonicalize_url(URL)
+
+
+def test_same_host_canonical_used():
+    assert _canonical("/2024/05/story-amp") == "https://news.example.com/2024/05/story-amp"
+
+
+@pytest.mark.parametrize("platform", ["linux", "darwin", "win32"])
+def test_parse_pool_forks_only_on_linux(monkeypatch, platform):
+    monkeypatch.setattr(sys, "platform", platform)
+    pool = _new_parse_pool(1)
+    try:
+        expected = "fork" if platform == "linux" else multiprocessing.get_context().get_start_method()
+        assert pool._mp_context.get_start_method() == expected  # pylint: disable=protected-access
+    finally:
+        pool.shutdown()
@@ -0,0 +1,54 @@
+from datetime import timedelta
+
+from src.collector import parse_list_page
+from src.health import SourceHealth
+from src.http_cache import CachedResponse
+from src.utils import now_jst
+
+FEED = "https://news.example.com/feed.xml"
+
+
+def test_healthy_source_polled_every_tick():
+    # With min_poll_minutes equal to the cron cadence, a fast unchanged source is due again on the next tick.
+    items = [{"url": "https://news.example.com/a"}]
+    rows: list = []
+    start = now_jst()
+    for tick in range(4):
+        health = SourceHealth(rows, min_poll_minutes=10, max_poll_minutes=10)
+        # Each cron tick fires a couple of seconds before the previous fetch finished plus ten minutes.
+        health.started = start + timedelta(minutes=10 * tick, seconds=-2 * tick)
+        assert health.due(FEED, health.started), f"tick {tick}"
+        health.record_success(FEED, 50.0, items)
+        rows = health.dirty_rows()
+
+
+def _list_page(posts: list[str]) -> list[dict]:
+    sections = ("research", "product", "safety", "company", "careers")
+    nav = "".join(f'<a href="/{s}">{s.title()} section</a>' for s in sections)
+    links = "".join(f'<a href="/news/{slug}">{slug.replace("-", " ")}</a>' for slug in posts)
+    html = f"<html><body><nav>{nav}</nav><main>{links}</main></body></html>"
+    res = CachedResponse("https://lab.example.com/news/", 200, html.encode("utf-8"), "utf-8", False)
+    return parse_list_page(res, "https://lab.example.com/news/")
+
+
+def test_new_post_below_navigation_counts_as_change():
+    page = "https://lab.example.com/news/"
+    health = SourceHealth(min_poll_minutes=10, max_poll_minutes=360)
+    before = _list_page(["model-release-notes", "policy-update-may"])
+    health.record_success(page, 50.0, before)
+    health.record_success(page, 50.0, before)
+    assert health.dirty_rows()[0]["poll_interval_s"] == 15 * 60
+
+    # The first five links are the same navigation as before; only the list under them changed.
+    after = _list_page(["new-research-paper", "model-release-notes", "policy-update-may"])
+    assert [it["url"] for it in after[:5]] == [it["url"] for it in before[:5]]
+    health.record_success(page, 50.0, after)
+    assert health.dirty_rows()[0]["poll_interval_s"] == 10 * 60
+
+
+def test_reordered_links_are_not_a_change():
+    page = "https://lab.example.com/news/"
+    health = SourceHealth(min_poll_minutes=10, max_poll_minutes=360)
+    health.record_success(page, 50.0, _list_page(["model-release-notes", "policy-update-may"]))
+    health.record_success(page, 50.0, _list_page(["policy-update-may", "model-release-notes"]))
+    assert health.dirty_rows()[0]["poll_interval_s"] == 15 * 60
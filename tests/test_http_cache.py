@@ -0,0 +1,36 @@
+import pytest
+
+from bench.replay import ReplayServer
+from src.http_cache import HttpCache
+
+
+@pytest.fixture
+def server():
+    server = ReplayServer().start()
+    yield server
+    server.stop()
+
+
+def test_revalidated_response_counts_as_hit(tmp_path, server):
+    cache = HttpCache(str(tmp_path / "cache"))
+    url = server.url("/feeds/tech.xml")
+    first = cache.get(url)
+    assert not first.from_cache
+    assert cache.conditional_headers(url)["If-None-Match"]
+
+    second = cache.get(url)
+    # The server answered 304; the cached body comes back as a 200.
+    assert second.from_cache
+    assert second.status_code == 200
+    assert second.content == first.content
+    assert cache.stats() == {"hits": 1, "misses": 1}
+    assert server.requests["/feeds/tech.xml"] == 2
+
+
+def test_response_without_validators_not_stored(tmp_path):
+    cache = HttpCache(str(tmp_path / "cache"))
+    url = "https://news.example.com/a"
+    cache.complete(url, 200, {}, b"body", "utf-8", None)
+    assert cache.lookup(url) is None
+    cache.complete(url, 200, {}, b"body", "utf-8", None, store_always=True)
+    assert cache.lookup(url).content == b"body"
@@ -0,0 +1,154 @@
+import os
+import sqlite3
+import threading
+from datetime import timedelta
+
+import pytest
+
+from bench.replay import replay
+from src import main as bot
+from src.collector import dedupe_candidates
+from src.utils import now_jst, sha256_text
+
+URL = "https://news.example.com/story"
+
+
+def _needs(store, recheck_hours: float = 24) -> bool:
+    return bot._needs_extraction(store, URL, 14, recheck_hours)  # pylint: disable=protected-access
+
+
+def test_needs_extraction_for_new_url(store):
+    assert _needs(store)
+
+
+def test_skips_queued_url(store, queue_row):
+    store.queue_upsert(queue_row(URL))
+    assert not _needs(store)
+
+
+def test_skips_recently_posted_url(store):
+    store.save_post(URL, sha256_text(URL), "AI活用事例", None, 1, "text", "1", None)
+    assert not _needs(store)
+
+
+def test_posted_url_fetched_again_after_dedupe_window(store):
+    store.save_post(URL, sha256_text(URL), "AI活用事例", None, 1, "text", "1", None)
+    with store.conn:
+        store.conn.execute("UPDATE posts SET posted_at = ?", ((now_jst() - timedelta(days=30)).isoformat(),))
+    assert _needs(store)
+
+
+def test_skips_url_posted_before_canonicalization(store):
+    # Rows from before the upgrade are keyed by the raw URL, tracking parameters included.
+    raw = URL + "?utm_source=feed"
+    store.save_post(raw, sha256_text(raw), "AI活用事例", None, 1, "text", "1", None)
+    [candidate] = dedupe_candidates([[{"url": raw}]])
+    assert not bot._needs_extraction(store, candidate["url"], 14, 24)  # pylint: disable=protected-access
+
+
+def test_skips_tracking_variant_of_posted_url(store):
+    store.save_post(URL, sha256_text(URL), "AI活用事例", None, 1, "text", "1", None)
+    assert not bot._needs_extraction(store, URL + "?utm_source=feed", 14, 24)  # pylint: disable=protected-access
+
+
+def test_seen_url_rechecked_after_recheck_hours(store):
+    store.mark_seen(sha256_text(URL), URL, "short")
+    assert not _needs(store, recheck_hours=24)
+    with store.conn:
+        store.conn.execute("UPDATE seen_urls SET fetched_at = ?", ((now_jst() - timedelta(hours=25)).isoformat(),))
+    assert _needs(store, recheck_hours=24)
+
+
+def test_refill_then_post_without_fetching():
+    with replay() as rp:
+        assert bot.refill() == 0
+        conn = sqlite3.connect(os.environ["DB_PATH"])
+        try:
+            queued = conn.execute("SELECT COUNT(*) FROM article_queue").fetchone()[0]
+            assert queued > 0
+            assert conn.execute("SELECT COUNT(*) FROM posts").fetchone()[0] == 0
+            assert conn.execute("SELECT status FROM runs").fetchall() == [("refilled",)]
+            assert rp.x.posts == []
+
+            fetched = dict(rp.server.requests)
+            assert bot.run(slot_override=1, refill=False) == 0
+            # The post command only talks to the X API: no feed, list page or article requests.
+            requests = {p: n - fetched.get(p, 0) for p, n in rp.server.requests.items() if n != fetched.get(p, 0)}
+            assert set(requests) <= {"/1.1/media/upload.json", "/2/tweets"}
+            assert len(rp.x.posts) == 1
+            assert conn.execute("SELECT COUNT(*) FROM posts").fetchone()[0] == 1
+            assert conn.execute("SELECT status FROM runs ORDER BY id DESC").fetchone() == ("posted",)
+        finally:
+            conn.close()
+
+
+def test_daemon_retries_failed_post(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("DB_PATH", str(tmp_path / "data" / "bot.sqlite3"))
+    monkeypatch.setenv("COOLDOWN_SECONDS", "0")
+    # A slot that opened a minute ago, so its window is still open.
+    start = now_jst() - timedelta(minutes=1)
+    rules = {
+        "slots": {"slot1": start.strftime("%H:%M")},
+        "enabled_slots": [1],
+        "post_window_minutes": 30,
+        "daemon": {"retry_seconds": 0.01, "retry_max_seconds": 0.01},
+    }
+    monkeypatch.setattr(bot, "_load_json", lambda path: rules)
+    monkeypatch.setattr(bot, "build_queue", lambda *args, **kwargs: None)
+    stop = threading.Event()
+    attempts = []
+
+    def post_queued(store, x, rules, slot, outcome, offline=False):
+        attempts.append(slot)
+        if len(attempts) == 1:
+            raise RuntimeError("X API error 503: over capacity")
+        outcome["status"] = "posted"
+
+    def refill(store, dedupe_days, dedupe_window=None):
+        # The first refill comes once the slot is handled; nothing else is left to check.
+        stop.set()
+        return True
+
+    monkeypatch.setattr(bot, "_post_queued", post_queued)
+    monkeypatch.setattr(bot, "_refill", refill)
+    assert bot.run_daemon(stop) == 0
+    assert attempts == [1, 1]
+
+
+def test_load_json_keeps_last_good_version(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text('{"enabled_slots": [1]}', encoding="utf-8")
+    assert bot._load_json(str(path)) == {"enabled_slots": [1]}  # pylint: disable=protected-access
+    # An edit caught half-written, then the file briefly missing while it is replaced.
+    path.write_text('{"enabled_slots": [', encoding="utf-8")
+    os.utime(path, ns=(0, 0))
+    assert bot._load_json(str(path)) == {"enabled_slots": [1]}  # pylint: disable=protected-access
+    path.unlink()
+    assert bot._load_json(str(path)) == {"enabled_slots": [1]}  # pylint: disable=protected-access
+
+    # With nothing parsed yet there is no fallback.
+    broken = tmp_path / "broken.json"
+    broken.write_text("{", encoding="utf-8")
+    with pytest.raises(ValueError):
+        bot._load_json(str(broken))  # pylint: disable=protected-access
+
+
+def test_daemon_survives_locked_database(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("DB_PATH", str(tmp_path / "data" / "bot.sqlite3"))
+    monkeypatch.setattr(bot, "DAEMON_ERROR_WAIT_SECONDS", 0.01)
+    monkeypatch.setattr(bot, "_load_json", lambda path: {})
+    stop = threading.Event()
+    calls = []
+
+    def due_slot(store, rules, now, handled):
+        calls.append(now)
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        stop.set()
+        return 1, now + timedelta(hours=1)
+
+    monkeypatch.setattr(bot, "_due_slot", due_slot)
+    assert bot.run_daemon(stop) == 0
+    assert len(calls) == 2
@@ -0,0 +1,47 @@
+import json
+import random
+from pathlib import Path
+
+import pytest
+
+from src import matcher as matcher_module
+from src.matcher import KeywordMatcher
+from src.text import normalize_text
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _naive_counts(text: str, terms: list[str]) -> dict[str, int]:
+    return {t: n for t in terms if (n := text.count(t))}
+
+
+def _texts() -> list[str]:
+    texts = [normalize_text(p.read_text(encoding="utf-8")) for p in (ROOT / "bench" / "fixtures").glob("*_article.txt")]
+    rng = random.Random(11)
+    # Overlapping and nested terms ("ai" in "enterprise ai", "aa" in "aaa") are where a scanner can go wrong.
+    alphabet = ["ai", "a", "enterprise", " ", "医療", "教育", "research", "s", "aaa"]
+    texts += ["".join(rng.choice(alphabet) for _ in range(rng.randrange(0, 60))) for _ in range(200)]
+    return texts
+
+
+@pytest.fixture(params=["count", "automaton"])
+def keyword_matcher(request, monkeypatch):
+    if request.param == "automaton":
+        monkeypatch.setattr(matcher_module, "AUTOMATON_MIN_TERMS", 0)
+    rules = json.loads((ROOT / "config" / "rules.json").read_text(encoding="utf-8"))
+    people = json.loads((ROOT / "config" / "people.json").read_text(encoding="utf-8"))
+    themes = rules["themes"] + ["aa", "aaa ai"]
+    matcher = KeywordMatcher(themes, people, rules["topics"], rules["practical_keywords"])
+    assert (matcher._automaton is not None) == (request.param == "automaton")  # pylint: disable=protected-access
+    return matcher
+
+
+def test_counts_match_naive_scan(keyword_matcher):
+    for text in _texts():
+        assert keyword_matcher.match(text).counts == _naive_counts(text, keyword_matcher.terms), text
+
+
+def test_hits_follow_counts(keyword_matcher):
+    hits = keyword_matcher.match(normalize_text("Microsoft rolled out Copilot for 医療 teams"))
+    assert hits.people == {0}
+    assert hits.topics == {"医療AI"}
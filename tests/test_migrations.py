@@ -0,0 +1,53 @@
+import sqlite3
+
+from src.archive import CODEC
+from src.migrations import MIGRATIONS, schema_version
+from src.store import Store
+
+
+def test_migrates_unversioned_database(tmp_path):
+    # A database from before versioning: v1 tables, user_version 0 and bodies stored inline.
+    path = tmp_path / "bot.sqlite3"
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE posts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, article_url TEXT NOT NULL, article_hash TEXT NOT NULL,
+            topic TEXT, person TEXT, slot INTEGER NOT NULL, text TEXT NOT NULL, tweet_id TEXT,
+            image_source TEXT, posted_at TEXT NOT NULL
+        );
+        CREATE TABLE article_queue (
+            article_hash TEXT PRIMARY KEY, article_url TEXT NOT NULL, title TEXT NOT NULL, body TEXT NOT NULL,
+            topic TEXT, person TEXT, image_url TEXT, image_source TEXT, score REAL, selected_at TEXT NOT NULL
+        );
+        INSERT INTO posts(article_url, article_hash, slot, text, posted_at)
+        VALUES('https://news.example.com/old', 'old', 1, 'posted', '2024-05-01T09:00:00+09:00');
+        INSERT INTO article_queue(article_hash, article_url, title, body, score, selected_at)
+        VALUES('q1', 'https://news.example.com/q1', 'title', 'inline body', 2.0, '2024-05-01T09:00:00+09:00');
+        """
+    )
+    conn.commit()
+    conn.close()
+
+    store = Store(str(path))
+    try:
+        assert schema_version(store.conn) == MIGRATIONS[-1][0]
+        assert store.conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2  # INCREMENTAL
+        assert store.load_body("q1") == "inline body"
+        assert store.conn.execute("SELECT codec FROM article_bodies").fetchone()[0] == CODEC
+        assert store.conn.execute("SELECT body FROM article_queue").fetchone()[0] == ""
+        assert store.best_queue_candidate()["article_hash"] == "q1"
+        post = store.conn.execute("SELECT minhash, simhash FROM posts").fetchone()
+        assert tuple(post) == (None, None)
+        for table in ("seen_urls", "runs", "run_stages", "run_counters", "source_health"):
+            assert store.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == 0, table
+    finally:
+        store.close()
+
+    # Reopening is a no-op.
+    store = Store(str(path))
+    try:
+        assert schema_version(store.conn) == MIGRATIONS[-1][0]
+        assert store.load_body("q1") == "inline body"
+    finally:
+        store.close()
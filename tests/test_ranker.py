@@ -0,0 +1,51 @@
+import json
+from pathlib import Path
+
+from src.extractor import parse_article
+from src.matcher import DEFAULT_TOPIC, get_matcher
+from src.ranker import rank_article, rank_articles
+
+ROOT = Path(__file__).resolve().parent.parent
+ARTICLES = ROOT / "bench" / "fixtures" / "replay" / "articles"
+
+
+def _setup():
+    rules = json.loads((ROOT / "config" / "rules.json").read_text(encoding="utf-8"))
+    people = json.loads((ROOT / "config" / "people.json").read_text(encoding="utf-8"))
+    matcher = get_matcher(rules["themes"], people, rules.get("topics"), rules.get("practical_keywords"))
+    base = "http://replay.invalid"
+    articles = [
+        parse_article(f"{base}/articles/{path.stem}", path.read_text(encoding="utf-8").replace("{base}", base))
+        for path in sorted(ARTICLES.glob("*.html"))
+    ]
+    assert len(articles) > 1, "no article fixtures"
+    return rules, people, matcher, articles
+
+
+def test_rank_articles_batch_independent():
+    # Each article scores the same alone, with one neighbour and in the full batch.
+    rules, people, matcher, articles = _setup()
+
+    def scores(batch: list[dict]) -> list[float]:
+        return [r[0] for r in rank_articles(batch, people, rules["themes"], matcher)]
+
+    full = scores(articles)
+    for i, art in enumerate(articles):
+        assert abs(scores([art])[0] - full[i]) < 1e-9, art["url"]
+        assert abs(scores([art, articles[i - 1]])[0] - full[i]) < 1e-9, art["url"]
+
+
+def test_rank_article_is_a_batch_of_one():
+    rules, people, matcher, articles = _setup()
+    batch = rank_articles(articles, people, rules["themes"], matcher)
+    for art, ranked in zip(articles, batch):
+        assert rank_article(art, people, rules["themes"], matcher) == ranked, art["url"]
+
+
+def test_topic_follows_config_order():
+    rules, people, matcher, _ = _setup()
+    # Mentions 金融 far more often than 医療, yet 医療AI comes first in rules.json.
+    article = {"title": "金融 金融 金融", "body": "金融 finance finance 医療"}
+    assert rank_articles([article], people, rules["themes"], matcher)[0][1] == "医療AI"
+    plain = {"title": "AI tool", "body": "no topic here"}
+    assert rank_articles([plain], people, rules["themes"], matcher)[0][1] == DEFAULT_TOPIC
@@ -0,0 +1,98 @@
+import os
+from datetime import timedelta
+
+from src import main as bot
+from src.utils import now_jst, sha256_text
+
+
+def test_evicted_urls_not_refetched(store, queue_row):
+    # Rows pushed out of the queue stay skipped even once recheck_hours has passed.
+    old = (now_jst() - timedelta(days=10)).isoformat()
+    urls = [f"https://news.example.com/story-{i}" for i in range(3)]
+    store.upsert_many([queue_row(url, score=float(i), selected_at=old) for i, url in enumerate(urls)])
+    for url in urls[:2]:
+        store.mark_seen(sha256_text(url), url, "queued")
+    store.conn.execute("UPDATE seen_urls SET fetched_at = ?", (old,))
+    assert store.evict_queue(max_age_days=7) == 3
+    for url in urls:
+        assert store.seen_url(sha256_text(url))["status"] == "evicted", url
+        assert not bot._needs_extraction(store, url, 14, 0), url  # pylint: disable=protected-access
+    assert store.evict_seen(30) == 0
+
+
+def test_run_metrics_pruned(store):
+    # Saving a run drops runs, stages and counters older than the retention window.
+    for days in (120, 100, 1):
+        at = (now_jst() - timedelta(days=days)).isoformat()
+        store.save_run(
+            {
+                "started_at": at,
+                "finished_at": at,
+                "duration_ms": 1.0,
+                "status": "posted",
+                "stages": {"collect": {"calls": 1, "wall_ms": 1.0, "items": 0, "bytes": 0, "retries": 0}},
+                "counters": {"funnel.collected": 1},
+            },
+            max_age_days=90,
+        )
+    for table in ("runs", "run_stages", "run_counters"):
+        assert store.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == 1, table
+
+
+def _count(store, table: str) -> int:
+    return store.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_write_buffer_holds_rows_until_flush(store, queue_row):
+    with store.write_buffer(max_rows=10, max_seconds=3600) as writes:
+        writes.queue_upsert(queue_row("https://news.example.com/a"))
+        writes.mark_seen(sha256_text("https://news.example.com/a"), "https://news.example.com/a", "queued")
+        assert _count(store, "article_queue") == 0
+        assert _count(store, "seen_urls") == 0
+    # Leaving the block flushes what is left.
+    assert _count(store, "article_queue") == 1
+    assert store.seen_url(sha256_text("https://news.example.com/a"))["status"] == "queued"
+
+
+def test_write_buffer_flushes_at_max_rows(store, queue_row):
+    writes = store.write_buffer(max_rows=3, max_seconds=3600)
+    for i in range(3):
+        writes.queue_upsert(queue_row(f"https://news.example.com/{i}"))
+    assert _count(store, "article_queue") == 3
+    writes.queue_upsert(queue_row("https://news.example.com/3"))
+    assert _count(store, "article_queue") == 3
+    writes.flush()
+    assert _count(store, "article_queue") == 4
+
+
+def test_write_buffer_upsert_replaces_row(store, queue_row):
+    url = "https://news.example.com/a"
+    with store.write_buffer() as writes:
+        writes.queue_upsert(queue_row(url, score=1.0, body="first"))
+    with store.write_buffer() as writes:
+        writes.queue_upsert(queue_row(url, score=5.0, body="second"))
+    row = store.get_queued_article(sha256_text(url))
+    assert row["score"] == 5.0
+    assert _count(store, "article_queue") == 1
+    # Bodies live compressed in article_bodies; the queue row only keeps an empty placeholder.
+    assert store.load_body(sha256_text(url)) == "second"
+    assert store.conn.execute("SELECT body FROM article_queue").fetchone()[0] == ""
+
+
+def _pages(store) -> int:
+    return store.conn.execute("PRAGMA page_count").fetchone()[0]
+
+
+def test_eviction_returns_pages(store, queue_row):
+    assert store.conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2  # INCREMENTAL
+    old = (now_jst() - timedelta(days=10)).isoformat()
+    # Random text barely compresses, so each body takes a few pages.
+    bodies = [os.urandom(8000).hex() for _ in range(50)]
+    store.upsert_many(
+        [queue_row(f"https://news.example.com/{i}", body=body, selected_at=old) for i, body in enumerate(bodies)]
+    )
+    before = _pages(store)
+    assert store.evict_queue(max_age_days=7) == 50
+    after = _pages(store)
+    assert after < before / 4, (before, after)
+    assert store.conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from src import thumbnail
+
+ARTICLE = {"article_hash": "abc", "title": "AIで問い合わせ対応を半減", "topic": "AI活用事例", "image_url": None}
+
+# pylint: disable=protected-access
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("THUMB_CACHE_DIR", str(tmp_path / "thumbs"))
+    return tmp_path / "thumbs"
+
+
+def _cards(cache_dir) -> list[str]:
+    return sorted(p.name for p in cache_dir.glob("card-*")) if cache_dir.exists() else []
+
+
+def test_key_follows_title_topic_and_template(monkeypatch):
+    key = thumbnail._card_key(ARTICLE, allow_image=False)
+    assert thumbnail._card_key(dict(ARTICLE), allow_image=False) == key
+    assert thumbnail._card_key({**ARTICLE, "title": "別の記事"}, allow_image=False) != key
+    assert thumbnail._card_key({**ARTICLE, "topic": "生成AI"}, allow_image=False) != key
+    # The image only counts when it can appear on the card.
+    assert thumbnail._card_key({**ARTICLE, "image_url": "https://img.example/a.jpg"}, allow_image=False) == key
+    assert thumbnail._card_key(ARTICLE, allow_image=True) != key
+    monkeypatch.setattr(thumbnail, "TEMPLATE_VERSION", thumbnail.TEMPLATE_VERSION + 1)
+    assert thumbnail._card_key(ARTICLE, allow_image=False) != key
+
+
+def test_second_render_is_a_cache_hit(cache_dir, monkeypatch):
+    first = thumbnail.render_thumbnail(ARTICLE, allow_image=False)
+    assert len(_cards(cache_dir)) == 1
+
+    def render(*args):
+        raise AssertionError("cached card rendered again")
+
+    monkeypatch.setattr(thumbnail, "_render", render)
+    assert thumbnail.render_thumbnail(dict(ARTICLE), allow_image=False) == first
+    assert len(_cards(cache_dir)) == 1
+
+
+def test_card_without_its_image_is_not_cached(cache_dir, monkeypatch):
+    monkeypatch.setattr(thumbnail, "_source_image", lambda url, offline: None)
+    article = {**ARTICLE, "image_url": "https://img.example/a.jpg"}
+    assert thumbnail.render_thumbnail(article, allow_image=True, offline=True)
+    assert _cards(cache_dir) == []
+
+
+def test_eviction_drops_least_recently_used(cache_dir):
+    cache_dir.mkdir()
+    for i, name in enumerate(["card-old.jpg", "card-mid.webp", "card-new.jpg", "notes.txt"]):
+        path = cache_dir / name
+        path.write_bytes(b"x" * 100)
+        os.utime(path, (1000 + i, 1000 + i))
+    # A hit refreshes mtime, which moves the oldest card to the back of the line.
+    os.utime(cache_dir / "card-old.jpg")
+
+    assert thumbnail.evict_thumbnails(max_bytes=150) == 2
+    assert sorted(p.name for p in cache_dir.iterdir()) == ["card-old.jpg", "notes.txt"]
+    assert thumbnail.evict_thumbnails(max_bytes=150) == 0
@@ -0,0 +1,22 @@
+import pytest
+
+from src.utils import canonicalize_url
+
+
+@pytest.mark.parametrize("url", ["http://example.com:abc/x", "http://[::1/a", "http://example.com:99999/x"])
+def test_canonicalize_url_keeps_malformed(url):
+    # Bad ports and brackets come back unchanged instead of raising out of collect_candidates.
+    assert canonicalize_url(url) == url
+
+
+def test_canonicalize_url_ipv6():
+    assert canonicalize_url("http://[::1]:8080/a") == "http://[::1]:8080/a"
+    assert canonicalize_url("HTTPS://[2001:DB8::1]:443/a?utm_source=x") == "https://[2001:db8::1]/a"
+    assert canonicalize_url("http://Example.com:80/a?b=1&fbclid=z") == "http://example.com/a?b=1"
+
+
+def test_canonicalize_url_query_verbatim():
+    # The query is only filtered and sorted, never re-encoded, so both spellings of a link map to one key.
+    assert canonicalize_url("https://a.example/s?q=a%20b&utm_medium=x") == "https://a.example/s?q=a%20b"
+    assert canonicalize_url("https://a.example/s?q=a+b&id=%E3%81%82") == "https://a.example/s?id=%E3%81%82&q=a+b"
+    assert canonicalize_url("https://a.example/s?b=2&a=1&b=1&") == "https://a.example/s?a=1&b=2&b=1"
@@ -0,0 +1,75 @@
+import pytest
+
+from src.utils import now_jst
+from webapp import app as webapp
+
+# pylint: disable=redefined-outer-name
+
+
+def _summary(duration_ms: float, status: str = "posted", stages: dict | None = None, counters: dict | None = None):
+    now = now_jst().isoformat()
+    return {
+        "started_at": now,
+        "finished_at": now,
+        "duration_ms": duration_ms,
+        "status": status,
+        "stages": stages or {},
+        "counters": counters or {},
+    }
+
+
+def _stage(calls: int, wall_ms: float) -> dict:
+    return {"calls": calls, "wall_ms": wall_ms, "items": calls, "bytes": 0, "retries": 0}
+
+
+@pytest.fixture
+def db_path(store, tmp_path, monkeypatch):
+    # Runs of 10, 20, ... 200 ms; each fetches twice at half the run's time per call.
+    for i in range(1, 21):
+        stages = {"fetch": _stage(2, 10.0 * i), "source:news.example.com": _stage(1, 5.0 * i)}
+        store.save_run(_summary(10.0 * i, stages=stages, counters={"funnel.collected": 4, "funnel.queued": 1}))
+    # A skipped cron tick must not pull the percentiles down.
+    store.save_run(_summary(0.5, status="skipped"))
+    path = tmp_path / "bot.sqlite3"
+    monkeypatch.setattr(webapp, "parse_env", lambda: {"DB_PATH": str(path)})
+    return path
+
+
+def _by_stage(rows: list[dict]) -> dict[str, dict]:
+    return {row["stage"]: row for row in rows}
+
+
+def test_percentiles_nearest_rank(db_path):
+    stats = webapp.perf_stats(db_path)
+    assert stats["runs_count"] == 21 and stats["skipped_count"] == 1
+    stages = _by_stage(stats["stages"])
+    assert stages["run"] == {"stage": "run", "runs": 20, "p50": 100.0, "p95": 190.0, "p99": 200.0}
+    # Stage samples are per call: wall_ms / calls.
+    assert (stages["fetch"]["p50"], stages["fetch"]["p95"]) == (50.0, 95.0)
+    assert _by_stage(stats["sources"])["news.example.com"]["p95"] == 95.0
+    funnel = {row["step"]: row for row in stats["funnel"]}
+    assert funnel["collected"] == {"step": "collected", "total": 80, "per_run": 4.0}
+
+
+def test_percentiles_follow_window(db_path):
+    # The last five non-skipped runs are 160..200 ms.
+    run = _by_stage(webapp.perf_stats(db_path, window=5)["stages"])["run"]
+    assert (run["runs"], run["p50"], run["p95"]) == (5, 180.0, 200.0)
+
+
+def test_perf_routes(db_path):
+    client = webapp.app.test_client()
+    page = client.get("/perf")
+    assert page.status_code == 200
+    assert b"<code>fetch</code>" in page.data and b"news.example.com" in page.data
+
+    data = client.get("/perf.json?runs=5").get_json()
+    assert data["window"] == 5
+    assert _by_stage(data["stages"])["run"]["p50"] == 180.0
+
+
+def test_perf_without_database(tmp_path, monkeypatch):
+    monkeypatch.setattr(webapp, "parse_env", lambda: {"DB_PATH": str(tmp_path / "missing.sqlite3")})
+    client = webapp.app.test_client()
+    assert client.get("/perf").status_code == 200
+    assert client.get("/perf.json").get_json()["stages"] == []
@@ -0,0 +1,89 @@
+import pytest
+
+from src import x_client
+from src.x_client import CHUNK_BYTES, SIMPLE_UPLOAD_MAX_BYTES, XClient
+
+JPEG = b"\xff\xd8\xff\xe0" + b"\0" * 8
+PNG = b"\x89PNG\r\n\x1a\n" + b"\0" * 4
+GIF = b"GIF89a" + b"\0" * 6
+
+
+class _Response:
+    def __init__(self, body: dict | None) -> None:
+        self.body = body
+
+    def json(self):
+        return self.body
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # Records every call to the upload endpoint; STATUS answers come from `statuses` in order.
+    monkeypatch.setenv("DRY_RUN", "false")
+    monkeypatch.setattr(x_client.time, "sleep", lambda seconds: None)
+    x = XClient()
+    x.calls = []
+    x.finalize = {"media_id_string": "m1"}
+    x.statuses = []
+
+    def request(method, url, data=None, files=None, params=None, **kwargs):
+        fields = data or params or {}
+        command = fields.get("command", "simple")
+        size = len(files["media"]) if files else None
+        x.calls.append((method, command, fields.get("segment_index"), size))
+        if command == "FINALIZE":
+            return _Response(x.finalize)
+        if command == "STATUS":
+            return _Response(x.statuses.pop(0))
+        return _Response({"media_id_string": "m1"})
+
+    x._request = request  # pylint: disable=protected-access
+    return x
+
+
+def _commands(x) -> list[str]:
+    return [command for _, command, _, _ in x.calls]
+
+
+@pytest.mark.parametrize(
+    "media, mode",
+    [
+        (JPEG, "simple"),
+        (PNG, "simple"),
+        (JPEG + b"\0" * (SIMPLE_UPLOAD_MAX_BYTES - len(JPEG)), "simple"),
+        (JPEG + b"\0" * (SIMPLE_UPLOAD_MAX_BYTES - len(JPEG) + 1), "chunked"),
+        (GIF, "chunked"),
+    ],
+    ids=["jpeg", "png", "jpeg-at-limit", "jpeg-over-limit", "gif"],
+)
+def test_upload_mode_by_size_and_type(client, media, mode):
+    assert client.upload_media(media) == "m1"
+    assert _commands(client)[0] == ("simple" if mode == "simple" else "INIT")
+
+
+def test_chunked_sequence(client):
+    media = JPEG + b"\0" * (2 * CHUNK_BYTES + 10 - len(JPEG))
+    client.finalize = {"media_id_string": "m1", "processing_info": {"state": "pending", "check_after_secs": 1}}
+    client.statuses = [{"processing_info": {"state": "in_progress"}}, {"processing_info": {"state": "succeeded"}}]
+    assert client.upload_media(media) == "m1"
+    assert client.calls == [
+        ("POST", "INIT", None, None),
+        ("POST", "APPEND", 0, CHUNK_BYTES),
+        ("POST", "APPEND", 1, CHUNK_BYTES),
+        ("POST", "APPEND", 2, 10),
+        ("POST", "FINALIZE", None, None),
+        ("GET", "STATUS", None, None),
+        ("GET", "STATUS", None, None),
+    ]
+
+
+def test_chunked_without_processing_skips_status(client):
+    assert client.upload_media_chunked(JPEG) == "m1"
+    assert _commands(client) == ["INIT", "APPEND", "FINALIZE"]
+
+
+def test_failed_processing_raises(client):
+    client.finalize = {"media_id_string": "m1", "processing_info": {"state": "pending"}}
+    client.statuses = [{"processing_info": {"state": "failed", "error": {"message": "InvalidMedia"}}}]
+    with pytest.raises(RuntimeError, match="InvalidMedia"):
+        client.upload_media(GIF)
@@ -8,13 +8,15 @@ import subprocess
 from pathlib import Path
 from typing import Any
 
-from flask import Flask, flash, redirect, render_template, request, url_for
+from flask import Flask, flash, jsonify, redirect, render_template, request, url_for
 
 ROOT_DIR = Path(__file__).resolve().parent.parent
 ENV_PATH = ROOT_DIR / ".env"
 CONFIG_DIR = ROOT_DIR / "config"
 LOGS_DIR = ROOT_DIR / "logs"
 DEFAULT_DB_PATH = "data/bot.sqlite3"
+PERF_RUN_WINDOW = 500
+FUNNEL_STEPS = ["collected", "extracted", "ranked", "deduped", "queued"]
 
 CONFIG_FILES = {
     "sources": CONFIG_DIR / "sources.json",
@@ -132,6 +134,152 @@ def db_stats(db_path: Path) -> dict[str, Any]:
     return stats
 
 
+# Nearest-rank percentiles over the last N runs; the window functions keep the sorting inside SQLite.
+# Skipped cron ticks return in milliseconds and would drag every percentile down, so they are counted apart.
+PERCENTILE_SQL = """
+WITH recent AS (SELECT id FROM runs WHERE status != 'skipped' ORDER BY id DESC LIMIT :window),
+samples AS (
+    SELECT 'run' AS stage, duration_ms AS ms FROM runs WHERE id IN (SELECT id FROM recent)
+    UNION ALL
+    SELECT stage, wall_ms / MAX(calls, 1) FROM run_stages WHERE run_id IN (SELECT id FROM recent)
+),
+ranked AS (
+    SELECT stage, ms,
+           ROW_NUMBER() OVER (PARTITION BY stage ORDER BY ms) AS rn,
+           COUNT(*) OVER (PARTITION BY stage) AS n
+    FROM samples
+)
+SELECT stage, MAX(n) AS runs,
+       MIN(CASE WHEN rn >= 0.50 * n THEN ms END) AS p50,
+       MIN(CASE WHEN rn >= 0.95 * n THEN ms END) AS p95,
+       MIN(CASE WHEN rn >= 0.99 * n THEN ms END) AS p99
+FROM ranked
+GROUP BY stage
+ORDER BY p95 DESC
+"""
+
+STAGE_DAILY_SQL = """
+WITH days AS (
+    SELECT id, substr(started_at, 1, 10) AS day FROM runs
+    WHERE status != 'skipped' AND started_at >= date('now', '-30 days')
+),
+samples AS (
+    SELECT d.day, 'run' AS stage, r.duration_ms AS ms FROM runs r JOIN days d ON d.id = r.id
+    UNION ALL
+    SELECT d.day, s.stage, s.wall_ms / MAX(s.calls, 1) FROM run_stages s JOIN days d ON d.id = s.run_id
+    WHERE s.stage NOT LIKE 'source:%'
+),
+ranked AS (
+    SELECT day, stage, ms,
+           ROW_NUMBER() OVER (PARTITION BY day, stage ORDER BY ms) AS rn,
+           COUNT(*) OVER (PARTITION BY day, stage) AS n
+    FROM samples
+)
+SELECT stage, day, MAX(n) AS runs,
+       MIN(CASE WHEN rn >= 0.50 * n THEN ms END) AS p50,
+       MIN(CASE WHEN rn >= 0.95 * n THEN ms END) AS p95
+FROM ranked
+GROUP BY stage, day
+ORDER BY stage, day
+"""
+
+SKIPPED_SQL = """
+SELECT COUNT(*) FROM (SELECT status FROM runs ORDER BY id DESC LIMIT :window) WHERE status = 'skipped'
+"""
+
+FUNNEL_SQL = """
+SELECT substr(c.name, 8) AS step, SUM(c.value) AS total, AVG(c.value) AS per_run
+FROM run_counters c
+WHERE c.name LIKE 'funnel.%' AND c.run_id IN (SELECT id FROM runs ORDER BY id DESC LIMIT :window)
+GROUP BY c.name
+"""
+
+CACHE_DAILY_SQL = """
+SELECT substr(r.started_at, 1, 10) AS day,
+       SUM(CASE WHEN c.name = 'http_cache.hits' THEN c.value ELSE 0 END) AS hits,
+       SUM(CASE WHEN c.name = 'http_cache.misses' THEN c.value ELSE 0 END) AS misses
+FROM runs r
+JOIN run_counters c ON c.run_id = r.id AND c.name IN ('http_cache.hits', 'http_cache.misses')
+WHERE r.started_at >= date('now', '-30 days')
+GROUP BY day
+ORDER BY day
+"""
+
+RECENT_RUNS_SQL = """
+SELECT id, started_at, duration_ms, status, slot FROM runs ORDER BY id DESC LIMIT 60
+"""
+
+
+def perf_stats(db_path: Path, window: int = PERF_RUN_WINDOW) -> dict[str, Any]:
+    stats: dict[str, Any] = {
+        "window": window,
+        "runs_count": 0,
+        "skipped_count": 0,
+        "stages": [],
+        "stage_daily": {},
+        "sources": [],
+        "funnel": [],
+        "cache_daily": [],
+        "recent_runs": [],
+    }
+    if not db_path.exists():
+        return stats
+
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        if not table_exists(conn, "runs"):
+            return stats
+        params = {"window": window}
+        stats["runs_count"] = conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+        stats["skipped_count"] = conn.execute(SKIPPED_SQL, params).fetchone()[0]
+        for row in conn.execute(PERCENTILE_SQL, params):
+            item = {k: (round(row[k], 1) if k.startswith("p") else row[k]) for k in row.keys()}
+            if row["stage"].startswith("source:"):
+                item["stage"] = row["stage"][len("source:"):]
+                stats["sources"].append(item)
+            else:
+                stats["stages"].append(item)
+
+        for row in conn.execute(STAGE_DAILY_SQL):
+            stats["stage_daily"].setdefault(row["stage"], []).append(
+                {"day": row["day"], "runs": row["runs"], "p50": round(row["p50"], 1), "p95": round(row["p95"], 1)}
+            )
+
+        funnel = {row["step"]: row for row in conn.execute(FUNNEL_SQL, params)}
+        stats["funnel"] = [
+            {
+                "step": step,
+                "total": int(funnel[step]["total"]) if step in funnel else 0,
+                "per_run": round(funnel[step]["per_run"], 1) if step in funnel else 0,
+            }
+            for step in FUNNEL_STEPS
+        ]
+
+        for row in conn.execute(CACHE_DAILY_SQL):
+            lookups = row["hits"] + row["misses"]
+            stats["cache_daily"].append(
+                {
+                    "day": row["day"],
+                    "hits": int(row["hits"]),
+                    "misses": int(row["misses"]),
+                    "hit_ratio": round(row["hits"] / lookups, 3) if lookups else None,
+                }
+            )
+        stats["recent_runs"] = [dict(row) for row in reversed(conn.execute(RECENT_RUNS_SQL).fetchall())]
+    finally:
+        conn.close()
+    return stats
+
+
+def sparkline_points(values: list[float], width: int = 600, height: int = 80, top: float | None = None) -> str:
+    if not values:
+        return ""
+    top = top or max(values) or 1
+    step = width / max(len(values) - 1, 1)
+    return " ".join(f"{i * step:.1f},{height - v / top * height:.1f}" for i, v in enumerate(values))
+
+
 def tail_file(path: Path, lines: int = 120) -> str:
     try:
         content = path.read_text(encoding="utf-8", errors="replace").splitlines()
@@ -201,6 +349,31 @@ def index():
     )
 
 
+@app.route("/perf", methods=["GET"])
+def perf():
+    db_path = get_db_path(parse_env())
+    stats = perf_stats(db_path)
+    return render_template(
+        "perf.html",
+        db_path=str(db_path),
+        perf=stats,
+        run_points=sparkline_points([r["duration_ms"] for r in stats["recent_runs"]]),
+        daily_points={
+            stage: {
+                key: sparkline_points([d[key] for d in days], height=40, top=max(d["p95"] for d in days))
+                for key in ("p50", "p95")
+            }
+            for stage, days in stats["stage_daily"].items()
+        },
+    )
+
+
+@app.route("/perf.json", methods=["GET"])
+def perf_json():
+    window = request.args.get("runs", type=int) or PERF_RUN_WINDOW
+    return jsonify(perf_stats(get_db_path(parse_env()), window=max(1, min(window, 10000))))
+
+
 @app.route("/env/save", methods=["POST"])
 def save_env():
     env_map = parse_env()